@@ -0,0 +1,36 @@
+/*
+ * Clientside Navigation Callbacks
+ *
+ * Every page stays mounted; switching pages only changes which one is visible.
+ */
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    navigation: {
+        // Order must match NAV_PAGES in navigation_callbacks.py
+        showPage: function () {
+            var navIds = ['nav-upload', 'nav-predictions', 'nav-visualizations', 'nav-model'];
+            var pageNames = ['home', 'predictions', 'visualizations', 'model'];
+
+            var triggered = window.dash_clientside.callback_context.triggered;
+            var triggeredId = triggered && triggered.length ? triggered[0].prop_id.split('.')[0] : null;
+            var index = navIds.indexOf(triggeredId);
+            if (index < 0) {
+                index = 0;
+            }
+
+            // Graphs drawn while their page was hidden resize once it is visible
+            setTimeout(function () {
+                window.dispatchEvent(new Event('resize'));
+            }, 0);
+
+            var styles = pageNames.map(function (_, i) {
+                return {display: i === index ? 'block' : 'none'};
+            });
+            var active = navIds.map(function (_, i) {
+                return i === index;
+            });
+
+            return styles.concat([pageNames[index]], active);
+        },
+    },
+});
@@ -0,0 +1,157 @@
+/*
+ * Chunked File Upload
+ *
+ * Sends the file selected in the 'upload-data' zone to /upload/<id> in
+ * chunks (see upload_routes.py). Failed chunks are retried after asking the
+ * server how many bytes it already has, so an interrupted upload resumes
+ * where it stopped. When the whole file is received, 'upload-ticket-store'
+ * is set and the server-side processing callback starts.
+ */
+
+(function () {
+    var MAX_RETRIES = 5;
+    var ACTIVE_STYLE = {borderColor: '#0066CC', backgroundColor: '#E7F3FF'};
+    var IDLE_STYLE = {borderColor: '#4A90E2', backgroundColor: '#F8F9FA'};
+    var uploading = false;
+
+    function setProps(id, props) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(id, props);
+        }
+    }
+
+    function setStatus(message) {
+        setProps('upload-status', {children: message});
+    }
+
+    function newUploadId() {
+        var bytes = new Uint8Array(16);
+        window.crypto.getRandomValues(bytes);
+        return Array.from(bytes, function (b) {
+            return ('0' + b.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    async function receivedBytes(uploadId) {
+        var response = await fetch('/upload/' + uploadId);
+        if (!response.ok) {
+            throw new Error('Upload status unavailable');
+        }
+        return (await response.json()).received;
+    }
+
+    async function sendChunk(uploadId, file, offset, chunkSize) {
+        var response = await fetch('/upload/' + uploadId + '?offset=' + offset, {
+            method: 'PUT',
+            body: file.slice(offset, offset + chunkSize),
+        });
+        var body = await response.json();
+        if (response.status === 413) {
+            throw new Error(body.error);
+        }
+        if (response.status === 409) {
+            // Server has a different offset: resume from there
+            return body.received;
+        }
+        if (!response.ok) {
+            throw new Error(body.error || 'Upload failed');
+        }
+        return body.received;
+    }
+
+    async function uploadFile(file, zone) {
+        var maxSize = Number(zone.dataset.maxSize);
+        var chunkSize = Number(zone.dataset.chunkSize);
+
+        if (!/\.csv$/i.test(file.name)) {
+            setStatus('Please select a CSV file.');
+            return;
+        }
+        if (file.size > maxSize) {
+            setStatus('File exceeds the maximum size of ' + Math.round(maxSize / (1024 * 1024)) + 'MB.');
+            return;
+        }
+
+        var uploadId = newUploadId();
+        var offset = 0;
+        var retries = 0;
+
+        while (offset < file.size) {
+            try {
+                offset = await sendChunk(uploadId, file, offset, chunkSize);
+                retries = 0;
+                setStatus('Uploading ' + file.name + '... ' + Math.floor(100 * offset / file.size) + '%');
+            } catch (error) {
+                if (/maximum size/.test(error.message) || ++retries > MAX_RETRIES) {
+                    setStatus('Upload failed: ' + error.message);
+                    return;
+                }
+                await sleep(500 * Math.pow(2, retries));
+                try {
+                    offset = await receivedBytes(uploadId);
+                } catch (statusError) {
+                    // Keep the current offset, the next attempt resynchronizes
+                }
+            }
+        }
+
+        setStatus('Processing ' + file.name + '...');
+        setProps('upload-ticket-store', {
+            data: {upload_id: uploadId, filename: file.name, size: file.size},
+        });
+    }
+
+    function start(file, zone) {
+        if (!file || uploading) {
+            return;
+        }
+        uploading = true;
+        uploadFile(file, zone).finally(function () { uploading = false; });
+    }
+
+    function findZone(target) {
+        return target && target.closest ? target.closest('#upload-data') : null;
+    }
+
+    // Listeners are delegated from the document because pages are rendered by Dash
+    document.addEventListener('click', function (event) {
+        var zone = findZone(event.target);
+        if (!zone) {
+            return;
+        }
+        var input = document.createElement('input');
+        input.type = 'file';
+        input.accept = '.csv';
+        input.onchange = function () { start(input.files[0], zone); };
+        input.click();
+    });
+
+    document.addEventListener('dragover', function (event) {
+        var zone = findZone(event.target);
+        if (zone) {
+            event.preventDefault();
+            Object.assign(zone.style, ACTIVE_STYLE);
+        }
+    });
+
+    document.addEventListener('dragleave', function (event) {
+        var zone = findZone(event.target);
+        if (zone && !zone.contains(event.relatedTarget)) {
+            Object.assign(zone.style, IDLE_STYLE);
+        }
+    });
+
+    document.addEventListener('drop', function (event) {
+        var zone = findZone(event.target);
+        if (!zone) {
+            return;
+        }
+        event.preventDefault();
+        Object.assign(zone.style, IDLE_STYLE);
+        start(event.dataTransfer.files[0], zone);
+    });
+})();
@@ -0,0 +1,91 @@
+/*
+ * Clientside Visualization Callbacks
+ *
+ * The per-store series is shipped once per upload in 'viz-series-store' as
+ * base64 typed arrays (see _encode_store_series in viz_callbacks.py), so
+ * switching stores only slices arrays in the browser.
+ */
+
+(function () {
+    // Decoded arrays for the last series received, reused across store switches
+    var cache = {series: null, arrays: null};
+
+    function decode(b64, ArrayType) {
+        var binary = atob(b64);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new ArrayType(bytes.buffer);
+    }
+
+    function getArrays(series) {
+        if (cache.series !== series) {
+            cache.series = series;
+            cache.arrays = {
+                offsets: decode(series.offsets, Int32Array),
+                dates: decode(series.dates, Int32Array),
+                values: decode(series.values, Float32Array),
+            };
+        }
+        return cache.arrays;
+    }
+
+    function placeholder(message) {
+        return [
+            window.dash_clientside.no_update,
+            {display: 'none'},
+            {display: 'block'},
+            message,
+        ];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        viz: {
+            storeTimeline: function (series, selectedStore) {
+                if (!series) {
+                    return placeholder('Upload data first to view visualizations');
+                }
+                if (selectedStore === null || selectedStore === undefined) {
+                    return placeholder('Select a store from the dropdown above to view its sales timeline');
+                }
+
+                var index = series.stores.indexOf(Number(selectedStore));
+                if (index < 0) {
+                    return placeholder('No data found for Store ' + selectedStore);
+                }
+
+                var arrays = getArrays(series);
+                var start = arrays.offsets[index];
+                var end = arrays.offsets[index + 1];
+
+                var x = new Array(end - start);
+                for (var i = start; i < end; i++) {
+                    x[i - start] = new Date(arrays.dates[i] * 86400000).toISOString().slice(0, 10);
+                }
+                var y = Array.from(arrays.values.subarray(start, end));
+
+                var layout = Object.assign({}, series.layout, {
+                    title: {text: 'Sales Prediction Timeline - Store ' + selectedStore},
+                });
+
+                return [
+                    {
+                        data: [{
+                            type: 'scatter',
+                            x: x,
+                            y: y,
+                            mode: 'lines',
+                            name: 'Predicted Sales',
+                            line: {color: '#4A90E2', width: 3, shape: 'spline'},
+                        }],
+                        layout: layout,
+                    },
+                    {display: 'block'},
+                    {display: 'none'},
+                    window.dash_clientside.no_update,
+                ];
+            },
+        },
+    });
+})();
@@ -3,6 +3,7 @@ Callbacks Package
 """
 
 from .upload_callbacks import register_upload_callbacks
+from .forecast_callbacks import register_forecast_callbacks
 from .navigation_callbacks import register_navigation_callbacks
 from .predictions_callbacks import register_predictions_callbacks
 from .visualizations_callbacks import register_visualizations_callbacks
@@ -10,6 +11,7 @@ from .viz_callbacks import register_viz_callbacks
 
 __all__ = [
     'register_upload_callbacks',
+    'register_forecast_callbacks',
     'register_navigation_callbacks',
     'register_predictions_callbacks',
     'register_visualizations_callbacks',
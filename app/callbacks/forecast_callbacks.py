@@ -0,0 +1,107 @@
+"""
+Forecast Callbacks
+Forecasts are generated from a sales history without any uploaded future rows
+(see utils/forecast.py)
+"""
+
+from dash import Input, Output, State, no_update
+import dash_mantine_components as dmc
+from dash_iconify import DashIconify
+import pandas as pd
+
+from utils.admission import MIN_JOB_MEMORY, ServerBusyError
+from utils.forecast import forecast_sales
+from utils.result_store import load_inputs, save_result
+from app import config
+from app.components.stats import create_summary_content
+
+
+# UI choice -> policies of temperature, fuel price, CPI and unemployment
+_EXOGENOUS_POLICY_CHOICES = {
+    'default': None,
+    'last': {'temperature': 'last', 'fuel_Price': 'last', 'cpi': 'last', 'unemployment': 'last'},
+    'seasonal': {'temperature': 'seasonal', 'fuel_Price': 'seasonal', 'cpi': 'seasonal', 'unemployment': 'seasonal'},
+}
+
+
+def register_forecast_callbacks(app, admission):
+    """
+    Register forecast callbacks
+    
+    Args:
+        app: Dash application
+        admission: AdmissionController shared with prediction jobs
+    """
+    
+    @app.callback(
+        [Output('forecast-status', 'children'),
+         Output('predictions-store', 'data', allow_duplicate=True),
+         Output('result-key-store', 'data', allow_duplicate=True),
+         Output('summary-stats', 'children', allow_duplicate=True),
+         Output('stats-section', 'style', allow_duplicate=True),
+         Output('preview-key-store', 'data', allow_duplicate=True)],
+        Input('forecast-button', 'n_clicks'),
+        [State('forecast-weeks', 'value'),
+         State('forecast-exogenous-policy', 'value'),
+         State('result-key-store', 'data')],
+        prevent_initial_call=True,
+    )
+    def generate_forecast(n_clicks, weeks, policy_choice, result_key):
+        """Forecast the next weeks of every store and show them like predictions"""
+        
+        if not n_clicks:
+            return [no_update] * 6
+        
+        # History of the current upload if it has sales, the default history otherwise
+        df_history = load_inputs(result_key, config.RESULTS_DIR) if result_key else None
+        if df_history is not None and 'weekly_sales' in df_history.columns:
+            history_name = "the uploaded file"
+        else:
+            df_history = pd.read_csv(config.FORECAST_HISTORY_PATH)
+            history_name = "the default sales history"
+        
+        try:
+            with admission.admit(MIN_JOB_MEMORY):
+                df_forecast = forecast_sales(
+                    df_history,
+                    int(weeks or config.FORECAST_DEFAULT_WEEKS),
+                    policies=_EXOGENOUS_POLICY_CHOICES.get(policy_choice),
+                    strategy=config.RECONCILIATION_STRATEGY,
+                )
+                forecast_key = save_result(df_forecast, config.RESULTS_DIR)
+        except ServerBusyError as e:
+            return [
+                dmc.Alert(
+                    title="Server Busy",
+                    c="orange",
+                    icon=DashIconify(icon="ph:hourglass"),
+                    children=f"{e} No forecast was generated.",
+                ),
+            ] + [no_update] * 5
+        except ValueError as e:
+            return [
+                dmc.Alert(
+                    title="Forecast Error",
+                    c="red",
+                    icon=DashIconify(icon="ph:warning"),
+                    children=str(e),
+                ),
+            ] + [no_update] * 5
+        
+        first_date = df_forecast['date'].min()
+        return [
+            dmc.Alert(
+                title="Forecast Ready",
+                c="green",
+                icon=DashIconify(icon="ph:check-circle"),
+                children=(
+                    f"{df_forecast['horizon'].max()} weeks forecast for {df_forecast['store'].nunique()} "
+                    f"stores from {first_date:%Y-%m-%d}, based on {history_name}."
+                ),
+            ),
+            df_forecast.to_dict('records'),
+            forecast_key,
+            create_summary_content(df_forecast),
+            {'display': 'block'},
+            None,
+        ]
@@ -2,9 +2,150 @@
 Callbacks for the Predictions page
 """
 
-from dash import Input, Output, State, callback
+from functools import lru_cache
+
+from dash import Input, Output, State, callback, ctx, no_update
+import numpy as np
 import pandas as pd
 
+from app import config
+from utils.predictor import predict_delta
+from utils.result_store import load_inputs, load_result, save_result
+
+
+# Input columns that can be edited in the table
+EDITABLE_COLUMNS = ['holiday_flag', 'temperature', 'fuel_Price', 'cpi', 'unemployment']
+
+COLUMN_NAMES = {
+    'store': 'Store',
+    'date': 'Date',
+    'holiday_flag': 'Holiday',
+    'temperature': 'Temperature',
+    'fuel_Price': 'Fuel Price',
+    'cpi': 'CPI',
+    'unemployment': 'Unemployment',
+    'predicted_sales': 'Predicted Sales',
+    'cluster': 'Cluster',
+}
+
+
+@lru_cache(maxsize=4)
+def _load_table_frames(result_key):
+    """
+    Load a result, its inputs and the table built from both
+    
+    Results never change once saved (an edit creates a new key), so they are
+    cached by key. The returned DataFrames must not be modified.
+    
+    Returns:
+        tuple: (df_predictions, df_inputs, table), or None if the result does not
+               exist; df_inputs is None for results saved without inputs
+    """
+    df_predictions = load_result(result_key, config.RESULTS_DIR)
+    if df_predictions is None:
+        return None
+    
+    df_inputs = load_inputs(result_key, config.RESULTS_DIR)
+    if df_inputs is None:
+        return df_predictions, None, df_predictions.reset_index(drop=True)
+    
+    # One row per input row ('id' = position in df_inputs), with its prediction
+    predictions = (
+        df_predictions[['store', 'date', 'predicted_sales', 'cluster']]
+        .drop_duplicates(['store', 'date'])
+        .rename(columns={'date': 'parsed_date'})
+    )
+    table = df_inputs[['store', 'date'] + EDITABLE_COLUMNS].reset_index(drop=True)
+    table['id'] = table.index
+    table['parsed_date'] = pd.to_datetime(table['date'], dayfirst=True, errors='coerce')
+    table = table.merge(predictions, on=['store', 'parsed_date'], how='left')
+    table['date'] = table['parsed_date']
+    table = table.drop(columns='parsed_date').sort_values(['store', 'date'], kind='stable')
+    
+    return df_predictions, df_inputs, table.reset_index(drop=True)
+
+
+def _table_columns(editable):
+    """Column definitions, input columns editable when inputs are available"""
+    if not editable:
+        column_ids = ['store', 'date', 'predicted_sales', 'cluster']
+    else:
+        column_ids = ['store', 'date'] + EDITABLE_COLUMNS + ['predicted_sales', 'cluster']
+    
+    return [
+        {
+            'name': COLUMN_NAMES[column_id],
+            'id': column_id,
+            'type': 'text' if column_id == 'date' else 'numeric',
+            'editable': editable and column_id in EDITABLE_COLUMNS,
+        }
+        for column_id in column_ids
+    ]
+
+
+def _table_page(table, page_current, page_size, sort_by):
+    """Sort the table and format one page for display"""
+    if sort_by:
+        table = table.sort_values(
+            [item['column_id'] for item in sort_by],
+            ascending=[item['direction'] == 'asc' for item in sort_by],
+            kind='stable',
+        )
+    
+    start = page_current * page_size
+    page = table.iloc[start:start + page_size].copy()
+    page['date'] = pd.to_datetime(page['date']).dt.strftime('%Y-%m-%d')
+    page['predicted_sales'] = page['predicted_sales'].round(2)
+    return page.replace({np.nan: None}).to_dict('records')
+
+
+def _apply_edits(result_key, page_rows):
+    """
+    Apply the edited rows of a table page and re-predict the affected stores
+    
+    Args:
+        result_key: Key of the result shown in the table
+        page_rows: Rows of the current page, as sent back by the DataTable
+    
+    Returns:
+        tuple: (new_result_key, df_predictions, n_rows, n_stores), or None if
+               nothing changed
+    
+    Raises:
+        ValueError: If an edited value is not a number, not a whole number in an
+                    integer column, or not 0/1 for holiday_flag
+    """
+    df_predictions, df_inputs, _ = _load_table_frames(result_key)
+    
+    edited = pd.DataFrame(page_rows).set_index('id')[EDITABLE_COLUMNS]
+    original = df_inputs.iloc[edited.index][EDITABLE_COLUMNS]
+    original.index = edited.index
+    
+    for column in EDITABLE_COLUMNS:
+        values = pd.to_numeric(edited[column], errors='coerce')
+        if values.isna().any():
+            raise ValueError(f"'{COLUMN_NAMES[column]}' must be a number")
+        if column == 'holiday_flag' and not values.isin([0, 1]).all():
+            raise ValueError(f"'{COLUMN_NAMES[column]}' must be 0 or 1")
+        if pd.api.types.is_integer_dtype(df_inputs[column]) and (values % 1 != 0).any():
+            raise ValueError(f"'{COLUMN_NAMES[column]}' must be a whole number")
+        edited[column] = values.astype(df_inputs[column].dtype)
+    
+    changed = (edited != original).any(axis=1)
+    if not changed.any():
+        return None
+    
+    changed_ids = edited.index[changed]
+    df_inputs = df_inputs.copy()
+    for column in EDITABLE_COLUMNS:
+        df_inputs.iloc[changed_ids, df_inputs.columns.get_loc(column)] = edited.loc[changed_ids, column].to_numpy()
+    
+    changed_stores = df_inputs.iloc[changed_ids]['store'].unique()
+    df_predictions = predict_delta(df_inputs, df_predictions, changed_stores, config.RECONCILIATION_STRATEGY)
+    new_key = save_result(df_predictions, config.RESULTS_DIR, inputs=df_inputs)
+    
+    return new_key, df_predictions, len(changed_ids), len(changed_stores)
+
 
 def register_predictions_callbacks(app):
     """Register callbacks for the Predictions page"""
@@ -12,42 +153,93 @@ def register_predictions_callbacks(app):
     @app.callback(
         [Output('predictions-table', 'data'),
          Output('predictions-table', 'columns'),
+         Output('predictions-table', 'page_count'),
          Output('table-section', 'style'),
-         Output('download-button', 'disabled')],
-        Input('predictions-store', 'data'),
-        prevent_initial_call=False,
+         Output('download-button', 'disabled'),
+         Output('table-edit-status', 'children'),
+         Output('result-key-store', 'data', allow_duplicate=True),
+         Output('predictions-store', 'data', allow_duplicate=True)],
+        [Input('result-key-store', 'data'),
+         Input('preview-key-store', 'data'),
+         Input('predictions-table', 'page_current'),
+         Input('predictions-table', 'sort_by'),
+         Input('predictions-table', 'data_timestamp')],
+        [State('predictions-table', 'data'),
+         State('predictions-table', 'page_size')],
+        prevent_initial_call=True,
     )
-    def update_predictions_page(predictions_data):
-        """Update Predictions page when data is available"""
+    def update_predictions_page(result_key, preview_key, page_current, sort_by,
+                                data_timestamp, page_rows, page_size):
+        """Serve the current page of the table and re-predict edited stores"""
         
-        if predictions_data is None or len(predictions_data) == 0:
+        # Full result, or the preview while the job runs (read-only)
+        table_key = result_key or preview_key
+        frames = _load_table_frames(table_key) if table_key else None
+        
+        if frames is None:
             # No data: hide table
             return [
                 [],
                 [],
+                0,
                 {'display': 'none'},
-                True
+                True,
+                no_update,
+                no_update,
+                no_update,
             ]
         
-        # Data available: show everything
-        df_predictions = pd.DataFrame(predictions_data)
+        page_current = page_current or 0
+        edit_status = no_update
+        new_result_key = no_update
+        new_predictions_data = no_update
         
-        # Format for display
-        df_display = df_predictions.copy()
-        df_display['date'] = pd.to_datetime(df_display['date']).dt.strftime('%Y-%m-%d')
-        df_display['predicted_sales'] = df_display['predicted_sales'].round(2)
+        # Edited cells: re-predict the stores of the changed rows only
+        if ('predictions-table.data_timestamp' in ctx.triggered_prop_ids and page_rows
+                and result_key and frames[1] is not None):
+            try:
+                delta = _apply_edits(result_key, page_rows)
+            except ValueError as e:
+                delta = None
+                edit_status = f"Edit not applied: {e}."
+            
+            if delta is not None:
+                new_result_key, df_predictions, n_rows, n_stores = delta
+                result_key = new_result_key
+                frames = _load_table_frames(result_key)
+                new_predictions_data = df_predictions.to_dict('records')
+                edit_status = (
+                    f"{n_rows} edited row(s): {n_stores} store(s) re-predicted, "
+                    "other predictions reused."
+                )
         
-        # Table columns
-        columns = [
-            {'name': 'Store', 'id': 'store'},
-            {'name': 'Date', 'id': 'date'},
-            {'name': 'Predicted Sales', 'id': 'predicted_sales'},
-            {'name': 'Cluster', 'id': 'cluster'}
-        ]
+        _, df_inputs, table = frames
+        editable = result_key is not None and df_inputs is not None
+        
+        page_count = max(1, -(-len(table) // page_size))
         
         return [
-            df_display.to_dict('records'),
-            columns,
+            _table_page(table, min(page_current, page_count - 1), page_size, sort_by),
+            _table_columns(editable),
+            page_count,
             {'display': 'block'},
-            False
+            result_key is None,
+            edit_status,
+            new_result_key,
+            new_predictions_data,
         ]
+    
+    
+    @app.callback(
+        Output('download-link', 'href'),
+        [Input('result-key-store', 'data'),
+         Input('download-format', 'value')],
+        prevent_initial_call=False,
+    )
+    def update_download_link(result_key, file_format):
+        """Point the download button to the streaming download route"""
+        
+        if result_key is None:
+            return None
+        
+        return f"/download/predictions/{result_key}?format={file_format or 'csv.gz'}"
@@ -1,57 +1,70 @@
 """
 File Upload and Processing Callbacks
+Predictions run as background jobs; the browser polls their progress and can
+cancel them (see utils/jobs.py)
 """
 
-from dash import Input, Output, State, callback, html, dcc
+from dash import Input, Output, State, callback, html, dcc, no_update
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 import pandas as pd
-import base64
-import io
 
+from utils.admission import ServerBusyError, estimate_job_memory
+from utils.jobs import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    JobCancelled,
+    JobProgress,
+    create_job,
+    get_job,
+    request_cancel,
+    start_job,
+    touch_job,
+    update_job,
+)
 from utils.preprocessing import validate_csv_structure, check_temporal_continuity
-from utils.predictor import predict_sales, get_summary_stats
-from app.components.stats import create_stat_card
+from utils.predictor import load_serving_artifacts, predict_sales
+from utils.preview import predict_preview
+from utils.sharding import predict_sales_sharded
+from utils.result_store import load_result, save_result
+from utils.upload_store import get_received_size, get_upload_digest, read_upload_csv, remove_upload
+from app import config
+from app.components.stats import create_summary_content
 
 
-def register_upload_callbacks(app):
-    """Register upload and data processing callbacks"""
+def register_upload_callbacks(app, admission, single_flight):
+    """
+    Register upload and data processing callbacks
     
-    @app.callback(
-        [Output('upload-status', 'children'),
-         Output('predictions-store', 'data'),
-         Output('summary-stats', 'children'),
-         Output('stats-section', 'style')],
-        Input('upload-data', 'contents'),
-        State('upload-data', 'filename'),
-        prevent_initial_call=True,
-    )
-    def process_upload(contents, filename):
-        """Process uploaded file and generate predictions"""
+    Args:
+        app: Dash application
+        admission: AdmissionController bounding concurrent prediction jobs
+        single_flight: SingleFlight coalescing identical concurrent predictions
+    """
+    
+    def _run_prediction(upload_id, estimated_memory, progress, job_id):
+        """
+        Parse, validate and predict a spooled upload within a job slot
         
-        if contents is None:
-            return [None, None, None, {'display': 'none'}]
+        Large files are first predicted on a sample; the preview is published
+        in the status of job_id until the full result replaces it.
         
-        try:
-            # Decode the file
-            content_type, content_string = contents.split(',')
-            decoded = base64.b64decode(content_string)
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+        Returns:
+            tuple: (result_key, validation_message), where validation_message
+                   is set (and result_key None) for invalid files
+        """
+        with admission.admit(estimated_memory):
+            # Parse the spooled file with a streaming reader
+            progress('decode', 0.0)
+            df = read_upload_csv(upload_id, config.UPLOAD_PARSE_CHUNK_ROWS, config.UPLOAD_DIR,
+                                 progress=progress)
             
             # Validate structure
+            progress('validate', 0.0)
             is_valid, message = validate_csv_structure(df)
             if not is_valid:
-                return [
-                    dmc.Alert(
-                        title="Validation Error",
-                        c="red",
-                        icon=DashIconify(icon="ph:warning"),
-                        children=message,
-                    ),
-                    None,
-                    None,
-                    {'display': 'none'}
-                ]
+                return None, message
             
             # Check temporal continuity (warnings only, doesn't block)
             temporal_warnings = check_temporal_continuity(df, max_gap_days=14)
@@ -60,127 +73,256 @@ def register_upload_callbacks(app):
                 for warning in temporal_warnings[:5]:  # Limiter l'affichage
                     print(f"  - {warning}")
             
-            # Generate predictions
-            df_predictions = predict_sales(df)
+            # Provisional results on a stratified sample
+            if len(df) >= config.PREVIEW_MIN_ROWS:
+                progress('preview', 0.0)
+                df_preview, preview_info = predict_preview(
+                    df, config.PREVIEW_STORES_PER_CLUSTER, config.PREVIEW_MAX_WEEKS,
+                    strategy=config.RECONCILIATION_STRATEGY,
+                )
+                update_job(job_id, config.JOBS_DIR,
+                           preview_key=save_result(df_preview, config.RESULTS_DIR),
+                           preview=preview_info)
             
-            # Calculate statistics
-            # Calculate additional statistics
-            n_stores = df_predictions['store'].nunique()
-            n_days = df_predictions['date'].nunique()
-            date_range = f"{df_predictions['date'].min()} to {df_predictions['date'].max()}"
-            total_sales = df_predictions['predicted_sales'].sum()
-            summary_stats = get_summary_stats(df_predictions)
+            # Generate predictions (features, per-cluster predict), large files in a process pool
+            if config.SHARD_WORKERS > 0 and len(df) >= config.SHARD_MIN_ROWS:
+                df_predictions = predict_sales_sharded(df, config.SHARD_WORKERS, progress=progress,
+                                                       shard_dir=config.SHARD_DIR,
+                                                       strategy=config.RECONCILIATION_STRATEGY)
+            else:
+                df_predictions = predict_sales(df, progress=progress, strategy=config.RECONCILIATION_STRATEGY)
             
-            # Create summary stats with more information
-            stats_content = dmc.Stack(
-                gap="lg",
-                children=[
-                    # Row 1: Overview metrics
-                    dmc.SimpleGrid(
-                        cols={"base": 1, "sm": 2, "md": 4},
-                        spacing="lg",
-                        children=[
-                            create_stat_card(
-                                "Total Stores",
-                                f"{n_stores}",
-                                "ph:storefront"
-                            ),
-                            create_stat_card(
-                                "Time Period",
-                                f"{n_days} days",
-                                "ph:calendar"
-                            ),
-                            create_stat_card(
-                                "Total Predictions",
-                                f"{len(df_predictions):,}",
-                                "ph:chart-line-up"
-                            ),
-                            create_stat_card(
-                                "Total Sales",
-                                f"${total_sales:,.0f}",
-                                "ph:currency-dollar"
-                            ),
-                        ],
-                    ),
-                    
-                    # Row 2: Sales statistics
-                    dmc.SimpleGrid(
-                        cols={"base": 1, "sm": 2, "md": 4},
-                        spacing="lg",
-                        children=[
-                            create_stat_card(
-                                "Average Sales",
-                                f"${summary_stats['mean_sales']:,.2f}",
-                                "ph:coin"
-                            ),
-                            create_stat_card(
-                                "Max Sales",
-                                f"${summary_stats['max_sales']:,.2f}",
-                                "ph:trend-up"
-                            ),
-                            create_stat_card(
-                                "Min Sales",
-                                f"${summary_stats['min_sales']:,.2f}",
-                                "ph:trend-down"
-                            ),
-                            create_stat_card(
-                                "Std Deviation",
-                                f"${summary_stats['std_sales']:,.2f}",
-                                "ph:chart-scatter"
-                            ),
-                        ],
-                    ),
-                    
-                    # Date range info
-                    dmc.Alert(
-                        icon=DashIconify(icon="ph:calendar-check"),
-                        title="Prediction Period",
-                        color="blue",
-                        variant="light",
-                        children=date_range,
-                    ),
-                ],
-            )
+            # Keep the full result on the server for downloads and the polling callback,
+            # with its inputs for edits in the data table
+            progress('aggregate', 0.5)
+            result_key = save_result(df_predictions, config.RESULTS_DIR, inputs=df)
+        
+        return result_key, None
+    
+    
+    def _run_job(job_id, upload_id):
+        """Run a prediction job in the background and record its final state"""
+        
+        progress = JobProgress(job_id, config.JOBS_DIR, abandon_timeout=config.JOB_ABANDON_TIMEOUT)
+        
+        try:
+            try:
+                # Identical files predicted with the same models share one computation;
+                # only that computation waits for a job slot sized from the file
+                flight_key = (
+                    get_upload_digest(upload_id, config.UPLOAD_DIR),
+                    load_serving_artifacts()['model_version'],
+                )
+                estimated_memory = estimate_job_memory(get_received_size(upload_id, config.UPLOAD_DIR))
+                
+                while True:
+                    try:
+                        (result_key, validation_message), shared = single_flight.do(
+                            flight_key,
+                            lambda: _run_prediction(upload_id, estimated_memory, progress, job_id),
+                            wait_check=progress.check_cancelled,
+                        )
+                        break
+                    except JobCancelled:
+                        # The shared computation was cancelled by its own client:
+                        # start over unless this job was cancelled too
+                        if progress.cancel_reason() is not None:
+                            raise
+            finally:
+                remove_upload(upload_id, config.UPLOAD_DIR)
             
+            if validation_message is not None:
+                update_job(job_id, config.JOBS_DIR, state=FAILED,
+                           title="Validation Error", message=validation_message)
+            else:
+                update_job(job_id, config.JOBS_DIR, state=DONE, progress=1.0,
+                           result_key=result_key, shared=shared)
+        
+        except JobCancelled as e:
+            print(f"Job {job_id} stopped: {e}")
+            update_job(job_id, config.JOBS_DIR, state=CANCELLED, message=str(e))
+        
+        except ServerBusyError as e:
+            update_job(job_id, config.JOBS_DIR, state=FAILED, title="Server Busy",
+                       message=f"{e} Your file was not processed.")
+        
+        except Exception as e:
+            update_job(job_id, config.JOBS_DIR, state=FAILED, title="Processing Error",
+                       message=f"Error processing file: {str(e)}")
+    
+    
+    @app.callback(
+        [Output('job-store', 'data'),
+         Output('job-poll-interval', 'disabled'),
+         Output('cancel-job-button', 'disabled', allow_duplicate=True)],
+        Input('upload-ticket-store', 'data'),
+        prevent_initial_call=True,
+    )
+    def process_upload(upload_ticket):
+        """Start a prediction job for the uploaded file"""
+        
+        if upload_ticket is None:
+            return [None, True, False]
+        
+        filename = upload_ticket.get('filename')
+        upload_id = upload_ticket.get('upload_id')
+        
+        job_id = create_job(config.JOBS_DIR, filename=filename)
+        start_job(_run_job, job_id, upload_id)
+        
+        return [job_id, False, False]
+    
+    
+    @app.callback(
+        Output('cancel-job-button', 'disabled'),
+        Input('cancel-job-button', 'n_clicks'),
+        State('job-store', 'data'),
+        prevent_initial_call=True,
+    )
+    def cancel_job(n_clicks, job_id):
+        """Ask the running job to stop at its next stage"""
+        
+        if not n_clicks or job_id is None:
+            return no_update
+        
+        request_cancel(job_id, config.JOBS_DIR)
+        return True
+    
+    
+    @app.callback(
+        [Output('upload-status', 'children'),
+         Output('predictions-store', 'data'),
+         Output('result-key-store', 'data'),
+         Output('summary-stats', 'children'),
+         Output('stats-section', 'style'),
+         Output('job-progress-section', 'style'),
+         Output('job-progress', 'value'),
+         Output('job-stage', 'children'),
+         Output('job-poll-interval', 'disabled', allow_duplicate=True),
+         Output('preview-key-store', 'data')],
+        [Input('job-store', 'data'),
+         Input('job-poll-interval', 'n_intervals')],
+        State('preview-key-store', 'data'),
+        prevent_initial_call=True,
+    )
+    def poll_job(job_id, n_intervals, shown_preview_key):
+        """Show the progress of the running job, its preview, then its result"""
+        
+        if job_id is None:
+            return [no_update] * 5 + [{'display': 'none'}, 0, None, True, None]
+        
+        touch_job(job_id, config.JOBS_DIR)
+        job = get_job(job_id, config.JOBS_DIR)
+        job_finished = [{'display': 'none'}, 0, None, True, None]
+        
+        if job is None:
             return [
                 dmc.Alert(
-                    title="Success!",
-                    c="green",
-                    icon=DashIconify(icon="ph:check-circle"),
-                    children=f"File '{filename}' processed successfully! Generated {len(df_predictions):,} predictions.",
+                    title="Processing Error",
+                    c="red",
+                    icon=DashIconify(icon="ph:x-circle"),
+                    children="The prediction job was not found. Please upload the file again.",
                 ),
-                df_predictions.to_dict('records'),  # Store the data
-                stats_content,  # Display stats on Home page
-                {'display': 'block'}  # Show stats section
+                None,
+                None,
+                None,
+                {'display': 'none'}
+            ] + job_finished
+        
+        filename = job.get('filename')
+        
+        if job['state'] not in (DONE, CANCELLED, FAILED):
+            show_progress = [
+                {'display': 'block'},
+                round(100 * job.get('progress', 0.0)),
+                f"{job.get('label')}... ({filename})",
+                False,
             ]
             
-        except Exception as e:
+            preview_key = job.get('preview_key')
+            if preview_key is None:
+                return [None] + [no_update] * 4 + show_progress + [no_update]
+            if preview_key == shown_preview_key:
+                return [no_update] * 5 + show_progress + [no_update]
+            
+            # Show the preview until the full result replaces it
+            df_preview = load_result(preview_key, config.RESULTS_DIR)
+            if df_preview is None:
+                return [no_update] * 5 + show_progress + [no_update]
+            preview_info = job['preview']
+            return [
+                dmc.Alert(
+                    title="Preview",
+                    c="blue",
+                    icon=DashIconify(icon="ph:hourglass-medium"),
+                    children=(
+                        f"Provisional results for {preview_info['sample_stores']} stores over "
+                        f"{preview_info['sample_dates']} weeks. The full predictions for '{filename}' "
+                        "will replace them automatically."
+                    ),
+                ),
+                df_preview.to_dict('records'),
+                None,  # Downloads wait for the full result
+                create_summary_content(df_preview, preview_info),
+                {'display': 'block'},
+            ] + show_progress + [preview_key]
+        
+        if job['state'] == CANCELLED:
+            return [
+                dmc.Alert(
+                    title="Prediction Cancelled",
+                    c="orange",
+                    icon=DashIconify(icon="ph:prohibit"),
+                    children=f"Processing of '{filename}' was stopped: {job.get('message')}.",
+                ),
+                None,
+                None,
+                None,
+                {'display': 'none'}
+            ] + job_finished
+        
+        if job['state'] == FAILED:
+            return [
+                dmc.Alert(
+                    title=job.get('title', "Processing Error"),
+                    c="orange" if job.get('title') == "Server Busy" else "red",
+                    icon=DashIconify(icon="ph:hourglass" if job.get('title') == "Server Busy" else "ph:warning"),
+                    children=job.get('message'),
+                ),
+                None,
+                None,
+                None,
+                {'display': 'none'}
+            ] + job_finished
+        
+        result_key = job.get('result_key')
+        df_predictions = load_result(result_key, config.RESULTS_DIR)
+        if df_predictions is None:
             return [
                 dmc.Alert(
                     title="Processing Error",
                     c="red",
                     icon=DashIconify(icon="ph:x-circle"),
-                    children=f"Error processing file: {str(e)}",
+                    children="The predictions are no longer available. Please upload the file again.",
                 ),
                 None,
                 None,
+                None,
                 {'display': 'none'}
-            ]
-    
-    
-    @app.callback(
-        Output("download-dataframe-csv", "data"),
-        Input("download-button", "n_clicks"),
-        State('predictions-store', 'data'),
-        prevent_initial_call=True,
-    )
-    def download_predictions(n_clicks, data):
-        """Download predictions as CSV"""
-        if data is None:
-            return None
+            ] + job_finished
         
-        df = pd.DataFrame(data)
-        df = df[['store', 'date', 'predicted_sales']].copy()
-        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        if job.get('shared'):
+            print(f"Predictions for '{filename}' shared with an identical request in progress")
         
-        return dcc.send_data_frame(df.to_csv, "predictions.csv", index=False)
+        return [
+            dmc.Alert(
+                title="Success!",
+                c="green",
+                icon=DashIconify(icon="ph:check-circle"),
+                children=f"File '{filename}' processed successfully! Generated {len(df_predictions):,} predictions.",
+            ),
+            df_predictions.to_dict('records'),  # Store the data
+            result_key,  # Server-side result for downloads
+            create_summary_content(df_predictions),  # Display stats on Home page
+            {'display': 'block'}  # Show stats section
+        ] + job_finished
@@ -2,35 +2,76 @@
 Visualization Callbacks
 """
 
-from dash import Input, Output, State, callback, dcc
+import base64
+
+from dash import Input, Output, State, callback, dcc, ClientsideFunction
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 from app.components.placeholder import create_chart_placeholder
 
 
+def _encode_array(values, dtype):
+    """Encode a NumPy array as base64 little-endian bytes for a JS typed array"""
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+def _encode_store_series(df):
+    """
+    Encode per-store prediction series in a compact columnar format
+    
+    Rows are sorted by store then date, and store i owns the rows
+    offsets[i] to offsets[i + 1]. Arrays are base64-encoded typed arrays
+    decoded once in the browser (see assets/viz.js).
+    
+    Args:
+        df: DataFrame with columns [store, date, predicted_sales], date as datetime
+    
+    Returns:
+        dict: {'stores': [...], 'offsets': Int32, 'dates': Int32 (days since epoch),
+               'values': Float32, 'layout': base figure layout}
+    """
+    df = df.sort_values(['store', 'date'])
+    stores, counts = np.unique(df['store'].to_numpy(), return_counts=True)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    days = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    
+    # Layout shared by every store timeline, resolved once on the server so the
+    # browser gets the full 'plotly_white' template
+    base_layout = go.Figure().update_layout(
+        xaxis_title='Date',
+        yaxis_title='Predicted Sales ($)',
+        template='plotly_white',
+        hovermode='x unified',
+        height=400,
+        margin=dict(l=50, r=50, t=50, b=50),
+    ).to_plotly_json()['layout']
+    
+    return {
+        'stores': [int(s) for s in stores],
+        'offsets': _encode_array(offsets, '<i4'),
+        'dates': _encode_array(days, '<i4'),
+        'values': _encode_array(df['predicted_sales'].to_numpy(), '<f4'),
+        'layout': base_layout,
+    }
+
+
 def register_viz_callbacks(app):
     """Register visualization-related callbacks"""
     
     @app.callback(
-        [Output('timeseries-plot', 'children'),
-         Output('bar-plot', 'children'),
-         Output('total-timeseries', 'children')],
-        [Input('predictions-store', 'data'),
-         Input('viz-store-selector', 'value')],
+        [Output('bar-plot', 'children'),
+         Output('total-timeseries', 'children'),
+         Output('viz-series-store', 'data')],
+        Input('predictions-store', 'data'),
         prevent_initial_call=False,
     )
-    def update_visualizations(data, selected_store):
-        """Generate charts based on data and selected store or show placeholders"""
+    def update_visualizations(data):
+        """Generate charts and the per-store series from the predictions, or show placeholders"""
         
         # Show placeholders when no data
         if data is None or len(data) == 0:
             return (
-                create_chart_placeholder(
-                    title="Store Timeline",
-                    icon="ph:chart-line-duotone",
-                    message="Upload data first to view visualizations"
-                ),
                 create_chart_placeholder(
                     title="Top Stores",
                     icon="ph:chart-bar-duotone",
@@ -40,134 +81,16 @@ def register_viz_callbacks(app):
                     title="Overall Timeline",
                     icon="ph:trend-up-duotone",
                     message="Upload data first to view visualizations"
-                )
+                ),
+                None
             )
         
-        # If no store selected but data available: show placeholder for timeseries only
-        if selected_store is None:
-            try:
-                df = pd.DataFrame(data)
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # Bar Chart and Average timeline can be displayed without store selection
-                # Bar Chart - Average Sales by Store (Top 15)
-                store_averages = df.groupby('store')['predicted_sales'].mean().sort_values(ascending=False).head(15)
-                
-                fig_bar = go.Figure()
-                fig_bar.add_trace(go.Bar(
-                    x=[f'Store {s}' for s in store_averages.index],
-                    y=store_averages.values,
-                    marker=dict(
-                        color=store_averages.values,
-                        colorscale='Blues',
-                        showscale=False,
-                    ),
-                ))
-                
-                fig_bar.update_layout(
-                    title='Average Predicted Sales by Store (Top 15)',
-                    xaxis_title='Store',
-                    yaxis_title='Average Sales ($)',
-                    template='plotly_white',
-                    height=400,
-                    margin=dict(l=50, r=50, t=50, b=50),
-                )
-                
-                # Average Sales Time Series (All Stores)
-                daily_averages = df.groupby('date')['predicted_sales'].mean().reset_index()
-                daily_averages = daily_averages.sort_values('date')
-                
-                fig_total = go.Figure()
-                fig_total.add_trace(go.Scatter(
-                    x=daily_averages['date'],
-                    y=daily_averages['predicted_sales'],
-                    mode='lines',
-                    name='Average Sales',
-                    line=dict(color='#52C41A', width=3, shape='spline'),
-                    fill='tozeroy',
-                    fillcolor='rgba(82, 196, 26, 0.1)',
-                ))
-                
-                fig_total.update_layout(
-                    title='Average Sales Prediction Across All Stores',
-                    xaxis_title='Date',
-                    yaxis_title='Average Predicted Sales ($)',
-                    template='plotly_white',
-                    hovermode='x unified',
-                    height=400,
-                    margin=dict(l=50, r=50, t=50, b=50),
-                )
-                
-                return (
-                    create_chart_placeholder(
-                        title="Store Timeline",
-                        icon="ph:chart-line-duotone",
-                        message="Select a store from the dropdown above to view its sales timeline"
-                    ),
-                    dcc.Graph(
-                        figure=fig_bar,
-                        config={
-                            'displayModeBar': True,
-                            'displaylogo': False,
-                            'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                        }
-                    ),
-                    dcc.Graph(
-                        figure=fig_total,
-                        config={
-                            'displayModeBar': True,
-                            'displaylogo': False,
-                            'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                        }
-                    )
-                )
-            except Exception as e:
-                print(f"❌ Error creating default charts: {e}")
-                return (
-                    create_chart_placeholder(
-                        title="Store Timeline",
-                        icon="ph:chart-line-duotone",
-                        message="Select a store from the dropdown above"
-                    ),
-                    create_chart_placeholder(
-                        title="Top Stores",
-                        icon="ph:chart-bar-duotone",
-                        message="Error loading chart"
-                    ),
-                    create_chart_placeholder(
-                        title="Overall Timeline",
-                        icon="ph:trend-up-duotone",
-                        message="Error loading chart"
-                    )
-                )
-        
         try:
             df = pd.DataFrame(data)
             df['date'] = pd.to_datetime(df['date'])
             
-            # Time Series for Selected Store
-            # Ensure selected_store is converted to the same type as df['store']
-            selected_store_int = int(selected_store)
-            df_store = df[df['store'] == selected_store_int].sort_values('date')
-            
-            if df_store.empty:
-                return (
-                    create_chart_placeholder(
-                        title="Store Timeline",
-                        icon="ph:chart-line-duotone",
-                        message=f"No data found for Store {selected_store_int}"
-                    ),
-                    create_chart_placeholder(
-                        title="Top Stores",
-                        icon="ph:chart-bar-duotone",
-                        message="Top 15 stores by total predicted sales will appear here"
-                    ),
-                    create_chart_placeholder(
-                        title="Overall Timeline",
-                        icon="ph:trend-up-duotone",
-                        message="Total sales prediction across all stores will appear here"
-                    )
-                )
+            # Per-store series, sliced in the browser when a store is selected
+            series = _encode_store_series(df)
         except Exception as e:
             print(f"❌ Error in update_visualizations: {str(e)}")
             return (
@@ -181,32 +104,9 @@ def register_viz_callbacks(app):
                     icon="ph:warning-duotone",
                     message=f"An error occurred: {str(e)}"
                 ),
-                create_chart_placeholder(
-                    title="Error",
-                    icon="ph:warning-duotone",
-                    message=f"An error occurred: {str(e)}"
-                )
+                None
             )
         
-        fig_timeseries = go.Figure()
-        fig_timeseries.add_trace(go.Scatter(
-            x=df_store['date'],
-            y=df_store['predicted_sales'],
-            mode='lines',
-            name='Predicted Sales',
-            line=dict(color='#4A90E2', width=3, shape='spline'),
-        ))
-        
-        fig_timeseries.update_layout(
-            title=f'Sales Prediction Timeline - Store {selected_store}',
-            xaxis_title='Date',
-            yaxis_title='Predicted Sales ($)',
-            template='plotly_white',
-            hovermode='x unified',
-            height=400,
-            margin=dict(l=50, r=50, t=50, b=50),
-        )
-        
         # Bar Chart - Average Sales by Store (Top 15)
         store_averages = df.groupby('store')['predicted_sales'].mean().sort_values(ascending=False).head(15)
         
@@ -257,14 +157,6 @@ def register_viz_callbacks(app):
         
         # Return actual graphs wrapped in dcc.Graph components
         return (
-            dcc.Graph(
-                figure=fig_timeseries,
-                config={
-                    'displayModeBar': True,
-                    'displaylogo': False,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
-                }
-            ),
             dcc.Graph(
                 figure=fig_bar,
                 config={
@@ -280,5 +172,18 @@ def register_viz_callbacks(app):
                     'displaylogo': False,
                     'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
                 }
-            )
+            ),
+            series
         )
+    
+    
+    # Store timeline - sliced from 'viz-series-store' in the browser (assets/viz.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='viz', function_name='storeTimeline'),
+        [Output('timeseries-graph', 'figure'),
+         Output('timeseries-graph', 'style'),
+         Output('timeseries-placeholder', 'style'),
+         Output('timeseries-placeholder-message', 'children')],
+        [Input('viz-series-store', 'data'),
+         Input('viz-store-selector', 'value')],
+    )
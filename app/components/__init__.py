@@ -3,16 +3,21 @@ Components Package
 """
 
 from .upload import create_upload_section
-from .stats import create_stats_section
+from .forecast import create_forecast_section
+from .stats import create_stats_section, create_stat_card, create_summary_content
 from .table import create_table_section
-from .charts import create_charts_section
+from .charts import create_charts_section, create_store_timeline
 from .placeholder import create_chart_placeholder, create_empty_message, create_loading_placeholder
 
 __all__ = [
     'create_upload_section',
+    'create_forecast_section',
     'create_stats_section',
+    'create_stat_card',
+    'create_summary_content',
     'create_table_section',
     'create_charts_section',
+    'create_store_timeline',
     'create_chart_placeholder',
     'create_empty_message',
     'create_loading_placeholder',
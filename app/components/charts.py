@@ -50,7 +50,7 @@ def create_charts_section():
                             ),
                             
                             # Charts - Will be replaced by callbacks
-                            html.Div(id='timeseries-plot'),
+                            create_store_timeline(),
                             html.Div(id='bar-plot'),
                             html.Div(id='total-timeseries'),
                         ],
@@ -59,3 +59,40 @@ def create_charts_section():
             ),
         ],
     )
+
+
+def create_store_timeline():
+    """
+    Create the store timeline chart
+    
+    The graph is drawn in the browser by a clientside callback from the
+    columnar series held in 'viz-series-store', so switching stores never
+    calls the server.
+    
+    Returns:
+        Dash component with the placeholder, the graph and the series store
+    """
+    return html.Div(
+        id='timeseries-plot',
+        children=[
+            dcc.Store(id='viz-series-store', data=None),
+            html.Div(
+                id='timeseries-placeholder',
+                children=create_chart_placeholder(
+                    title="Store Timeline",
+                    icon="ph:chart-line-duotone",
+                    message="Upload data first to view visualizations",
+                    message_id='timeseries-placeholder-message',
+                ),
+            ),
+            dcc.Graph(
+                id='timeseries-graph',
+                style={'display': 'none'},
+                config={
+                    'displayModeBar': True,
+                    'displaylogo': False,
+                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d'],
+                },
+            ),
+        ],
+    )
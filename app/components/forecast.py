@@ -0,0 +1,73 @@
+"""
+Forecast Component
+"""
+
+import dash_mantine_components as dmc
+from dash import html
+from dash_iconify import DashIconify
+from app.config import FORECAST_DEFAULT_WEEKS
+from utils.forecast import MAX_FORECAST_WEEKS
+
+
+def create_forecast_section():
+    """Create the forecast section (future weeks generated from the sales history)"""
+    
+    return dmc.Paper(
+        p="xl",
+        radius="md",
+        withBorder=True,
+        children=[
+            dmc.Stack(
+                gap="md",
+                children=[
+                    # Section Header
+                    dmc.Group(
+                        gap="sm",
+                        children=[
+                            DashIconify(icon="ph:calendar-plus", width=24),
+                            dmc.Title("Forecast Future Weeks", order=4),
+                        ],
+                    ),
+                    dmc.Text(
+                        "No file needed: future weeks are generated for every store from the sales "
+                        "history (the uploaded file if it contains weekly_sales).",
+                        size="sm",
+                        c="dimmed",
+                    ),
+                    
+                    dmc.Group(
+                        align="flex-end",
+                        children=[
+                            dmc.NumberInput(
+                                id='forecast-weeks',
+                                label="Weeks ahead",
+                                value=FORECAST_DEFAULT_WEEKS,
+                                min=1,
+                                max=MAX_FORECAST_WEEKS,
+                                w=140,
+                            ),
+                            dmc.Select(
+                                id='forecast-exogenous-policy',
+                                label="Temperature, fuel price, CPI, unemployment",
+                                value='default',
+                                data=[
+                                    {'value': 'default', 'label': "Seasonal temperature, last values otherwise"},
+                                    {'value': 'last', 'label': "Last observed values"},
+                                    {'value': 'seasonal', 'label': "Same week last year"},
+                                ],
+                                w=340,
+                            ),
+                            dmc.Button(
+                                "Generate forecast",
+                                id='forecast-button',
+                                leftSection=DashIconify(icon="ph:trend-up", width=16),
+                            ),
+                        ],
+                    ),
+                    
+                    # Forecast Status
+                    html.Div(id='forecast-status'),
+                ],
+            ),
+        ],
+    )
@@ -7,7 +7,7 @@ from dash import html
 from dash_iconify import DashIconify
 
 
-def create_chart_placeholder(title, icon, message):
+def create_chart_placeholder(title, icon, message, message_id=None):
     """
     Create a placeholder for charts when no data is selected
     
@@ -15,10 +15,13 @@ def create_chart_placeholder(title, icon, message):
         title: Chart title
         icon: Icon name for DashIconify
         message: Message to display
+        message_id: Optional id of the message text, so callbacks can update it
     
     Returns:
         DMC component with placeholder styling
     """
+    message_props = {'id': message_id} if message_id else {}
+    
     return dmc.Paper(
         p="xl",
         radius="md",
@@ -55,6 +58,7 @@ def create_chart_placeholder(title, icon, message):
                                 size="sm",
                                 c="dimmed",
                                 ta="center",
+                                **message_props,
                             ),
                         ],
                     ),
@@ -6,6 +6,8 @@ import dash_mantine_components as dmc
 from dash import html
 from dash_iconify import DashIconify
 
+from utils.predictor import get_summary_stats
+
 
 def create_stats_section():
     """Create the statistics display section"""
@@ -62,3 +64,103 @@ def create_stat_card(title, value, icon):
             ),
         ],
     )
+
+
+def create_summary_content(df_predictions, preview_info=None):
+    """
+    Build the summary statistics shown on the Home page
+    
+    Args:
+        df_predictions: Predictions DataFrame
+        preview_info: Set when df_predictions is a preview sample (see
+                      utils/preview.py): counts come from the full file and
+                      the total sales are estimated
+    """
+    
+    # Calculate statistics
+    # Calculate additional statistics
+    n_stores = df_predictions['store'].nunique()
+    n_days = df_predictions['date'].nunique()
+    n_predictions = len(df_predictions)
+    date_range = f"{df_predictions['date'].min()} to {df_predictions['date'].max()}"
+    total_sales = df_predictions['predicted_sales'].sum()
+    summary_stats = get_summary_stats(df_predictions)
+    
+    if preview_info is not None:
+        n_stores = preview_info['n_stores']
+        n_days = preview_info['n_dates']
+        n_predictions = preview_info['n_rows']
+        total_sales = preview_info['estimated_total_sales']
+    
+    # Create summary stats with more information
+    stats_content = dmc.Stack(
+        gap="lg",
+        children=[
+            # Row 1: Overview metrics
+            dmc.SimpleGrid(
+                cols={"base": 1, "sm": 2, "md": 4},
+                spacing="lg",
+                children=[
+                    create_stat_card(
+                        "Total Stores",
+                        f"{n_stores}",
+                        "ph:storefront"
+                    ),
+                    create_stat_card(
+                        "Time Period",
+                        f"{n_days} days",
+                        "ph:calendar"
+                    ),
+                    create_stat_card(
+                        "Total Predictions",
+                        f"{n_predictions:,}",
+                        "ph:chart-line-up"
+                    ),
+                    create_stat_card(
+                        "Total Sales (estimate)" if preview_info is not None else "Total Sales",
+                        f"${total_sales:,.0f}",
+                        "ph:currency-dollar"
+                    ),
+                ],
+            ),
+            
+            # Row 2: Sales statistics
+            dmc.SimpleGrid(
+                cols={"base": 1, "sm": 2, "md": 4},
+                spacing="lg",
+                children=[
+                    create_stat_card(
+                        "Average Sales",
+                        f"${summary_stats['mean_sales']:,.2f}",
+                        "ph:coin"
+                    ),
+                    create_stat_card(
+                        "Max Sales",
+                        f"${summary_stats['max_sales']:,.2f}",
+                        "ph:trend-up"
+                    ),
+                    create_stat_card(
+                        "Min Sales",
+                        f"${summary_stats['min_sales']:,.2f}",
+                        "ph:trend-down"
+                    ),
+                    create_stat_card(
+                        "Std Deviation",
+                        f"${summary_stats['std_sales']:,.2f}",
+                        "ph:chart-scatter"
+                    ),
+                ],
+            ),
+            
+            # Date range info
+            dmc.Alert(
+                icon=DashIconify(icon="ph:calendar-check"),
+                title="Prediction Period",
+                color="blue",
+                variant="light",
+                children=date_range,
+            ),
+        ],
+    )
+    
+    return stats_content
@@ -5,7 +5,7 @@ Predictions Table Component
 import dash_mantine_components as dmc
 from dash import html, dash_table, dcc
 from dash_iconify import DashIconify
-from app.config import TABLE_PAGE_SIZE
+from app.config import TABLE_PAGE_SIZE, DOWNLOAD_FORMATS
 
 
 def create_table_section():
@@ -34,23 +34,54 @@ def create_table_section():
                                             dmc.Title("Predictions Table", order=4),
                                         ],
                                     ),
-                                    dmc.Button(
-                                        "Download CSV",
-                                        id='download-button',
-                                        leftSection=DashIconify(icon="ph:download-simple"),
-                                        variant="light",
-                                        c="blue",
-                                        disabled=True,
+                                    dmc.Group(
+                                        gap="sm",
+                                        children=[
+                                            dmc.Select(
+                                                id='download-format',
+                                                data=[
+                                                    {'label': label, 'value': value}
+                                                    for value, label in DOWNLOAD_FORMATS.items()
+                                                ],
+                                                value='csv.gz',
+                                                allowDeselect=False,
+                                                radius="md",
+                                                style={'width': '160px'},
+                                            ),
+                                            # Link to the streaming download route
+                                            html.A(
+                                                id='download-link',
+                                                download='',
+                                                children=dmc.Button(
+                                                    "Download",
+                                                    id='download-button',
+                                                    leftSection=DashIconify(icon="ph:download-simple"),
+                                                    variant="light",
+                                                    c="blue",
+                                                    disabled=True,
+                                                ),
+                                            ),
+                                        ],
                                     ),
                                 ],
                             ),
                             
-                            # Data Table
+                            # Edit hint and result of the last edit
+                            dmc.Text(
+                                id='table-edit-status',
+                                size="sm",
+                                c="dimmed",
+                                children="Edit input values in the table: only the stores you change are re-predicted.",
+                            ),
+                            
+                            # Data Table - pages and sorting are served by the server
                             dash_table.DataTable(
                                 id='predictions-table',
                                 columns=[],
                                 data=[],
                                 page_size=TABLE_PAGE_SIZE,
+                                page_current=0,
+                                page_count=0,
                                 style_table={
                                     'overflowX': 'auto',
                                     'borderRadius': '8px',
@@ -78,19 +109,21 @@ def create_table_section():
                                         'if': {'row_index': 'odd'},
                                         'backgroundColor': '#FAFBFC',
                                     },
+                                    {
+                                        'if': {'column_editable': True},
+                                        'backgroundColor': '#FFFDF0',
+                                    },
                                     {
                                         'if': {'state': 'selected'},
                                         'backgroundColor': '#EBF4FF',
                                         'border': '1px solid #4A90E2',
                                     },
                                 ],
-                                sort_action="native",
+                                sort_action="custom",
                                 sort_mode="multi",
-                                export_format="csv",
-                                page_action="native",
+                                sort_by=[],
+                                page_action="custom",
                             ),
-                            
-                            dcc.Download(id="download-dataframe-csv"),
                         ],
                     ),
                 ],
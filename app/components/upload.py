@@ -5,7 +5,7 @@ File Upload Component
 import dash_mantine_components as dmc
 from dash import html, dcc
 from dash_iconify import DashIconify
-from app.config import REQUIRED_COLUMNS
+from app.config import REQUIRED_COLUMNS, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, JOB_POLL_INTERVAL_MS
 
 
 def create_upload_section():
@@ -28,8 +28,8 @@ def create_upload_section():
                         ],
                     ),
                     
-                    # Upload Zone
-                    dcc.Upload(
+                    # Upload Zone - files are sent in chunks by assets/upload.js
+                    html.Div(
                         id='upload-data',
                         children=html.Div([
                             html.Div("📄", style={
@@ -42,7 +42,7 @@ def create_upload_section():
                                 'color': '#212529',
                                 'marginBottom': '8px',
                             }),
-                            html.Div("Maximum file size: 16MB", style={
+                            html.Div(f"Maximum file size: {MAX_UPLOAD_SIZE / (1024*1024):.0f}MB", style={
                                 'fontSize': '13px',
                                 'color': '#868e96',
                             }),
@@ -60,16 +60,42 @@ def create_upload_section():
                             'alignItems': 'center',
                             'justifyContent': 'center',
                         },
-                        style_active={
-                            'borderColor': '#0066CC',
-                            'backgroundColor': '#E7F3FF',
+                        **{
+                            'data-max-size': str(MAX_UPLOAD_SIZE),
+                            'data-chunk-size': str(UPLOAD_CHUNK_SIZE),
                         },
-                        multiple=False,
                     ),
                     
                     # Upload Status
                     html.Div(id='upload-status'),
                     
+                    # Prediction Progress - refreshed while a job runs
+                    html.Div(
+                        id='job-progress-section',
+                        style={'display': 'none'},
+                        children=dmc.Stack(
+                            gap="xs",
+                            children=[
+                                dmc.Group(
+                                    justify="space-between",
+                                    children=[
+                                        dmc.Text(id='job-stage', size="sm", c="dimmed"),
+                                        dmc.Button(
+                                            "Cancel",
+                                            id='cancel-job-button',
+                                            size="xs",
+                                            variant="light",
+                                            color="red",
+                                            leftSection=DashIconify(icon="ph:x-circle", width=16),
+                                        ),
+                                    ],
+                                ),
+                                dmc.Progress(id='job-progress', value=0, striped=True, animated=True),
+                            ],
+                        ),
+                    ),
+                    dcc.Interval(id='job-poll-interval', interval=JOB_POLL_INTERVAL_MS, disabled=True),
+                    
                     # Expected Columns Info
                     dmc.Alert(
                         title="Required Columns",
@@ -3,25 +3,71 @@ Application Configuration
 """
 
 # Server Configuration
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max per request (uploads are chunked)
 HOST = '127.0.0.1'
 PORT = 8050
 DEBUG = True
 
+# Response Compression (gzip, or brotli when the 'brotli' package is installed)
+COMPRESSION_ENABLED = True
+COMPRESSION_MIN_SIZE = 500  # Smaller responses are sent as is (bytes)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_MIMETYPES = [
+    'application/json',  # Dash layout, dependencies and callback responses
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'application/javascript',
+    'image/svg+xml',
+]
+
 # Application Metadata
 APP_TITLE = "Store Sales Prediction"
 APP_ICON = "📊"
 
 # File Upload
 ACCEPTED_FILE_TYPES = ['.csv']
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024  # 1GB max per file
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB per request, below MAX_CONTENT_LENGTH
+UPLOAD_PARSE_CHUNK_ROWS = 100000  # Rows parsed at a time by the streaming CSV reader
 REQUIRED_COLUMNS = [
     'store', 'date', 'holiday_flag', 
     'temperature', 'fuel_Price', 'cpi', 'unemployment'
 ]
 
+# Prediction Jobs (admission control, per server process)
+MAX_CONCURRENT_JOBS = 2  # Jobs running at once
+JOB_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024  # 2GB of estimated peak memory across running jobs
+JOB_QUEUE_SIZE = 8  # Jobs allowed to wait; more are rejected as busy right away
+JOB_QUEUE_TIMEOUT = 30  # Seconds a job may wait before being rejected as busy
+JOB_POLL_INTERVAL_MS = 500  # Progress refresh period in the browser
+JOB_ABANDON_TIMEOUT = 120  # Seconds without progress polling before a job is stopped
+
+# Preview (provisional results on a sample while large files are predicted)
+PREVIEW_MIN_ROWS = 20000  # Smaller files are predicted in full right away
+PREVIEW_STORES_PER_CLUSTER = 3
+PREVIEW_MAX_WEEKS = 26
+
+# What-if scenarios (POST /api/scenarios)
+SCENARIO_MAX_SCENARIOS = 5000  # Scenarios allowed in one request
+SCENARIO_BATCH_ROWS = 1_000_000  # Rows of the stacked matrix scored at once (~176MB)
+
+# Forecasts (future weeks generated from a sales history)
+FORECAST_DEFAULT_WEEKS = 12
+
 # Pagination
 TABLE_PAGE_SIZE = 20
 
+# Downloads
+DOWNLOAD_CHUNK_ROWS = 50000  # Rows serialized per streamed chunk
+DOWNLOAD_FORMATS = {
+    'csv.gz': 'CSV (gzip)',
+    'csv': 'CSV',
+    'parquet': 'Parquet',
+    'arrow': 'Arrow',
+}
+
 # Paths
 import os
 import sys
@@ -29,3 +75,44 @@ import sys
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
 sys.path.insert(0, PROJECT_ROOT)
+
+# Server-side prediction results (served by the download route)
+import tempfile
+RESULTS_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_results')
+
+# Spool files of chunked uploads
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_uploads')
+
+# Status and cancellation files of prediction jobs
+JOBS_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_jobs')
+
+# Default sales history of forecasts (store, date, weekly_sales and exogenous columns)
+FORECAST_HISTORY_PATH = os.path.join(PROJECT_ROOT, 'data', 'stores-sales.csv')
+
+# Production Serving (gunicorn.conf.py) - overridable with environment variables
+BIND = os.environ.get('APP_BIND', f'{HOST}:{PORT}')
+WORKERS = int(os.environ.get('APP_WORKERS', os.cpu_count() or 1))  # Processes
+THREADS = int(os.environ.get('APP_THREADS', 4))  # Request threads per process
+PREDICT_THREADS = int(os.environ.get('APP_PREDICT_THREADS', 1))  # LightGBM threads per process
+
+# Sharded scoring: files of SHARD_MIN_ROWS rows or more are predicted by a pool of
+# SHARD_WORKERS processes per server process (0 = off, see utils/sharding.py)
+SHARD_WORKERS = int(os.environ.get('APP_SHARD_WORKERS', 0))
+SHARD_MIN_ROWS = 500000
+SHARD_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'store_sales_shards')
+
+# Hierarchical reconciliation of the store predictions: bottom_up (as predicted),
+# top_down or proportional (see utils/reconciliation.py), for uploads, forecasts and scenarios
+from utils.reconciliation import STRATEGIES
+RECONCILIATION_STRATEGY = os.environ.get('APP_RECONCILIATION', 'bottom_up')
+if RECONCILIATION_STRATEGY not in STRATEGIES:
+    raise ValueError(f"APP_RECONCILIATION={RECONCILIATION_STRATEGY!r} is not one of {', '.join(STRATEGIES)}")
+
+# Model reload: each server process polls the model files every MODEL_WATCH_INTERVAL
+# seconds (0 = off) and swaps in changed models; POST /admin/reload-models reloads
+# the answering process on demand, with the X-Reload-Token header (unset = disabled)
+MODEL_WATCH_INTERVAL = float(os.environ.get('APP_MODEL_WATCH_INTERVAL', 10))
+MODEL_RELOAD_TOKEN = os.environ.get('APP_MODEL_RELOAD_TOKEN', '')
+
+# Startup warm-up: a synthetic prediction through every model before /ready reports ready
+WARMUP_ENABLED = os.environ.get('APP_WARMUP', '1') != '0'
@@ -9,6 +9,7 @@ from dash_iconify import DashIconify
 from app.pages import (
     create_home_page,
     create_predictions_page,
+    create_visualizations_page,
     create_model_info_page,
 )
 
@@ -105,8 +106,17 @@ def create_layout(model_meta):
             # Predictions data store
             dcc.Store(id='predictions-store', data=None),
             
-            # Download component
-            dcc.Download(id="download-dataframe-csv"),
+            # Completed chunked upload, set by assets/upload.js
+            dcc.Store(id='upload-ticket-store', data=None),
+            
+            # Running prediction job (polled for progress)
+            dcc.Store(id='job-store', data=None),
+            
+            # Key of the preview shown while the job runs
+            dcc.Store(id='preview-key-store', data=None),
+            
+            # Key of the server-side predictions (used by the download route)
+            dcc.Store(id='result-key-store', data=None),
             
             # Store model metadata
             dcc.Store(id='model-metadata-store', data=model_meta),
@@ -128,9 +138,31 @@ def create_layout(model_meta):
                                 px="md",
                                 py="xl",
                                 children=[
+                                    # Pages are mounted once and shown by
+                                    # the navigation callback
                                     html.Div(
                                         id='page-content',
-                                        children=create_home_page()
+                                        children=[
+                                            html.Div(
+                                                id='page-home',
+                                                children=create_home_page(),
+                                            ),
+                                            html.Div(
+                                                id='page-predictions',
+                                                style={'display': 'none'},
+                                                children=create_predictions_page(),
+                                            ),
+                                            html.Div(
+                                                id='page-visualizations',
+                                                style={'display': 'none'},
+                                                children=create_visualizations_page(),
+                                            ),
+                                            html.Div(
+                                                id='page-model',
+                                                style={'display': 'none'},
+                                                children=create_model_info_page(model_meta),
+                                            ),
+                                        ],
                                     ),
                                 ],
                             ),
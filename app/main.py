@@ -11,12 +11,26 @@ from app.layouts.main_layout_sidebar import create_layout
 from utils.logger import setup_logger
 from app.callbacks import (
     register_upload_callbacks,
+    register_forecast_callbacks,
     register_navigation_callbacks,
     register_predictions_callbacks,
     register_visualizations_callbacks,
     register_viz_callbacks,
 )
-from utils.model_loader import get_model_metadata
+from app.middleware import CompressionMiddleware
+from app.routes import (
+    register_download_routes,
+    register_forecast_routes,
+    register_model_routes,
+    register_scenario_routes,
+    register_status_routes,
+    register_upload_routes,
+)
+from utils.admission import AdmissionController
+from utils.single_flight import SingleFlight
+from utils.predictor import get_served_model_metadata
+from utils.model_reload import start_model_watcher
+from utils.warmup import start_warmup
 
 # Setup logger
 logger = setup_logger('store_sales_app')
@@ -39,19 +53,55 @@ app = dash.Dash(
     ],
 )
 
-# Load model metadata
-model_meta = get_model_metadata()
+# Model metadata at startup (from the model bundle when there is one)
+model_meta = get_served_model_metadata()
+
+
+def serve_layout():
+    """Layout built on each page load, so the Model Info page shows the models served after a reload"""
+    return create_layout(get_served_model_metadata())
+
 
 # Set layout
-app.layout = create_layout(model_meta)
+app.layout = serve_layout
+
+# Bound concurrent prediction jobs and their memory
+admission = AdmissionController(
+    max_concurrent=config.MAX_CONCURRENT_JOBS,
+    memory_budget=config.JOB_MEMORY_BUDGET,
+    max_queue=config.JOB_QUEUE_SIZE,
+    queue_timeout=config.JOB_QUEUE_TIMEOUT,
+)
+
+# Share one computation between identical concurrent uploads
+single_flight = SingleFlight()
 
 # Register callbacks
 register_navigation_callbacks(app)
-register_upload_callbacks(app)
+register_upload_callbacks(app, admission, single_flight)
+register_forecast_callbacks(app, admission)
 register_predictions_callbacks(app)
 register_visualizations_callbacks(app)
 register_viz_callbacks(app)
 
+# Register Flask routes
+register_download_routes(server)
+register_upload_routes(server)
+register_status_routes(server, admission, single_flight)
+register_scenario_routes(server, admission)
+register_forecast_routes(server, admission)
+register_model_routes(server)
+
+# Compress layout, callback and asset responses
+if config.COMPRESSION_ENABLED:
+    server.wsgi_app = CompressionMiddleware(
+        server.wsgi_app,
+        mimetypes=config.COMPRESSION_MIMETYPES,
+        min_size=config.COMPRESSION_MIN_SIZE,
+        gzip_level=config.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=config.COMPRESSION_BROTLI_QUALITY,
+    )
+
 
 def main():
     """Run the application"""
@@ -59,8 +109,11 @@ def main():
     logger.info(f"Starting {config.APP_TITLE}")
     logger.info("="*80)
     logger.info(f"Server URL: http://{config.HOST}:{config.PORT}")
-    logger.info(f"Configuration: Max file size={config.MAX_CONTENT_LENGTH / (1024*1024):.0f}MB, "
+    logger.info(f"Configuration: Max file size={config.MAX_UPLOAD_SIZE / (1024*1024):.0f}MB, "
                 f"Table page size={config.TABLE_PAGE_SIZE}, Debug={config.DEBUG}")
+    logger.info(f"Prediction jobs: max {config.MAX_CONCURRENT_JOBS} concurrent, "
+                f"memory budget={config.JOB_MEMORY_BUDGET / (1024*1024):.0f}MB, "
+                f"queue={config.JOB_QUEUE_SIZE}")
     logger.info(f"Model: {model_meta['approach']} - {model_meta['model_type']}, "
                 f"RMSE={model_meta['rmse']:,.2f}")
     logger.info("="*80)
@@ -70,8 +123,10 @@ def main():
     print("="*80)
     print(f"\n📍 Open your browser at: http://{config.HOST}:{config.PORT}")
     print("\n⚙️  Configuration:")
-    print(f"  - Max file size: {config.MAX_CONTENT_LENGTH / (1024*1024):.0f}MB")
+    print(f"  - Max file size: {config.MAX_UPLOAD_SIZE / (1024*1024):.0f}MB")
     print(f"  - Table page size: {config.TABLE_PAGE_SIZE}")
+    print(f"  - Concurrent prediction jobs: {config.MAX_CONCURRENT_JOBS} "
+          f"(queue: {config.JOB_QUEUE_SIZE})")
     print(f"  - Debug mode: {config.DEBUG}")
     print("\n📊 Model Information:")
     print(f"  - Approach: {model_meta['approach']}")
@@ -79,6 +134,12 @@ def main():
     print(f"  - RMSE: {model_meta['rmse']:,.2f}")
     print("\n" + "="*80 + "\n")
     
+    # Startup phase: load the serving artifacts and run a synthetic prediction
+    # through every model in the background; the server listens at once and
+    # /ready reports ready when the first upload runs at steady-state speed
+    start_warmup(predict=config.WARMUP_ENABLED)
+    start_model_watcher(config.MODEL_WATCH_INTERVAL)
+    
     app.run(
         debug=config.DEBUG,
         host=config.HOST,
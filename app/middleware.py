@@ -0,0 +1,138 @@
+"""
+WSGI Middleware
+Response compression for Dash layouts, callbacks and assets
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli (when installed) or gzip
+    
+    Only responses whose content type is in the allowlist and whose body is
+    at least min_size bytes are compressed. Streaming downloads and already
+    encoded responses pass through untouched. Compressed bodies of
+    fingerprinted Dash component bundles are cached, since they never change.
+    """
+    
+    CACHED_PATH_PREFIX = '/_dash-component-suites/'
+    
+    def __init__(self, wsgi_app, mimetypes, min_size=500, gzip_level=6,
+                 brotli_quality=4, cache_size=64):
+        self.wsgi_app = wsgi_app
+        self.mimetypes = set(mimetypes)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def _choose_encoding(self, environ):
+        """Pick the best encoding accepted by the client, or None"""
+        accepted = environ.get('HTTP_ACCEPT_ENCODING', '').lower()
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+    
+    def _compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+    
+    def _is_compressible(self, status, headers):
+        """Check status and headers before reading the body"""
+        if not status.startswith('200'):
+            return False
+        
+        header_map = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in header_map:
+            return False
+        
+        mimetype = header_map.get('content-type', '').split(';')[0].strip()
+        if mimetype not in self.mimetypes:
+            return False
+        
+        content_length = header_map.get('content-length')
+        if content_length is not None and content_length.isdigit():
+            return int(content_length) >= self.min_size
+        return True
+    
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+        
+        response = {}
+        written = []
+        
+        def capture_start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+            response['exc_info'] = exc_info
+            return written.append
+        
+        body_iter = self.wsgi_app(environ, capture_start_response)
+        
+        if 'status' not in response:
+            # start_response deferred to the first iteration: buffer the body
+            body_iter = [b''.join(body_iter)]
+        
+        status, headers = response['status'], response['headers']
+        if not self._is_compressible(status, headers):
+            start_response(status, headers, response['exc_info'])
+            if written:
+                return written + list(body_iter)
+            return body_iter
+        
+        try:
+            body = b''.join(written) + b''.join(body_iter)
+        finally:
+            if hasattr(body_iter, 'close'):
+                body_iter.close()
+        
+        if len(body) < self.min_size:
+            headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+            headers.append(('Content-Length', str(len(body))))
+            start_response(status, headers, response['exc_info'])
+            return [body]
+        
+        path = environ.get('PATH_INFO', '')
+        cache_key = None
+        if path.startswith(self.CACHED_PATH_PREFIX):
+            cache_key = (path, environ.get('QUERY_STRING', ''), encoding)
+        
+        compressed = None
+        if cache_key:
+            with self._cache_lock:
+                compressed = self._cache.get(cache_key)
+        if compressed is None:
+            compressed = self._compress(body, encoding)
+            if cache_key:
+                with self._cache_lock:
+                    self._cache[cache_key] = compressed
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        
+        vary = [value for name, value in headers if name.lower() == 'vary']
+        headers = [
+            (name, value) for name, value in headers
+            if name.lower() not in ('content-length', 'vary')
+        ]
+        headers.extend([
+            ('Content-Encoding', encoding),
+            ('Content-Length', str(len(compressed))),
+            ('Vary', ', '.join(vary + ['Accept-Encoding'])),
+        ])
+        start_response(status, headers, response['exc_info'])
+        return [compressed]
@@ -7,6 +7,7 @@ from dash import html
 
 from app.components import (
     create_upload_section,
+    create_forecast_section,
     create_stats_section,
 )
 
@@ -42,6 +43,9 @@ def create_home_page():
                     # Upload section
                     create_upload_section(),
                     
+                    # Forecast section
+                    create_forecast_section(),
+                    
                     # Statistics section
                     create_stats_section(),
                 ],
@@ -22,6 +22,12 @@ def create_model_info_page(model_meta=None):
     training_info = model_meta.get('training_info', {})
     performance = model_meta.get('performance', {})
     
+    subtitle = f"Version {model_meta.get('version', 'N/A')} - Last updated: {model_meta.get('last_updated', 'N/A')}"
+    if model_meta.get('bundle_version'):
+        subtitle += f" - Bundle {model_meta['bundle_version']} (built {model_meta.get('bundle_built', 'N/A')})"
+    if model_meta.get('serving_version') and model_meta['serving_version'] != model_meta.get('bundle_version'):
+        subtitle += f" - Serving {model_meta['serving_version']}"
+    
     return dmc.Container(
         size="xl",
         px="md",
@@ -36,7 +42,7 @@ def create_model_info_page(model_meta=None):
                         children=[
                             dmc.Title("🤖 Model Information", order=2),
                             dmc.Text(
-                                f"Version {model_meta.get('version', 'N/A')} - Last updated: {model_meta.get('last_updated', 'N/A')}",
+                                subtitle,
                                 size="md",
                                 c="dimmed"
                             ),
@@ -6,6 +6,8 @@ import dash_mantine_components as dmc
 from dash import html
 from dash_iconify import DashIconify
 
+from app.components import create_store_timeline
+
 
 def create_visualizations_page():
     """
@@ -62,7 +64,7 @@ def create_visualizations_page():
                                     ),
                                     
                                     # Charts
-                                    html.Div(id='timeseries-plot'),
+                                    create_store_timeline(),
                                     html.Div(id='bar-plot'),
                                     html.Div(id='total-timeseries'),
                                 ],
@@ -0,0 +1,20 @@
+"""
+Routes Package
+Flask routes served next to the Dash app
+"""
+
+from .download_routes import register_download_routes
+from .forecast_routes import register_forecast_routes
+from .model_routes import register_model_routes
+from .scenario_routes import register_scenario_routes
+from .status_routes import register_status_routes
+from .upload_routes import register_upload_routes
+
+__all__ = [
+    'register_download_routes',
+    'register_forecast_routes',
+    'register_model_routes',
+    'register_scenario_routes',
+    'register_status_routes',
+    'register_upload_routes',
+]
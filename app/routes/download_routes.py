@@ -0,0 +1,138 @@
+"""
+Download Routes
+Stream server-side predictions as CSV, gzip CSV, Parquet or Arrow
+"""
+
+import zlib
+
+from flask import Response, abort, request, stream_with_context
+
+from app import config
+from utils.result_store import load_result
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+DOWNLOAD_COLUMNS = ['store', 'date', 'predicted_sales']
+
+# format: (mimetype, file extension)
+_FORMAT_INFO = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+}
+
+
+class _ChunkBuffer:
+    """Minimal write-only file object whose content is drained after each chunk"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_chunks(df, chunk_rows):
+    """Yield consecutive row slices of df (views, no copy of the whole frame)"""
+    for start in range(0, len(df), chunk_rows):
+        yield start, df.iloc[start:start + chunk_rows]
+
+
+def _iter_csv(df, chunk_rows, compress=False):
+    """Serialize df to CSV chunk by chunk, optionally gzip-compressed"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    for start, chunk in _iter_chunks(df, chunk_rows):
+        data = chunk.to_csv(index=False, header=(start == 0), date_format='%Y-%m-%d').encode('utf-8')
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _iter_arrow(df, chunk_rows, file_format):
+    """Serialize df to Parquet (one row group per chunk) or an Arrow IPC stream"""
+    sink = _ChunkBuffer()
+    writer = None
+    
+    try:
+        for _, chunk in _iter_chunks(df, chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if file_format == 'parquet':
+                    writer = pq.ParquetWriter(sink, table.schema)
+                else:
+                    writer = pa.ipc.new_stream(sink, table.schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def register_download_routes(server):
+    """Register prediction download routes on the Flask server"""
+    
+    @server.route('/download/predictions/<result_key>')
+    def download_predictions(result_key):
+        """Stream a stored prediction result in the requested format"""
+        
+        file_format = request.args.get('format', 'csv.gz')
+        if file_format not in _FORMAT_INFO:
+            abort(400, description=f"Unknown format '{file_format}'")
+        if file_format in ('parquet', 'arrow') and pa is None:
+            abort(400, description=f"Format '{file_format}' requires pyarrow")
+        
+        df = load_result(result_key, config.RESULTS_DIR)
+        if df is None:
+            abort(404, description="Predictions not found. Please upload your file again.")
+        
+        df = df[DOWNLOAD_COLUMNS]
+        chunk_rows = config.DOWNLOAD_CHUNK_ROWS
+        
+        if file_format in ('csv', 'csv.gz'):
+            body = _iter_csv(df, chunk_rows, compress=(file_format == 'csv.gz'))
+        else:
+            body = _iter_arrow(df, chunk_rows, file_format)
+        
+        mimetype, extension = _FORMAT_INFO[file_format]
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=predictions.{extension}'},
+        )
@@ -0,0 +1,69 @@
+"""
+Forecast Routes
+Multi-week forecasts generated from a sales history
+"""
+
+from flask import abort, jsonify, request
+import pandas as pd
+
+from app import config
+from utils.admission import MIN_JOB_MEMORY, ServerBusyError
+from utils.forecast import forecast_sales
+from utils.result_store import load_inputs, save_result
+
+
+def register_forecast_routes(server, admission):
+    """Register forecast routes on the Flask server"""
+    
+    @server.route('/api/forecast', methods=['POST'])
+    def forecast():
+        """
+        Forecast the next weeks of every store, recursively
+        
+        JSON body:
+            weeks: Number of weeks to forecast
+            policies: Optional {column: 'last' | 'seasonal'} for holiday_flag,
+                      temperature, fuel_Price, cpi and unemployment
+            overrides: Optional [{date: 'YYYY-MM-DD', store: (optional), column: value}]
+            result_key: Optional result whose inputs (with weekly_sales) are the
+                        history; the default sales history otherwise
+        """
+        
+        body = request.get_json(silent=True) or {}
+        
+        result_key = body.get('result_key')
+        if result_key:
+            df_history = load_inputs(result_key, config.RESULTS_DIR)
+            if df_history is None or 'weekly_sales' not in df_history.columns:
+                abort(404, description="Unknown result or result saved without a sales history")
+        else:
+            df_history = pd.read_csv(config.FORECAST_HISTORY_PATH)
+        
+        overrides = body.get('overrides')
+        if overrides is not None:
+            overrides = pd.DataFrame(overrides)
+            if len(overrides) > 0 and 'date' not in overrides.columns:
+                abort(400, description="Each override needs a 'date'")
+        
+        try:
+            with admission.admit(MIN_JOB_MEMORY):
+                df_forecast = forecast_sales(
+                    df_history,
+                    int(body.get('weeks', config.FORECAST_DEFAULT_WEEKS)),
+                    policies=body.get('policies'),
+                    overrides=overrides,
+                    strategy=config.RECONCILIATION_STRATEGY,
+                )
+                forecast_key = save_result(df_forecast, config.RESULTS_DIR)
+        except ServerBusyError as e:
+            abort(503, description=str(e))
+        except (TypeError, ValueError) as e:
+            abort(400, description=str(e))
+        
+        df_forecast['date'] = df_forecast['date'].dt.strftime('%Y-%m-%d')
+        
+        return jsonify({
+            'result_key': forecast_key,
+            'weeks': int(df_forecast['horizon'].max()),
+            'results': df_forecast.to_dict('records'),
+        })
@@ -0,0 +1,41 @@
+"""
+Model Routes
+Reload of the serving models without a restart
+"""
+
+import os
+import hmac
+
+from flask import abort, jsonify, request
+
+from app import config
+from utils.model_reload import reload_serving_artifacts
+
+
+def register_model_routes(server):
+    """Register model management routes on the Flask server"""
+    
+    @server.route('/admin/reload-models', methods=['POST'])
+    def reload_models():
+        """
+        Reload the models of the process that answers
+        
+        Every process also reloads on its own when the model files change
+        (see MODEL_WATCH_INTERVAL). Requires the X-Reload-Token header.
+        
+        Query parameters:
+            force: '1' to swap even if the model version did not change
+        """
+        
+        if not config.MODEL_RELOAD_TOKEN:
+            abort(403, description="Model reload is disabled (set APP_MODEL_RELOAD_TOKEN)")
+        if not hmac.compare_digest(request.headers.get('X-Reload-Token', ''), config.MODEL_RELOAD_TOKEN):
+            abort(403, description="Invalid reload token")
+        
+        try:
+            result = reload_serving_artifacts(force=request.args.get('force') == '1')
+        except Exception as e:
+            return jsonify({'error': f"Reload failed, still serving the current models: {e}"}), 500
+        
+        result['pid'] = os.getpid()
+        return jsonify(result)
@@ -0,0 +1,75 @@
+"""
+Scenario Routes
+What-if sweeps over the exogenous variables of a stored result
+"""
+
+from flask import abort, jsonify, request
+
+from app import config
+from utils.admission import ServerBusyError
+from utils.result_store import load_inputs
+from utils.scenarios import AGGREGATE_LEVELS, make_scenario_grid, run_scenarios
+
+
+SCENARIO_BYTES_PER_ROW = 22 * 8 * 2  # Stacked feature matrix row and its copy
+
+
+def register_scenario_routes(server, admission):
+    """Register scenario routes on the Flask server"""
+    
+    @server.route('/api/scenarios', methods=['POST'])
+    def scenarios():
+        """
+        Predict a grid of shocks applied to the inputs of a stored result
+        
+        JSON body:
+            result_key: Key of a result saved with its inputs
+            shocks: {column: [shock, ...]} for temperature, fuel_Price, cpi, unemployment
+            relative: Shocks as fractions (0.1 = +10%) instead of added values
+            aggregate: 'total', 'store' or 'row'
+        """
+        
+        body = request.get_json(silent=True) or {}
+        aggregate = body.get('aggregate', 'total')
+        if aggregate not in AGGREGATE_LEVELS:
+            abort(400, description=f"aggregate must be one of {list(AGGREGATE_LEVELS)}")
+        
+        df_inputs = load_inputs(body.get('result_key'), config.RESULTS_DIR)
+        if df_inputs is None:
+            abort(404, description="Unknown result or result saved without inputs")
+        
+        try:
+            grid = make_scenario_grid(body.get('shocks') or {}, max_scenarios=config.SCENARIO_MAX_SCENARIOS)
+        except (TypeError, ValueError) as e:
+            abort(400, description=str(e))
+        
+        output_rows = len(grid) * (len(df_inputs) if aggregate == 'row' else df_inputs['store'].nunique())
+        estimated_memory = (
+            min(len(grid) * len(df_inputs), config.SCENARIO_BATCH_ROWS) * SCENARIO_BYTES_PER_ROW
+            + len(grid) * len(df_inputs) * 8
+            + output_rows * 100
+        )
+        
+        try:
+            with admission.admit(estimated_memory):
+                result = run_scenarios(
+                    df_inputs,
+                    grid,
+                    relative=bool(body.get('relative', False)),
+                    aggregate=aggregate,
+                    batch_rows=config.SCENARIO_BATCH_ROWS,
+                    strategy=config.RECONCILIATION_STRATEGY,
+                )
+        except ServerBusyError as e:
+            abort(503, description=str(e))
+        except ValueError as e:
+            abort(400, description=str(e))
+        
+        if 'date' in result:
+            result['date'] = result['date'].dt.strftime('%Y-%m-%d')
+        
+        return jsonify({
+            'scenarios': len(grid),
+            'aggregate': aggregate,
+            'results': result.to_dict('records'),
+        })
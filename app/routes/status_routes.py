@@ -0,0 +1,35 @@
+"""
+Status Routes
+Monitoring endpoints for prediction jobs and readiness
+"""
+
+import os
+
+from flask import jsonify
+
+from utils.predictor import load_serving_artifacts
+from utils.warmup import get_readiness
+
+
+def register_status_routes(server, admission, single_flight):
+    """Register monitoring routes on the Flask server"""
+    
+    @server.route('/status/jobs', methods=['GET'])
+    def jobs_status():
+        """Return in-flight and queued prediction jobs of this process"""
+        
+        stats = admission.stats()
+        stats['coalesced'] = single_flight.stats()
+        stats['pid'] = os.getpid()
+        stats['model_version'] = load_serving_artifacts()['model_version']
+        return jsonify(stats)
+    
+    @server.route('/ready', methods=['GET'])
+    def ready():
+        """
+        Readiness of this process for load balancers: 200 once the models are
+        loaded and warmed up, 503 before (or if the warm-up failed)
+        """
+        
+        readiness = get_readiness()
+        return jsonify(readiness), 200 if readiness['status'] == 'ready' else 503
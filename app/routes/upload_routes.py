@@ -0,0 +1,55 @@
+"""
+Upload Routes
+Receive files in resumable chunks, spooled to a temporary file
+"""
+
+from flask import jsonify, request
+
+from app import config
+from utils.upload_store import (
+    UploadError,
+    UploadTooLargeError,
+    append_chunk,
+    get_received_size,
+    get_upload_path,
+)
+
+
+def register_upload_routes(server):
+    """Register chunked upload routes on the Flask server"""
+    
+    @server.route('/upload/<upload_id>', methods=['GET'])
+    def upload_status(upload_id):
+        """Return how many bytes were received, so the client can resume"""
+        
+        if get_upload_path(upload_id, config.UPLOAD_DIR) is None:
+            return jsonify({'error': 'Invalid upload id'}), 400
+        
+        return jsonify({'received': get_received_size(upload_id, config.UPLOAD_DIR)})
+    
+    
+    @server.route('/upload/<upload_id>', methods=['PUT'])
+    def upload_chunk(upload_id):
+        """Append the request body at the given offset"""
+        
+        try:
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid offset'}), 400
+        
+        try:
+            received = append_chunk(
+                upload_id,
+                offset,
+                request.stream,
+                max_size=config.MAX_UPLOAD_SIZE,
+                upload_dir=config.UPLOAD_DIR,
+            )
+        except UploadTooLargeError as e:
+            return jsonify({'error': str(e), 'received': e.received}), 413
+        except UploadError as e:
+            # 409: offset mismatch, the client resumes from 'received'
+            status = 409 if e.received is not None else 400
+            return jsonify({'error': str(e), 'received': e.received}), status
+        
+        return jsonify({'received': received})
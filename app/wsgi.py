@@ -0,0 +1,39 @@
+"""
+Production WSGI Entry Point
+
+Serve with a pre-fork server, e.g.:
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+
+With preload_app, this module is imported once in the parent process:
+the model bundle (models, historical stats and the cluster map) is loaded
+before the workers are forked, so every worker shares it copy-on-write.
+"""
+
+import gc
+import os
+
+from app import config
+
+# One LightGBM thread budget per worker, set before lightgbm is imported,
+# so WORKERS processes do not oversubscribe the cores
+os.environ.setdefault('OMP_NUM_THREADS', str(config.PREDICT_THREADS))
+
+from utils.model_reload import ensure_serving_files
+from utils.warmup import run_warmup
+
+# Models, stats and cluster map in one versioned bundle (rebuilt when the
+# loose files change), before the app reads its metadata
+ensure_serving_files()
+
+from app.main import server, logger
+
+# Each worker runs the synthetic warm-up prediction after the fork (see gunicorn.conf.py)
+run_warmup(predict=False)
+logger.info("Serving artifacts preloaded before forking workers")
+
+# Move everything loaded so far out of the garbage collector's reach, so
+# collections in the workers do not touch (and copy) the shared pages
+gc.collect()
+gc.freeze()
+
+application = server
@@ -0,0 +1,68 @@
+"""
+Script to compare the modeling approaches over several forecast origins
+
+Backtests the clustering, top-down and bottom-up approaches with LightGBM
+and Prophet (see utils/backtesting.py) and prints their RMSE, MAE and MAPE,
+overall and per origin. Fits are cached: a second run on the same history
+only fits new origins.
+
+Usage:
+    python backtest.py [--data data/stores-sales.csv] [--origins N] [--horizon N]
+                       [--models lightgbm,prophet] [--workers N] [--threads N] [--no-cache]
+"""
+
+import argparse
+
+from utils.backtesting import (
+    APPROACHES,
+    BACKTEST_CACHE_DIR,
+    BACKTEST_HORIZON_WEEKS,
+    BACKTEST_ORIGINS,
+    MODELS,
+    run_backtest,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the modeling approaches over several forecast origins")
+    parser.add_argument('--data', default='data/stores-sales.csv', help="Sales history CSV")
+    parser.add_argument('--origins', type=int, default=BACKTEST_ORIGINS, help="Forecast origins")
+    parser.add_argument('--horizon', type=int, default=BACKTEST_HORIZON_WEEKS, help="Weeks forecast from each origin")
+    parser.add_argument('--approaches', default=','.join(APPROACHES), help="Comma-separated approaches")
+    parser.add_argument('--models', default=','.join(MODELS), help="Comma-separated models")
+    parser.add_argument('--workers', type=int, default=None, help="Fit processes (default: one per core)")
+    parser.add_argument('--threads', type=int, default=None, help="LightGBM threads per process")
+    parser.add_argument('--cache-dir', default=BACKTEST_CACHE_DIR, help="Directory of the cached fits")
+    parser.add_argument('--no-cache', action='store_true', help="Fit everything again, without caching")
+    args = parser.parse_args()
+
+    print("="*80)
+    print("BACKTEST")
+    print("="*80)
+
+    report = run_backtest(
+        history_path=args.data,
+        n_origins=args.origins,
+        horizon_weeks=args.horizon,
+        approaches=args.approaches.split(','),
+        models=args.models.split(','),
+        n_workers=args.workers,
+        threads_per_worker=args.threads,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
+
+    print("\n" + "="*80)
+    print(f"{'approach':<12} {'model':<10} {'RMSE':>12} {'MAE':>12} {'MAPE':>8}")
+    for row in report['overall'].itertuples():
+        print(f"{row.approach:<12} {row.model:<10} {row.rmse:12,.2f} {row.mae:12,.2f} {row.mape:7.2f}%")
+
+    rmse_by_origin = report['by_origin'].pivot_table(index=['approach', 'model'], columns='origin', values='rmse')
+    print("\nRMSE per origin")
+    print(rmse_by_origin.rename(columns=lambda origin: f'{origin:%Y-%m-%d}').round(0).to_string())
+
+    print(f"\n{report['fits']} fits ({report['cached']} from the cache) in {report['seconds']:.2f}s")
+    print("="*80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark: bytes on the wire for a full session, with and without compression
+
+Replays a session with data/stores-sales.csv (6,435 rows) against the Flask
+test client: page load, chunked upload, prediction job, table and
+visualization callbacks. Each response is fetched once per Accept-Encoding.
+
+Usage (from the project root):
+    python benchmarks/bench_compression.py
+"""
+
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+from app.main import server
+from app import middleware
+
+
+CSV_PATH = 'data/stores-sales.csv'
+
+
+def _callback_payload(outputs, inputs, dependencies=None, state=()):
+    """
+    Build a Dash callback request body
+    
+    The callback id is looked up in dependencies when given, since outputs
+    declared with allow_duplicate carry a hash suffix.
+    """
+    output_specs = [{'id': id_, 'property': prop} for id_, prop in outputs]
+    output = ('..' + '...'.join(f'{id_}.{prop}' for id_, prop in outputs) + '..'
+              if len(outputs) > 1 else f'{outputs[0][0]}.{outputs[0][1]}')
+    for dependency in dependencies or []:
+        if re.sub(r'@[0-9a-f]+', '', dependency['output']) == output:
+            output = dependency['output']
+    return {
+        'output': output,
+        'outputs': output_specs if len(outputs) > 1 else output_specs[0],
+        'inputs': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in inputs],
+        'state': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in state],
+        'changedPropIds': [f'{id_}.{prop}' for id_, prop, _ in inputs],
+    }
+
+
+def run_session(client, headers):
+    """Replay a full session and return [(name, bytes)] for every response"""
+    sizes = []
+    
+    def record(name, response):
+        assert response.status_code == 200, f"{name}: HTTP {response.status_code}"
+        sizes.append((name, len(response.data)))
+        return response
+    
+    # Page load: index, scripts and Dash metadata
+    record('index', client.get('/', headers=headers))
+    html_text = client.get('/').data.decode('utf-8')
+    for src in re.findall(r'<script src="([^"]+)"', html_text):
+        record(src.split('?')[0].rsplit('/', 1)[-1], client.get(src, headers=headers))
+    record('_dash-layout', client.get('/_dash-layout', headers=headers))
+    record('_dash-dependencies', client.get('/_dash-dependencies', headers=headers))
+    dependencies = client.get('/_dash-dependencies').get_json()
+    
+    # Chunked upload
+    upload_id = uuid.uuid4().hex
+    with open(CSV_PATH, 'rb') as f:
+        data = f.read()
+    record('upload chunk', client.put(f'/upload/{upload_id}?offset=0', data=data, headers=headers))
+    
+    # Prediction job: start, then poll until done
+    response = record('process_upload', client.post(
+        '/_dash-update-component',
+        json=_callback_payload(
+            [('job-store', 'data'), ('job-poll-interval', 'disabled'),
+             ('cancel-job-button', 'disabled')],
+            [('upload-ticket-store', 'data',
+              {'upload_id': upload_id, 'filename': 'stores-sales.csv', 'size': len(data)})],
+            dependencies,
+        ),
+        headers=headers,
+    ))
+    job_id = _decode_json(response)['response']['job-store']['data']
+    
+    while True:
+        response = client.post(
+            '/_dash-update-component',
+            json=_callback_payload(
+                [('upload-status', 'children'), ('predictions-store', 'data'),
+                 ('result-key-store', 'data'), ('summary-stats', 'children'),
+                 ('stats-section', 'style'), ('job-progress-section', 'style'),
+                 ('job-progress', 'value'), ('job-stage', 'children'),
+                 ('job-poll-interval', 'disabled'), ('preview-key-store', 'data')],
+                [('job-store', 'data', job_id), ('job-poll-interval', 'n_intervals', 1)],
+                dependencies,
+                state=[('preview-key-store', 'data', None)],
+            ),
+            headers=headers,
+        )
+        result = _decode_json(response)['response']
+        if result['job-poll-interval']['disabled']:
+            break
+        time.sleep(0.2)
+    record('poll_job (result)', response)
+    predictions = result['predictions-store']['data']
+    
+    # Callbacks fed by the predictions store
+    record('update_predictions_page', client.post(
+        '/_dash-update-component',
+        json=_callback_payload(
+            [('predictions-table', 'data'), ('predictions-table', 'columns'),
+             ('predictions-table', 'page_count'), ('table-section', 'style'),
+             ('download-button', 'disabled'), ('table-edit-status', 'children'),
+             ('result-key-store', 'data'), ('predictions-store', 'data')],
+            [('result-key-store', 'data', result['result-key-store']['data']),
+             ('preview-key-store', 'data', None),
+             ('predictions-table', 'page_current', 0),
+             ('predictions-table', 'sort_by', []),
+             ('predictions-table', 'data_timestamp', None)],
+            dependencies,
+            state=[('predictions-table', 'data', []), ('predictions-table', 'page_size', 20)],
+        ),
+        headers=headers,
+    ))
+    record('update_visualizations', client.post(
+        '/_dash-update-component',
+        json=_callback_payload(
+            [('bar-plot', 'children'), ('total-timeseries', 'children'),
+             ('viz-series-store', 'data')],
+            [('predictions-store', 'data', predictions)],
+        ),
+        headers=headers,
+    ))
+    record('update_visualizations_selector', client.post(
+        '/_dash-update-component',
+        json=_callback_payload(
+            [('viz-store-selector', 'data'), ('viz-store-selector', 'value'),
+             ('viz-store-selector', 'disabled')],
+            [('predictions-store', 'data', predictions)],
+        ),
+        headers=headers,
+    ))
+    
+    return sizes
+
+
+def _decode_json(response):
+    """Decode a JSON response whatever its Content-Encoding"""
+    body = response.data
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    elif response.headers.get('Content-Encoding') == 'br':
+        body = middleware.brotli.decompress(body)
+    return json.loads(body)
+
+
+def main():
+    client = server.test_client()
+    
+    encodings = ['identity', 'gzip']
+    if middleware.brotli is not None:
+        encodings.append('br')
+    
+    results = {
+        encoding: run_session(client, {'Accept-Encoding': encoding})
+        for encoding in encodings
+    }
+    
+    print("\n" + "="*80)
+    print("BYTES ON THE WIRE - FULL SESSION (stores-sales.csv, 6,435 rows)")
+    print("="*80)
+    header = f"{'Response':<40}" + "".join(f"{encoding:>13}" for encoding in encodings)
+    print(header)
+    print("-"*len(header))
+    
+    names = [name for name, _ in results['identity']]
+    for i, name in enumerate(names):
+        row = f"{name[:39]:<40}" + "".join(f"{results[e][i][1]:>13,}" for e in encodings)
+        print(row)
+    
+    print("-"*len(header))
+    totals = {e: sum(size for _, size in results[e]) for e in encodings}
+    print(f"{'TOTAL':<40}" + "".join(f"{totals[e]:>13,}" for e in encodings))
+    for encoding in encodings[1:]:
+        reduction = 100 * (1 - totals[encoding] / totals['identity'])
+        print(f"  {encoding}: {reduction:.1f}% fewer bytes than uncompressed")
+    print("="*80)
+
+
+if __name__ == '__main__':
+    main()
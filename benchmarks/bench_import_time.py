@@ -0,0 +1,74 @@
+"""
+Benchmark: import time of the Dash app (process start to app ready to listen)
+
+Imports app.main in a fresh Python process with -X importtime, several
+times, and reports the best wall time, the heaviest top-level packages
+(self time summed over their modules) and whether the model stack
+(lightgbm, sklearn, joblib) was imported before the first request.
+
+Usage (from the project root):
+    python benchmarks/bench_import_time.py [repeats] [top]
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(PROJECT_ROOT)
+
+
+# Runs in the child process; prints a JSON line (the import profile goes to stderr)
+_CHILD = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': [name for name in ('lightgbm', 'sklearn', 'joblib', 'plotly.express') if name in sys.modules],
+}}))
+'''
+
+
+def _parse_importtime(stderr):
+    """Self time (s) of each top-level package, from the -X importtime lines"""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return packages
+
+
+def _run():
+    code = _CHILD.format(root=PROJECT_ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    run = json.loads(result.stdout.strip().splitlines()[-1])
+    run['packages'] = _parse_importtime(result.stderr)
+    return run
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    
+    runs = [_run() for _ in range(repeats)]
+    best = min(runs, key=lambda run: run['seconds'])
+    
+    print(f"import app.main: best {best['seconds']:.3f}s, "
+          f"median {sorted(run['seconds'] for run in runs)[len(runs) // 2]:.3f}s ({repeats} runs)")
+    print(f"Model stack imported at startup: {', '.join(best['loaded']) or 'none'}")
+    
+    print(f"\n{'package':<28} {'self time':>10}")
+    for package, seconds in sorted(best['packages'].items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<28} {seconds:9.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: cluster model loading, pickled LGBMRegressor vs native LightGBM text
+
+Each loader runs in a fresh Python process, several times, reporting the time
+to import the loader and load the models, and the peak resident memory of the
+process (ru_maxrss) before and after loading.
+
+Usage (from the project root, after python prepare_model.py):
+    python benchmarks/bench_model_loading.py [repeats]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+
+# Runs in the child process; prints a JSON line
+_CHILD = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from utils import model_loader
+imported = time.perf_counter()
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+models = {loader}
+loaded = time.perf_counter()
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+assert models, 'no models loaded'
+print(json.dumps({{
+    'import': imported - start,
+    'load': loaded - imported,
+    'rss_before_mb': rss_before / 1024,
+    'rss_after_mb': rss_after / 1024,
+}}))
+'''
+
+LOADERS = {
+    'pickle (joblib)': 'model_loader.load_pickled_cluster_models()',
+    'native (Booster)': 'model_loader.load_native_models()',
+}
+
+
+def _run(loader):
+    code = _CHILD.format(root=PROJECT_ROOT, loader=loader)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    
+    print(f"{'loader':<18} {'import':>8} {'load':>8} {'total':>8} {'peak RSS':>10} {'load RSS':>10}")
+    for name, loader in LOADERS.items():
+        runs = [_run(loader) for _ in range(repeats)]
+        best = min(runs, key=lambda run: run['import'] + run['load'])
+        print(f"{name:<18} {best['import']:7.3f}s {best['load']:7.3f}s {best['import'] + best['load']:7.3f}s "
+              f"{best['rss_after_mb']:8.1f}MB {best['rss_after_mb'] - best['rss_before_mb']:+8.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
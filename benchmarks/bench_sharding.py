@@ -0,0 +1,79 @@
+"""
+Benchmark: predict_sales in-process vs sharded across a process pool
+
+Builds a large input by repeating data/stores-sales.csv with shifted dates
+and store ids (so store/date pairs stay unique), predicts it in-process and with
+predict_sales_sharded for several worker counts, and checks that the
+predictions are identical.
+
+Usage (from the project root):
+    python benchmarks/bench_sharding.py [n_rows] [workers ...]
+    python benchmarks/bench_sharding.py 2000000 1 2 4
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.chdir(PROJECT_ROOT)
+
+import pandas as pd
+
+from utils.predictor import load_serving_artifacts, predict_sales
+from utils.sharding import get_shard_pool, predict_sales_sharded
+
+
+CSV_PATH = 'data/stores-sales.csv'
+DATE_SHIFTS = 10  # Copies shifted in time before store ids are shifted
+
+
+def build_input(n_rows):
+    """Repeat the sample file with shifted dates, then shifted store ids"""
+    df = pd.read_csv(CSV_PATH).drop(columns=['weekly_sales'])
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True)
+    span = df['date'].max() - df['date'].min() + pd.Timedelta(weeks=1)
+    
+    copies = -(-n_rows // len(df))
+    n_stores = df['store'].max()
+    parts = [
+        df.assign(date=df['date'] + (i % DATE_SHIFTS) * span, store=df['store'] + (i // DATE_SHIFTS) * n_stores)
+        for i in range(copies)
+    ]
+    df_big = pd.concat(parts, ignore_index=True).iloc[:n_rows]
+    df_big['date'] = df_big['date'].dt.strftime('%d-%m-%Y')
+    return df_big
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    worker_counts = [int(n) for n in sys.argv[2:]] or [1, 2, 4]
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_serving_artifacts()
+    df = build_input(n_rows)
+    print(f"{len(df):,} rows, {df['store'].nunique()} stores, {os.cpu_count()} CPU(s)\n")
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        expected = predict_sales(df)
+        baseline = time.perf_counter() - start
+    print(f"{'in-process':<14} {baseline:7.2f}s")
+    
+    for n_workers in worker_counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Start the pool (and load the models) outside the measurement
+            get_shard_pool(n_workers).submit(len, []).result()
+            start = time.perf_counter()
+            result = predict_sales_sharded(df, n_workers)
+            elapsed = time.perf_counter() - start
+        
+        identical = result.equals(expected)
+        print(f"{n_workers:>2} worker(s)    {elapsed:7.2f}s  x{baseline / elapsed:4.2f}  identical={identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for production serving
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+
+Tune with APP_BIND, APP_WORKERS, APP_THREADS and APP_PREDICT_THREADS
+(see app/config.py).
+"""
+
+from app import config as app_config
+
+bind = app_config.BIND
+workers = app_config.WORKERS
+threads = app_config.THREADS
+worker_class = 'gthread'
+
+# Import the app (and load the models) in the parent before forking
+preload_app = True
+
+# Predictions on large files can take a while
+timeout = 300
+graceful_timeout = 30
+
+
+def post_fork(server, worker):
+    """Warm up and watch the model files in each worker (threads do not survive the fork)"""
+    from utils.model_reload import start_model_watcher
+    from utils.warmup import start_warmup
+    start_warmup(predict=app_config.WARMUP_ENABLED)
+    start_model_watcher(app_config.MODEL_WATCH_INTERVAL)
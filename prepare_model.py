@@ -33,6 +33,19 @@ if missing:
     exit(1)
 else:
     print("\n All required files are present!")
+    
+    from utils.shared_artifacts import export_shared_artifacts
+    export_shared_artifacts()
+    
+    from utils.model_loader import export_native_models
+    export_native_models()
+    
+    from utils.model_bundle import build_bundle, load_bundle
+    build_bundle()
+    
+    # Read the bundle back: checks every section against its checksum
+    bundle = load_bundle()
+    print(f"  [OK] Model bundle {bundle['version']} verified")
 
 print("\n" + "="*80)
 print("VERIFICATION COMPLETED")
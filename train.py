@@ -0,0 +1,105 @@
+"""
+Script to train the cluster models outside the notebook
+
+Runs feature engineering, KMeans clustering and per-cluster LightGBM training
+(clusters trained concurrently), writes the models, datasets and metadata to
+models/ and data/, and builds the model bundle the app loads.
+
+With --tune N, first searches the LightGBM parameters (N trials scored by
+rolling-origin cross-validation on the train period); the chosen ones are
+used for training and recorded in the metadata and the model bundle.
+
+With --refresh, adds a CSV of new weeks to the sales history and continues
+the training of the current models on them, publishing only if the holdout
+metrics do not regress.
+
+Usage:
+    python train.py [--data data/stores-sales.csv] [--workers N] [--threads N]
+    python train.py --tune N [--folds N] [--fold-weeks N]
+    python train.py --refresh new_weeks.csv [--extra-trees N] [--holdout-weeks N]
+"""
+
+import argparse
+import time
+
+from utils.training import (
+    REFRESH_EXTRA_TREES,
+    REFRESH_HOLDOUT_WEEKS,
+    refresh_cluster_models,
+    run_training_pipeline,
+)
+from utils.tuning import TUNING_CACHE_DIR, TUNING_FOLD_WEEKS, TUNING_FOLDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the cluster models and build the model bundle")
+    parser.add_argument('--data', default='data/stores-sales.csv', help="Sales history CSV")
+    parser.add_argument('--models-dir', default='models', help="Directory of the models and metadata")
+    parser.add_argument('--data-dir', default='data', help="Directory of train.pkl, test.pkl and cluster_features.pkl")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Training processes (default: one per cluster, at most one per core)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="LightGBM threads per process (default: cores / processes)")
+    parser.add_argument('--tune', type=int, default=0, metavar='N_TRIALS',
+                        help="Search the LightGBM parameters with this many trials before training")
+    parser.add_argument('--folds', type=int, default=TUNING_FOLDS,
+                        help="Cross-validation folds of the search")
+    parser.add_argument('--fold-weeks', type=int, default=TUNING_FOLD_WEEKS,
+                        help="Weeks validated by each fold")
+    parser.add_argument('--tuning-cache', default=TUNING_CACHE_DIR,
+                        help="Directory of the cached LightGBM datasets of the folds")
+    parser.add_argument('--refresh', metavar='NEW_WEEKS_CSV', default=None,
+                        help="Continue the training of the current models on these new weeks")
+    parser.add_argument('--extra-trees', type=int, default=REFRESH_EXTRA_TREES,
+                        help="Trees added to each cluster model by a refresh")
+    parser.add_argument('--holdout-weeks', type=int, default=REFRESH_HOLDOUT_WEEKS,
+                        help="Most recent weeks held out to validate a refresh")
+    parser.add_argument('--tolerance', type=float, default=0.0,
+                        help="Accepted relative degradation of the holdout metrics (0.01 = 1%%)")
+    args = parser.parse_args()
+    
+    print("="*80)
+    print("MODEL REFRESH" if args.refresh else "TRAINING PIPELINE")
+    print("="*80)
+    
+    start = time.perf_counter()
+    if args.refresh:
+        report = refresh_cluster_models(
+            args.refresh,
+            history_path=args.data,
+            models_dir=args.models_dir,
+            data_dir=args.data_dir,
+            metadata_path=f'{args.models_dir}/model_metadata.json',
+            bundle_path=f'{args.models_dir}/model.bundle',
+            extra_trees=args.extra_trees,
+            holdout_weeks=args.holdout_weeks,
+            tolerance=args.tolerance,
+        )
+    else:
+        report = run_training_pipeline(
+            csv_path=args.data,
+            models_dir=args.models_dir,
+            data_dir=args.data_dir,
+            metadata_path=f'{args.models_dir}/model_metadata.json',
+            bundle_path=f'{args.models_dir}/model.bundle',
+            n_workers=args.workers,
+            threads_per_worker=args.threads,
+            n_trials=args.tune,
+            tuning_options={'n_folds': args.folds, 'fold_weeks': args.fold_weeks, 'cache_dir': args.tuning_cache},
+        )
+    total = time.perf_counter() - start
+    
+    print("\n" + "="*80)
+    if args.refresh:
+        print(f"{'Published' if report['published'] else 'Not published'}: {report['reason']}")
+    if report['bundle_version']:
+        print(f"Model bundle {report['bundle_version']}")
+    print(f"\n{'stage':<12} {'wall time':>10}")
+    for stage, seconds in report['timings'].items():
+        print(f"{stage:<12} {seconds:9.2f}s")
+    print(f"{'total':<12} {total:9.2f}s")
+    print("="*80)
+
+
+if __name__ == '__main__':
+    main()
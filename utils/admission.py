@@ -0,0 +1,149 @@
+"""
+Module for admission control of prediction jobs
+Bounds the number of jobs running at once and the memory they are expected
+to use, queues the others for a limited time and rejects work fast when
+the queue is full
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Peak memory of a job measured at ~15x the CSV size (parsed frame, features,
+# prediction frame), plus the records sent to the browser
+MEMORY_PER_FILE_BYTE = 20
+MIN_JOB_MEMORY = 32 * 1024 * 1024
+
+
+class ServerBusyError(Exception):
+    """Raised when a job cannot be admitted (queue full or wait timed out)"""
+
+
+def estimate_job_memory(file_size):
+    """
+    Estimate the peak memory of a prediction job from the uploaded file size
+    
+    Args:
+        file_size: Size of the CSV file in bytes
+    
+    Returns:
+        int: Estimated bytes
+    """
+    return max(MIN_JOB_MEMORY, int(file_size or 0) * MEMORY_PER_FILE_BYTE)
+
+
+class AdmissionController:
+    """
+    Concurrency limiter aware of the estimated memory of each job
+    
+    A job is admitted when fewer than max_concurrent jobs are running and its
+    estimate fits in the remaining memory budget. A job larger than the whole
+    budget is admitted only when nothing else is running. Waiting jobs are
+    served in arrival order; a job is rejected right away when max_queue jobs
+    are already waiting, or after queue_timeout seconds in the queue.
+    """
+    
+    def __init__(self, max_concurrent, memory_budget, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._memory_in_use = 0
+        self._queue = []  # Tickets of waiting jobs, in arrival order
+        self._admitted_total = 0
+        self._rejected_total = 0
+    
+    def _can_run(self, ticket, estimated_bytes):
+        if not self._queue or self._queue[0] is not ticket:
+            return False
+        if self._in_flight >= self.max_concurrent:
+            return False
+        if self._in_flight == 0:
+            return True
+        return self._memory_in_use + estimated_bytes <= self.memory_budget
+    
+    def _reject(self, message):
+        self._rejected_total += 1
+        raise ServerBusyError(message)
+    
+    def acquire(self, estimated_bytes):
+        """
+        Wait for a slot, then reserve it
+        
+        Raises:
+            ServerBusyError: If the queue is full or the wait timed out
+        """
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self._reject(
+                    f"Server busy: {self._in_flight} job(s) running and "
+                    f"{len(self._queue)} waiting. Please try again in a moment."
+                )
+            
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while not self._can_run(ticket, estimated_bytes):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(
+                            f"Server busy: no capacity freed up within "
+                            f"{self.queue_timeout:.0f}s. Please try again in a moment."
+                        )
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # The head of the queue changed: let the next job re-check
+                self._condition.notify_all()
+            
+            self._in_flight += 1
+            self._memory_in_use += estimated_bytes
+            self._admitted_total += 1
+    
+    def release(self, estimated_bytes):
+        """Free a slot reserved by acquire"""
+        with self._condition:
+            self._in_flight -= 1
+            self._memory_in_use -= estimated_bytes
+            self._condition.notify_all()
+    
+    @contextmanager
+    def admit(self, estimated_bytes):
+        """
+        Run a block as an admitted job
+        
+        Args:
+            estimated_bytes: Estimated peak memory (see estimate_job_memory)
+        
+        Raises:
+            ServerBusyError: If the job is not admitted
+        """
+        self.acquire(estimated_bytes)
+        try:
+            yield
+        finally:
+            self.release(estimated_bytes)
+    
+    def stats(self):
+        """
+        Return the current state for monitoring
+        
+        Returns:
+            dict: In-flight and queued counts, memory reserved and limits
+        """
+        with self._condition:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'memory_in_use': self._memory_in_use,
+                'memory_budget': self.memory_budget,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted_total': self._admitted_total,
+                'rejected_total': self._rejected_total,
+            }
@@ -0,0 +1,344 @@
+"""
+Module for the backtesting of the modeling approaches
+Evaluates the approaches of notebooks/data_modeling.ipynb over several
+forecast origins instead of a single split:
+    - clustering: one model per store cluster (LightGBM on store rows,
+      Prophet on the cluster series split between its stores)
+    - top_down: one model of the total series, split between clusters then stores
+    - bottom_up: one model per cluster series, split between its stores
+At each origin, the stores are clustered and the shares computed on the weeks
+before it, and the next horizon_weeks weeks are forecast.
+
+Series forecasts are split between the stores with the top-down
+reconciliation of utils/reconciliation.py, in proportion to their sales
+before the origin.
+
+Fits are independent (origin x level x group x model): they run in a pool
+of processes, and their predictions are cached on disk (joblib.Memory), so
+a new run only fits what changed (new origins as the history grows).
+"""
+
+import os
+import time
+import tempfile
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import create_features, get_feature_columns
+from utils.reconciliation import Hierarchy, top_down
+from utils.training import LGBM_PARAMS, _init_worker, cluster_stores
+
+
+APPROACHES = ('clustering', 'top_down', 'bottom_up')
+MODELS = ('lightgbm', 'prophet')
+
+BACKTEST_ORIGINS = 6
+BACKTEST_HORIZON_WEEKS = 4
+BACKTEST_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_backtest')
+
+# Level each approach fits each model at
+APPROACH_LEVELS = {
+    'clustering': {'lightgbm': 'store', 'prophet': 'cluster'},
+    'top_down': {'lightgbm': 'total', 'prophet': 'total'},
+    'bottom_up': {'lightgbm': 'cluster', 'prophet': 'cluster'},
+}
+
+# Aggregation of the store rows into a cluster or total series
+AGGREGATIONS = {
+    'weekly_sales': 'sum', 'temperature': 'mean', 'fuel_Price': 'mean',
+    'cpi': 'mean', 'unemployment': 'mean', 'holiday_flag': 'max',
+}
+
+# Prophet setup of the notebook
+PROPHET_REGRESSORS = ['temperature', 'fuel_Price', 'unemployment']
+PROPHET_HOLIDAYS = [
+    ('superbowl', '2010-02-12', 0), ('superbowl', '2011-02-11', 0), ('superbowl', '2012-02-10', 0),
+    ('labourday', '2010-09-10', 0), ('labourday', '2011-09-09', 0), ('labourday', '2012-09-07', 0),
+    ('thanksgiving', '2010-11-26', 0), ('thanksgiving', '2011-11-25', 0), ('thanksgiving', '2012-11-23', 0),
+    ('christmas', '2010-12-24', 7), ('christmas', '2011-12-23', 7), ('christmas', '2012-12-21', 7),
+]
+
+
+def forecast_origins(dates, n_origins=BACKTEST_ORIGINS, horizon_weeks=BACKTEST_HORIZON_WEEKS):
+    """
+    First forecast week of each origin, every horizon_weeks weeks up to the last week
+    
+    Returns:
+        list: Timestamps, oldest first
+    
+    Raises:
+        ValueError: If the history has fewer weeks than the origins cover
+    """
+    weeks = np.sort(pd.Series(dates).unique())
+    if len(weeks) <= n_origins * horizon_weeks:
+        raise ValueError(f"{len(weeks)} weeks of features, more than {n_origins * horizon_weeks} needed "
+                         f"for {n_origins} origins of {horizon_weeks} weeks")
+    return [pd.Timestamp(weeks[len(weeks) - i * horizon_weeks]) for i in range(n_origins, 0, -1)]
+
+
+def aggregate_series(history, groups=None):
+    """
+    Sum the store series into one series per group
+    
+    Args:
+        history: Sales history (store rows)
+        groups: Series store -> group id, or None for the total (group 0)
+    
+    Returns:
+        DataFrame: Rows of the history columns, 'store' holding the group id,
+                   ready for create_features
+    """
+    df = history.copy()
+    df['store'] = df['store'].map(groups) if groups is not None else 0
+    df = df.dropna(subset=['store'])
+    df['store'] = df['store'].astype(int)
+    return df.groupby(['store', 'date']).agg(AGGREGATIONS).reset_index()
+
+
+def _prophet_holidays():
+    return pd.DataFrame([
+        {'holiday': name, 'ds': pd.Timestamp(day), 'lower_window': 0, 'upper_window': upper}
+        for name, day, upper in PROPHET_HOLIDAYS
+    ])
+
+
+def _fit_predict(model_name, train_rows, test_rows, feature_cols, params, threads=None):
+    """
+    Fit one model and predict the test rows (cached by joblib.Memory, threads ignored)
+    
+    Returns:
+        np.ndarray: Predictions, in the order of test_rows
+    """
+    if model_name == 'lightgbm':
+        import lightgbm as lgb
+        
+        model = lgb.LGBMRegressor(**params, n_jobs=threads)
+        model.fit(train_rows[feature_cols], train_rows['weekly_sales'])
+        return model.predict(test_rows[feature_cols])
+    
+    import logging
+    from prophet import Prophet
+    
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    model = Prophet(holidays=_prophet_holidays(), yearly_seasonality=True,
+                    weekly_seasonality=False, daily_seasonality=False)
+    for regressor in PROPHET_REGRESSORS:
+        model.add_regressor(regressor)
+    model.fit(train_rows[['date', 'weekly_sales'] + PROPHET_REGRESSORS].rename(
+        columns={'date': 'ds', 'weekly_sales': 'y'}))
+    forecast = model.predict(test_rows[['date'] + PROPHET_REGRESSORS].rename(columns={'date': 'ds'}))
+    return forecast['yhat'].to_numpy()
+
+
+def _run_fit(key, model_name, train_rows, test_rows, feature_cols, params, threads, cache_dir):
+    """Run one fit through the cache (runs in a pool process)"""
+    args = (model_name, train_rows, test_rows, feature_cols, params, threads)
+    if cache_dir is None:
+        return key, _fit_predict(*args), False
+    
+    from joblib import Memory
+    
+    fit_predict = Memory(cache_dir, verbose=0).cache(_fit_predict, ignore=['threads'])
+    cached = fit_predict.check_call_in_cache(*args)
+    return key, fit_predict(*args), cached
+
+
+def _origin_fits(origin, horizon_weeks, history, features, models, approaches):
+    """
+    Fits of one origin and what is needed to turn their predictions into store forecasts
+    
+    Returns:
+        tuple: (fits, context)
+            fits: {key: (model_name, train_rows, test_rows, feature_cols)},
+                  key = (origin, level, group, model_name)
+            context: store test rows with their cluster and the weight of
+                     their store (sales before the origin)
+    """
+    end = origin + pd.Timedelta(weeks=horizon_weeks)
+    train = features[features['date'] < origin]
+    test = features[(features['date'] >= origin) & (features['date'] < end)]
+    
+    # Clusters and shares from the weeks before the origin only
+    cluster_features, _ = cluster_stores(train)
+    store_cluster = cluster_features.set_index('store')['cluster']
+    train = train.assign(cluster=train['store'].map(store_cluster))
+    context = test.assign(cluster=test['store'].map(store_cluster)).dropna(subset=['cluster'])
+    context['cluster'] = context['cluster'].astype(int)
+    context['weight'] = context['store'].map(train.groupby('store')['weekly_sales'].sum())
+    
+    # Aggregated series, with their lags computed on the full weekly history
+    store_cols = get_feature_columns()
+    series_cols = [col for col in store_cols if col != 'store']
+    history = history[history['date'] < end]
+    series = {
+        'cluster': create_features(aggregate_series(history, store_cluster)),
+        'total': create_features(aggregate_series(history)),
+    }
+    
+    fits = {}
+    for approach in approaches:
+        for model_name in models:
+            level = APPROACH_LEVELS[approach][model_name]
+            if level == 'store':
+                for cluster_id in sorted(context['cluster'].unique()):
+                    fits[(origin, level, cluster_id, model_name)] = (
+                        model_name, train[train['cluster'] == cluster_id],
+                        context[context['cluster'] == cluster_id], store_cols,
+                    )
+                continue
+            
+            rows = series[level]
+            for group, group_rows in rows.groupby('store'):
+                fits[(origin, level, int(group), model_name)] = (
+                    model_name, group_rows[group_rows['date'] < origin],
+                    group_rows[group_rows['date'] >= origin], series_cols,
+                )
+    return fits, context
+
+
+def _store_forecasts(approach, model_name, origin, context, predictions):
+    """Store forecasts of one approach and model at one origin, from the fit predictions"""
+    level = APPROACH_LEVELS[approach][model_name]
+    rows = context[['date', 'store', 'cluster', 'weekly_sales']].copy()
+    
+    if level == 'store':
+        rows['pred'] = np.nan
+        for cluster_id in rows['cluster'].unique():
+            mask = (rows['cluster'] == cluster_id).to_numpy()
+            rows.loc[mask, 'pred'] = predictions[(origin, level, cluster_id, model_name)]
+    else:
+        # Series forecasts as a (groups x weeks) matrix, split with the historical shares
+        hierarchy = Hierarchy.from_rows(rows)
+        _, mask, weeks, cells = hierarchy.to_matrix(rows['store'], rows['date'], 0.0)
+        groups = hierarchy.clusters if level == 'cluster' else np.array([0])
+        
+        upper = np.zeros((len(groups), len(weeks)))
+        for (fit_origin, fit_level, group, fit_model), prediction in predictions.items():
+            if (fit_origin, fit_level, fit_model) != (origin, level, model_name) or group not in groups:
+                continue
+            values, dates = prediction
+            known = np.isin(dates, weeks)
+            upper[np.searchsorted(groups, group), np.searchsorted(weeks, dates[known])] = values[known]
+        
+        weights = context.drop_duplicates('store').set_index('store')['weight'].reindex(hierarchy.stores)
+        store_forecasts = top_down(hierarchy, upper, weights.to_numpy(), mask, level)
+        rows['pred'] = Hierarchy.from_matrix(store_forecasts, cells)
+    
+    rows['origin'] = origin
+    rows['approach'] = approach
+    rows['model'] = model_name
+    return rows
+
+
+def metrics_table(results, by=('approach', 'model')):
+    """
+    RMSE, MAE and MAPE of the forecasts, per group
+    
+    Args:
+        results: Forecasts with weekly_sales and pred columns
+        by: Columns of the groups
+    
+    Returns:
+        DataFrame: One row per group, sorted by RMSE
+    """
+    by = list(by)
+    error = results['pred'].to_numpy() - results['weekly_sales'].to_numpy()
+    errors = results[by].assign(
+        rmse=error ** 2,
+        mae=np.abs(error),
+        mape=np.abs(error / results['weekly_sales'].to_numpy()) * 100,
+        rows=1,
+    )
+    table = errors.groupby(by).agg({'rmse': 'mean', 'mae': 'mean', 'mape': 'mean', 'rows': 'sum'})
+    table['rmse'] = np.sqrt(table['rmse'])
+    return table.sort_values('rmse').reset_index()
+
+
+def run_backtest(history_path='data/stores-sales.csv', n_origins=BACKTEST_ORIGINS,
+                 horizon_weeks=BACKTEST_HORIZON_WEEKS, approaches=APPROACHES, models=MODELS,
+                 n_workers=None, threads_per_worker=None, cache_dir=BACKTEST_CACHE_DIR, params=None):
+    """
+    Forecast the horizon_weeks weeks after each origin with every approach and model
+    
+    Args:
+        history_path: Sales history CSV
+        n_origins, horizon_weeks: Forecast origins (see forecast_origins)
+        approaches, models: Combinations to evaluate (Prophet is skipped if
+                            it is not installed)
+        n_workers: Fit processes (default: one per core; 1 = fit in this process)
+        threads_per_worker: LightGBM threads of each process (default: the
+                            cores shared between the processes)
+        cache_dir: Directory of the cached fits (None = no cache)
+        params: LGBMRegressor parameters (default: LGBM_PARAMS)
+    
+    Returns:
+        dict: {'predictions': store forecasts of every origin, approach and model,
+               'overall': metrics_table by approach and model,
+               'by_origin': metrics_table by approach, model and origin,
+               'fits', 'cached', 'seconds'}
+    """
+    params = params or LGBM_PARAMS
+    models = list(models)
+    if 'prophet' in models and importlib.util.find_spec('prophet') is None:
+        print("Prophet is not installed, its approaches are skipped")
+        models.remove('prophet')
+    
+    start = time.perf_counter()
+    history = pd.read_csv(history_path, parse_dates=['date'], dayfirst=True)
+    features = create_features(history)
+    origins = forecast_origins(features['date'], n_origins, horizon_weeks)
+    print(f"{n_origins} origins from {origins[0]:%Y-%m-%d} to {origins[-1]:%Y-%m-%d}, "
+          f"{horizon_weeks} weeks forecast from each")
+    
+    fits, contexts = {}, {}
+    for origin in origins:
+        origin_fits, contexts[origin] = _origin_fits(origin, horizon_weeks, history, features, models, approaches)
+        fits.update(origin_fits)
+    
+    cores = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = cores
+    n_workers = max(1, min(n_workers, len(fits)))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cores // n_workers)
+    
+    print(f"Running {len(fits)} fits with {n_workers} processes x {threads_per_worker} threads...")
+    tasks = [(key, *fit, params, threads_per_worker, cache_dir) for key, fit in fits.items()]
+    if n_workers == 1:
+        results = [_run_fit(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+        ) as pool:
+            futures = [pool.submit(_run_fit, *task) for task in tasks]
+            results = [future.result() for future in as_completed(futures)]
+    
+    predictions = {}
+    n_cached = 0
+    for key, values, cached in results:
+        level = key[1]
+        # Series fits keep their dates, to be matched with the store rows
+        predictions[key] = values if level == 'store' else (values, fits[key][2]['date'].to_numpy())
+        n_cached += cached
+    print(f"  {n_cached} fits from the cache, {len(fits) - n_cached} computed")
+    
+    forecasts = pd.concat([
+        _store_forecasts(approach, model_name, origin, contexts[origin], predictions)
+        for origin in origins for approach in approaches for model_name in models
+    ], ignore_index=True)
+    
+    return {
+        'predictions': forecasts,
+        'overall': metrics_table(forecasts),
+        'by_origin': metrics_table(forecasts, ('approach', 'model', 'origin')),
+        'fits': len(fits),
+        'cached': n_cached,
+        'seconds': time.perf_counter() - start,
+    }
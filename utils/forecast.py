@@ -0,0 +1,264 @@
+"""
+Module for multi-horizon forecasts from a sales history
+Future rows are generated internally: a weekly calendar grid for every store,
+with exogenous values filled by configurable policies. Predictions run
+recursively: each week's predictions feed the lag and rolling features of the
+next week, for all stores at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import create_features, get_feature_columns
+from utils.predictor import historical_store_weights, load_serving_artifacts, map_store_clusters
+from utils.reconciliation import DEFAULT_STRATEGY, STRATEGIES, reconcile_predictions
+
+
+EXOGENOUS_COLUMNS = ['holiday_flag', 'temperature', 'fuel_Price', 'cpi', 'unemployment']
+
+# Exogenous fill policies: last observed value of the store, or its value one season earlier
+POLICIES = ('last', 'seasonal')
+DEFAULT_POLICIES = {
+    'holiday_flag': 'seasonal',
+    'temperature': 'seasonal',
+    'fuel_Price': 'last',
+    'cpi': 'last',
+    'unemployment': 'last',
+}
+
+SEASON_WEEKS = 52
+MAX_FORECAST_WEEKS = 156
+
+# Sales state features, computed from the last SEASON_WEEKS weekly sales of each store
+LAGS = [1, 2, 4, 52]
+ROLLING_WINDOWS = [4, 12, 26]
+STATE_FEATURES = [f'lag_{lag}' for lag in LAGS] + [f'rolling_mean_{w}' for w in ROLLING_WINDOWS] + ['rolling_std_4']
+
+
+def prepare_history(df_history):
+    """
+    Turn a sales history into per-store windows of the last SEASON_WEEKS weeks
+    
+    Args:
+        df_history: DataFrame with columns [store, date, weekly_sales] and the
+                    exogenous columns
+    
+    Returns:
+        dict: {
+            'stores': store ids (sorted),
+            'last_date': last date of the history,
+            'sales': (stores, SEASON_WEEKS) weekly sales, oldest first,
+            'exogenous': {column: (stores, SEASON_WEEKS) values},
+        }
+        Weeks missing for a store are NaN.
+    
+    Raises:
+        ValueError: If the history has no sales
+    """
+    if 'weekly_sales' not in df_history.columns:
+        raise ValueError("The sales history must contain a 'weekly_sales' column")
+    
+    df = df_history[['store', 'date', 'weekly_sales'] + EXOGENOUS_COLUMNS].copy()
+    df['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
+    df = df.dropna(subset=['date', 'weekly_sales']).drop_duplicates(['store', 'date'], keep='last')
+    if df.empty:
+        raise ValueError("The sales history has no valid rows")
+    
+    # Last SEASON_WEEKS dates of the history, as columns
+    dates = np.sort(df['date'].unique())[-SEASON_WEEKS:]
+    df = df[df['date'].isin(dates)]
+    stores = np.sort(df['store'].unique())
+    
+    def window(column):
+        values = df.pivot(index='store', columns='date', values=column).reindex(index=stores, columns=dates)
+        padded = np.full((len(stores), SEASON_WEEKS), np.nan)
+        padded[:, SEASON_WEEKS - len(dates):] = values.to_numpy(dtype=np.float64)
+        return padded
+    
+    return {
+        'stores': stores,
+        'last_date': pd.Timestamp(dates[-1]),
+        'sales': window('weekly_sales'),
+        'exogenous': {column: window(column) for column in EXOGENOUS_COLUMNS},
+    }
+
+
+def build_future_grid(history, weeks, policies=None, overrides=None):
+    """
+    Generate the future rows of every store with their exogenous values
+    
+    Args:
+        history: Result of prepare_history
+        weeks: Number of weeks to forecast
+        policies: {column: 'last' | 'seasonal'}, defaults to DEFAULT_POLICIES
+        overrides: Optional DataFrame with a 'date' column (YYYY-MM-DD), an optional 'store'
+                   column (rows without store apply to all stores) and values
+                   for some exogenous columns; NaN keeps the policy value
+    
+    Returns:
+        DataFrame: [store, date] + EXOGENOUS_COLUMNS, sorted by store and date
+    
+    Raises:
+        ValueError: For an unknown policy or override outside the forecast
+    """
+    policies = {**DEFAULT_POLICIES, **(policies or {})}
+    unknown = {column: policy for column, policy in policies.items()
+               if column not in EXOGENOUS_COLUMNS or policy not in POLICIES}
+    if unknown:
+        raise ValueError(f"Invalid policies {unknown}. Columns: {EXOGENOUS_COLUMNS}, policies: {list(POLICIES)}")
+    
+    stores = history['stores']
+    dates = pd.date_range(history['last_date'] + pd.Timedelta(weeks=1), periods=weeks, freq='7D')
+    
+    df_future = pd.DataFrame({
+        'store': np.repeat(stores, weeks),
+        'date': np.tile(dates, len(stores)),
+    })
+    
+    # Values of the store one season before each future week (the window is exactly one season)
+    season_index = np.arange(weeks) % SEASON_WEEKS
+    for column in EXOGENOUS_COLUMNS:
+        values = history['exogenous'][column]
+        last = pd.DataFrame(values).ffill(axis=1).to_numpy()[:, -1]
+        last = np.where(np.isnan(last), np.nanmedian(last), last)  # Stores never observed
+        
+        if policies[column] == 'seasonal':
+            filled = values[:, season_index]
+            filled = np.where(np.isnan(filled), last[:, None], filled)
+        else:
+            filled = np.repeat(last[:, None], weeks, axis=1)
+        
+        df_future[column] = filled.ravel()
+    
+    if overrides is not None and len(overrides) > 0:
+        df_future = _apply_overrides(df_future, overrides, stores)
+    
+    return df_future
+
+
+def _apply_overrides(df_future, overrides, stores):
+    """Replace policy values by the non-null values of the overrides"""
+    overrides = overrides.copy()
+    columns = [column for column in overrides.columns if column in EXOGENOUS_COLUMNS]
+    overrides['date'] = pd.to_datetime(overrides['date'], format='ISO8601', errors='coerce')
+    
+    outside = ~overrides['date'].isin(df_future['date'])
+    if outside.any():
+        raise ValueError(f"{outside.sum()} override(s) outside the forecast dates "
+                         f"({df_future['date'].min():%Y-%m-%d} to {df_future['date'].max():%Y-%m-%d})")
+    
+    # Rows without store apply to every store, then store-specific rows
+    if 'store' not in overrides.columns:
+        overrides['store'] = np.nan
+    all_stores = overrides['store'].isna()
+    expanded = overrides[all_stores].drop(columns='store').merge(pd.DataFrame({'store': stores}), how='cross')
+    
+    df_future = df_future.set_index(['store', 'date'])
+    for rows in (expanded, overrides[~all_stores]):
+        rows = rows.astype({'store': df_future.index.levels[0].dtype})
+        df_future.update(rows.groupby(['store', 'date'])[columns].last())
+    return df_future.reset_index()
+
+
+def _state_features(sales):
+    """
+    Lag and rolling features of the next week from the sales windows
+    
+    Args:
+        sales: (stores, SEASON_WEEKS) weekly sales, oldest first
+    
+    Returns:
+        np.ndarray: (stores, len(STATE_FEATURES)), NaN where a store lacks history
+    """
+    lags = [sales[:, -lag] for lag in LAGS]
+    means = [np.nanmean(sales[:, -window:], axis=1) for window in ROLLING_WINDOWS]
+    std = np.nanstd(sales[:, -4:], axis=1, ddof=1)
+    return np.column_stack(lags + means + [std])
+
+
+def forecast_sales(df_history, weeks, policies=None, overrides=None, strategy=DEFAULT_STRATEGY):
+    """
+    Forecast the next weeks of every store of a sales history, recursively
+    
+    Args:
+        df_history: DataFrame with columns [store, date, weekly_sales] and the
+                    exogenous columns
+        weeks: Number of weeks to forecast (1 to MAX_FORECAST_WEEKS)
+        policies: Exogenous fill policies (see build_future_grid)
+        overrides: Exogenous overrides (see build_future_grid)
+        strategy: Reconciliation of the forecasts, one of STRATEGIES (see
+                  utils/reconciliation.py); the recursion feeds on the
+                  forecasts as predicted
+    
+    Returns:
+        DataFrame with columns [store, date, predicted_sales, cluster, horizon]
+        + EXOGENOUS_COLUMNS, sorted by cluster, store and date
+    
+    Raises:
+        ValueError: For invalid weeks, policies, overrides or strategy, or an
+                    exogenous column that can not be filled (no value in the history)
+    """
+    if not 1 <= weeks <= MAX_FORECAST_WEEKS:
+        raise ValueError(f"weeks must be between 1 and {MAX_FORECAST_WEEKS}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reconciliation strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    
+    artifacts = load_serving_artifacts()
+    history = prepare_history(df_history)
+    df_future = build_future_grid(history, weeks, policies, overrides)
+    
+    # A column never observed in the history has no value to fill the future with
+    unfilled = [column for column in EXOGENOUS_COLUMNS if df_future[column].isna().any()]
+    if unfilled:
+        raise ValueError(f"No value to forecast with for {unfilled}: the history has none "
+                         f"for some stores and weeks; provide them as overrides")
+    
+    # Calendar features of the whole grid at once; the imputed lags are the
+    # fallback of stores with too little history
+    df_features = create_features(df_future, artifacts['historical_stats'])
+    feature_cols = get_feature_columns()
+    n_stores = len(history['stores'])
+    if len(df_features) != n_stores * weeks:
+        raise ValueError(f"{n_stores * weeks - len(df_features)} future rows lost in feature engineering")
+    X = df_features[feature_cols].to_numpy(dtype=np.float64).reshape(n_stores, weeks, len(feature_cols))
+    state_idx = [feature_cols.index(column) for column in STATE_FEATURES]
+    fallback = X[:, 0, state_idx]
+    
+    clusters = map_store_clusters(pd.Series(history['stores']), artifacts['store_cluster_map']).fillna(0).astype(int)
+    clusters = clusters.to_numpy()
+    cluster_models = artifacts['cluster_models']
+    if cluster_models is None:
+        groups = [(artifacts['global_model'], np.ones(n_stores, dtype=bool))]
+    else:
+        groups = [(cluster_models[c], clusters == c) for c in np.unique(clusters) if c in cluster_models]
+    
+    print(f"Forecasting {weeks} weeks for {n_stores} stores "
+          f"from {history['last_date']:%Y-%m-%d}...")
+    sales = history['sales'].copy()
+    predictions = np.full((n_stores, weeks), np.nan)
+    
+    for h in range(weeks):
+        state = _state_features(sales)
+        X[:, h, state_idx] = np.where(np.isnan(state), fallback, state)
+        
+        for model, mask in groups:
+            predictions[mask, h] = model.predict(X[mask, h, :])
+        
+        # The predictions become the latest week of sales
+        sales = np.column_stack([sales[:, 1:], predictions[:, h]])
+    
+    df_forecast = df_future.copy()
+    df_forecast['predicted_sales'] = predictions.ravel()
+    df_forecast['cluster'] = np.repeat(clusters, weeks)
+    df_forecast['horizon'] = np.tile(np.arange(1, weeks + 1), n_stores)
+    df_forecast = df_forecast.dropna(subset=['predicted_sales'])  # Clusters without model
+    df_forecast = reconcile_predictions(
+        df_forecast, historical_store_weights(df_forecast['store'], artifacts), strategy
+    )
+    
+    print(f"{len(df_forecast)} forecasts generated successfully")
+    return (
+        df_forecast[['store', 'date', 'predicted_sales', 'cluster', 'horizon'] + EXOGENOUS_COLUMNS]
+        .sort_values(['cluster', 'store', 'date'], kind='stable')
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,220 @@
+"""
+Module to run prediction jobs in the background
+Job status is kept in small JSON files so that any server process can report
+progress, and cancellation is requested with a flag file that the job checks
+between stages
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+import threading
+
+
+DEFAULT_JOBS_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_jobs')
+STALE_JOB_SECONDS = 6 * 3600  # Status files of finished jobs are removed after 6 hours
+MIN_WRITE_INTERVAL = 0.25  # Seconds between two progress writes within a stage
+
+# Pipeline stages: (name, label, share of the overall progress)
+STAGES = [
+    ('decode', 'Reading file', 0.15),
+    ('validate', 'Validating data', 0.05),
+    ('preview', 'Scoring a preview sample', 0.05),
+    ('features', 'Building features', 0.25),
+    ('predict', 'Predicting', 0.40),
+    ('aggregate', 'Saving results', 0.10),
+]
+
+# Final states
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+_JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation was requested"""
+
+
+def _stage_bounds():
+    bounds = {}
+    start = 0.0
+    for name, label, share in STAGES:
+        bounds[name] = (start, start + share, label)
+        start += share
+    return bounds
+
+
+_STAGE_BOUNDS = _stage_bounds()
+
+
+def _job_path(job_id, jobs_dir, suffix):
+    if not job_id or not _JOB_ID_PATTERN.match(job_id):
+        return None
+    return os.path.join(jobs_dir, f'{job_id}{suffix}')
+
+
+def _write_status(job_id, jobs_dir, status):
+    """Write the status file atomically"""
+    path = _job_path(job_id, jobs_dir, '.json')
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def _prune_stale_jobs(jobs_dir):
+    """Remove job files not updated for STALE_JOB_SECONDS"""
+    now = time.time()
+    for name in os.listdir(jobs_dir):
+        path = os.path.join(jobs_dir, name)
+        try:
+            if now - os.path.getmtime(path) > STALE_JOB_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def create_job(jobs_dir=DEFAULT_JOBS_DIR, **fields):
+    """
+    Create a job in the 'queued' state
+    
+    Args:
+        jobs_dir: Directory holding the job files
+        **fields: Extra fields stored in the status (e.g. filename)
+    
+    Returns:
+        str: Job id (32 hex characters)
+    """
+    os.makedirs(jobs_dir, exist_ok=True)
+    _prune_stale_jobs(jobs_dir)
+    
+    job_id = uuid.uuid4().hex
+    status = {
+        'state': 'queued',
+        'stage': None,
+        'label': 'Waiting for a free slot',
+        'progress': 0.0,
+        'message': None,
+    }
+    status.update(fields)
+    _write_status(job_id, jobs_dir, status)
+    touch_job(job_id, jobs_dir)
+    return job_id
+
+
+def get_job(job_id, jobs_dir=DEFAULT_JOBS_DIR):
+    """
+    Read the status of a job
+    
+    Returns:
+        dict: Status, or None if the job does not exist
+    """
+    path = _job_path(job_id, jobs_dir, '.json')
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def update_job(job_id, jobs_dir=DEFAULT_JOBS_DIR, **fields):
+    """Merge fields into the status of a job"""
+    status = get_job(job_id, jobs_dir) or {}
+    status.update(fields)
+    _write_status(job_id, jobs_dir, status)
+
+
+def request_cancel(job_id, jobs_dir=DEFAULT_JOBS_DIR):
+    """Ask a job to stop at its next checkpoint"""
+    status_path = _job_path(job_id, jobs_dir, '.json')
+    if status_path is not None and os.path.exists(status_path):
+        open(_job_path(job_id, jobs_dir, '.cancel'), 'w').close()
+
+
+def touch_job(job_id, jobs_dir=DEFAULT_JOBS_DIR):
+    """Record that a client is still following the job"""
+    path = _job_path(job_id, jobs_dir, '.seen')
+    if path is None:
+        return
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        open(path, 'w').close()
+
+
+class JobProgress:
+    """
+    Progress reporter passed to the pipeline of a job
+    
+    Calling it with a stage name and the fraction of the stage completed
+    updates the status file (throttled within a stage), then raises
+    JobCancelled if cancellation was requested or if no client followed the
+    job for abandon_timeout seconds.
+    """
+    
+    def __init__(self, job_id, jobs_dir=DEFAULT_JOBS_DIR, abandon_timeout=None):
+        self.job_id = job_id
+        self.jobs_dir = jobs_dir
+        self.abandon_timeout = abandon_timeout
+        self._stage = None
+        self._last_write = 0.0
+    
+    def cancel_reason(self):
+        """Return why the job should stop, or None"""
+        if os.path.exists(_job_path(self.job_id, self.jobs_dir, '.cancel')):
+            return 'Cancelled by user'
+        if self.abandon_timeout is not None:
+            try:
+                last_seen = os.path.getmtime(_job_path(self.job_id, self.jobs_dir, '.seen'))
+            except OSError:
+                last_seen = 0
+            if time.time() - last_seen > self.abandon_timeout:
+                return 'Abandoned (no client followed the job)'
+        return None
+    
+    def check_cancelled(self):
+        """
+        Raises:
+            JobCancelled: If the job should stop
+        """
+        reason = self.cancel_reason()
+        if reason is not None:
+            raise JobCancelled(reason)
+    
+    def __call__(self, stage, fraction=0.0):
+        self.check_cancelled()
+        
+        now = time.monotonic()
+        if stage == self._stage and now - self._last_write < MIN_WRITE_INTERVAL:
+            return
+        
+        start, end, label = _STAGE_BOUNDS[stage]
+        fraction = min(max(fraction, 0.0), 1.0)
+        update_job(
+            self.job_id,
+            self.jobs_dir,
+            state='running',
+            stage=stage,
+            label=label,
+            progress=round(start + (end - start) * fraction, 4),
+        )
+        self._stage = stage
+        self._last_write = now
+
+
+def start_job(target, *args):
+    """
+    Run target(*args) in a daemon thread
+    
+    The target is responsible for writing the final state of its job.
+    """
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
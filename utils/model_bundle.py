@@ -0,0 +1,292 @@
+"""
+Module to package everything serving needs into one versioned bundle file
+The bundle holds the cluster models (LightGBM text format), the store
+statistics and cluster map arrays, the feature list and the model metadata.
+A JSON manifest at the start of the file lists every section with its
+sha256; the bundle version is derived from these hashes, so any change of
+content gives a new version. The whole file is loaded with one sequential read.
+
+Layout: magic (8 bytes) | format (uint32) | manifest length (uint64) |
+        manifest (JSON) | sections
+"""
+
+import io
+import os
+import json
+import struct
+import hashlib
+from datetime import date
+
+import numpy as np
+
+from utils.model_loader import file_sha256, get_model_version, load_cluster_models
+from utils.preprocessing import get_feature_columns
+from utils.shared_artifacts import NO_CLUSTER, build_store_arrays
+
+
+DEFAULT_BUNDLE_PATH = 'models/model.bundle'
+
+BUNDLE_MAGIC = b'SSBUNDLE'
+BUNDLE_FORMAT = 1
+_HEADER = struct.Struct('<8sIQ')
+
+STORE_STATS_SECTION = 'store_stats.npy'
+STORE_CLUSTER_SECTION = 'store_cluster.npy'
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is unreadable, corrupt or incompatible with the code"""
+
+
+def _array_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _model_string(model):
+    # lgb.Booster, or a LGBMRegressor wrapping one
+    booster = getattr(model, 'booster_', model)
+    return booster.model_to_string()
+
+
+def _source_fingerprint(models_dir, train_data_path, cluster_features_path, metadata_path):
+    """Identify the content of the loose source files (models, data, metadata) of a bundle"""
+    fingerprint = hashlib.sha256(get_model_version(models_dir, metadata_path).encode())
+    for path in (train_data_path, cluster_features_path, metadata_path):
+        if os.path.exists(path):
+            fingerprint.update(f'{path}:{file_sha256(path)};'.encode())
+    return fingerprint.hexdigest()
+
+
+def _bundle_metadata(metadata_path, cluster_models, store_cluster, features):
+    """Hand-written metadata, with the facts that can be derived from the content"""
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    
+    stores = np.flatnonzero(store_cluster != NO_CLUSTER)
+    training_info = dict(metadata.get('training_info', {}))
+    training_info.update({
+        'n_clusters': len(cluster_models),
+        'n_features': len(features),
+        'stores_range': f'{stores.min()}-{stores.max()}' if len(stores) else 'N/A',
+    })
+    metadata['training_info'] = training_info
+    return metadata
+
+
+def build_bundle(bundle_path=DEFAULT_BUNDLE_PATH,
+                 models_dir='models',
+                 train_data_path='data/train.pkl',
+                 cluster_features_path='data/cluster_features.pkl',
+                 metadata_path='models/model_metadata.json'):
+    """
+    Build the bundle from the loose model, data and metadata files
+    
+    Returns:
+        str: Version of the bundle, e.g. '1.0.0+3f2a9c1d5e7b'
+    """
+    import lightgbm as lgb
+    
+    cluster_models = load_cluster_models(models_dir)
+    store_stats, store_cluster = build_store_arrays(train_data_path, cluster_features_path)
+    features = get_feature_columns()
+    
+    sections = [
+        (f'models/{cluster_id}.txt', _model_string(model).encode('utf-8'))
+        for cluster_id, model in sorted(cluster_models.items())
+    ]
+    sections += [
+        (STORE_STATS_SECTION, _array_bytes(store_stats)),
+        (STORE_CLUSTER_SECTION, _array_bytes(store_cluster)),
+    ]
+    
+    entries = []
+    offset = 0
+    for name, data in sections:
+        entries.append({'name': name, 'offset': offset, 'size': len(data),
+                        'sha256': hashlib.sha256(data).hexdigest()})
+        offset += len(data)
+    
+    metadata = _bundle_metadata(metadata_path, cluster_models, store_cluster, features)
+    content_hash = hashlib.sha256(json.dumps(
+        {'sections': [(e['name'], e['sha256']) for e in entries], 'features': features, 'metadata': metadata},
+        sort_keys=True,
+    ).encode()).hexdigest()
+    
+    manifest = {
+        'version': f"{metadata.get('version', 'unversioned')}+{content_hash[:12]}",
+        'built': date.today().isoformat(),
+        'lightgbm_version': lgb.__version__,
+        'source_fingerprint': _source_fingerprint(models_dir, train_data_path, cluster_features_path, metadata_path),
+        'features': features,
+        'metadata': metadata,
+        'clusters': sorted(cluster_models),
+        'sections': entries,
+    }
+    manifest_bytes = json.dumps(manifest, indent=2).encode('utf-8')
+    
+    # Write then rename, so loaders never read a partial bundle (one temporary
+    # file per process, as several workers may rebuild it at once)
+    os.makedirs(os.path.dirname(bundle_path) or '.', exist_ok=True)
+    tmp_path = f'{bundle_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(manifest_bytes)))
+        f.write(manifest_bytes)
+        for _, data in sections:
+            f.write(data)
+    os.replace(tmp_path, bundle_path)
+    
+    print(f"Model bundle {manifest['version']} written to {bundle_path} "
+          f"({_HEADER.size + len(manifest_bytes) + offset:,} bytes)")
+    return manifest['version']
+
+
+def _parse_header(data, bundle_path):
+    """Return (manifest, payload offset) from the start of a bundle"""
+    if len(data) < _HEADER.size:
+        raise BundleError(f"{bundle_path} is not a model bundle (too short)")
+    magic, bundle_format, manifest_size = _HEADER.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise BundleError(f"{bundle_path} is not a model bundle")
+    if bundle_format != BUNDLE_FORMAT:
+        raise BundleError(f"{bundle_path} has format {bundle_format}, this code reads format {BUNDLE_FORMAT}")
+    
+    try:
+        manifest = json.loads(bytes(data[_HEADER.size:_HEADER.size + manifest_size]))
+    except ValueError as e:
+        raise BundleError(f"{bundle_path} has a corrupt manifest: {e}")
+    return manifest, _HEADER.size + manifest_size
+
+
+def read_bundle_manifest(bundle_path=DEFAULT_BUNDLE_PATH):
+    """
+    Read the manifest of a bundle without loading its content
+    
+    Returns:
+        dict: Manifest, or None if there is no bundle
+    
+    Raises:
+        BundleError: If the file is not a readable bundle
+    """
+    if not os.path.exists(bundle_path):
+        return None
+    
+    with open(bundle_path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size and header[:len(BUNDLE_MAGIC)] == BUNDLE_MAGIC:
+            header += f.read(_HEADER.unpack(header)[2])
+    return _parse_header(header, bundle_path)[0]
+
+
+def load_bundle(bundle_path=DEFAULT_BUNDLE_PATH):
+    """
+    Load a bundle in one read and verify the checksum of every section
+    
+    Returns:
+        dict: {
+            'version': bundle version,
+            'manifest': manifest,
+            'cluster_models': {cluster_id: lgb.Booster},
+            'store_stats': store-indexed stats array,
+            'store_cluster': store-indexed cluster array,
+        }
+    
+    Raises:
+        BundleError: If the bundle is corrupt or was built for other features
+    """
+    import lightgbm as lgb
+    
+    with open(bundle_path, 'rb') as f:
+        data = memoryview(f.read())
+    
+    manifest, payload_start = _parse_header(data, bundle_path)
+    
+    if manifest['features'] != get_feature_columns():
+        raise BundleError(f"{bundle_path} was built for other features than this code computes")
+    
+    sections = {}
+    for entry in manifest['sections']:
+        start = payload_start + entry['offset']
+        section = data[start:start + entry['size']]
+        if len(section) != entry['size'] or hashlib.sha256(section).hexdigest() != entry['sha256']:
+            raise BundleError(f"{bundle_path}: checksum mismatch for section '{entry['name']}'")
+        sections[entry['name']] = section
+    
+    bundle = {
+        'version': manifest['version'],
+        'manifest': manifest,
+        'cluster_models': {
+            cluster_id: lgb.Booster(model_str=bytes(sections[f'models/{cluster_id}.txt']).decode('utf-8'))
+            for cluster_id in manifest['clusters']
+        },
+        'store_stats': np.load(io.BytesIO(sections[STORE_STATS_SECTION]), allow_pickle=False),
+        'store_cluster': np.load(io.BytesIO(sections[STORE_CLUSTER_SECTION]), allow_pickle=False),
+    }
+    print(f"Model bundle {bundle['version']} loaded from {bundle_path} "
+          f"({len(bundle['cluster_models'])} cluster models)")
+    return bundle
+
+
+def ensure_bundle(bundle_path=DEFAULT_BUNDLE_PATH,
+                  models_dir='models',
+                  train_data_path='data/train.pkl',
+                  cluster_features_path='data/cluster_features.pkl',
+                  metadata_path='models/model_metadata.json'):
+    """
+    Build the bundle if it is missing or was built from other loose source files
+    
+    Sources are compared by content, so files copied in with their original
+    modification times (rsync -a, cp -p) are picked up. Without source files
+    (e.g. a deployment shipping only the bundle), the existing bundle is kept.
+    
+    Returns:
+        bool: True if a bundle is available
+    """
+    try:
+        manifest = read_bundle_manifest(bundle_path)
+    except BundleError:
+        manifest = None
+    
+    sources = [train_data_path, cluster_features_path]
+    if not all(os.path.exists(path) for path in sources):
+        return manifest is not None
+    
+    fingerprint = _source_fingerprint(models_dir, train_data_path, cluster_features_path, metadata_path)
+    if manifest is not None and manifest.get('source_fingerprint') == fingerprint:
+        return True
+    
+    try:
+        build_bundle(bundle_path, models_dir, train_data_path, cluster_features_path, metadata_path)
+        return True
+    except Exception as e:
+        print(f"Error building model bundle: {e}")
+        return manifest is not None
+
+
+def get_bundle_metadata(bundle_path=DEFAULT_BUNDLE_PATH):
+    """
+    Model metadata of the bundle, for display
+    
+    Returns:
+        dict: Metadata with 'bundle_version' and 'bundle_built', or None if
+              there is no readable bundle
+    """
+    try:
+        manifest = read_bundle_manifest(bundle_path)
+    except BundleError as e:
+        print(f"Error reading model bundle: {e}")
+        return None
+    if manifest is None:
+        return None
+    return bundle_display_metadata(manifest)
+
+
+def bundle_display_metadata(manifest):
+    """Model metadata of a bundle manifest, with 'bundle_version' and 'bundle_built'"""
+    metadata = dict(manifest['metadata'])
+    metadata['bundle_version'] = manifest['version']
+    metadata['bundle_built'] = manifest['built']
+    return metadata
@@ -1,10 +1,20 @@
 """
 Module to load optimal model and cluster models
+Cluster models are exported in LightGBM's native text format (see
+export_native_models) and loaded as Booster objects when the export is up to
+date, without unpickling sklearn estimators.
+
+joblib and lightgbm are imported on first use: importing this module (e.g.
+to read the metadata for the layout) does not load them.
 """
 
-import joblib
 import os
 import json
+import hashlib
+
+
+DEFAULT_NATIVE_DIR = 'models/native'
+NATIVE_MANIFEST_FILE = 'manifest.json'
 
 
 def load_optimal_model(model_path='models/best_sales_model.pkl'):
@@ -29,6 +39,8 @@ def load_optimal_model(model_path='models/best_sales_model.pkl'):
             "Run notebook 06_Comparison_Final.ipynb first to generate the model."
         )
     
+    import joblib
+    
     model_info = joblib.load(model_path)
     print(f"Optimal model loaded: {model_info['approach']} + {model_info['model']}")
     print(f"  RMSE: {model_info['rmse']:.2f}")
@@ -36,13 +48,33 @@ def load_optimal_model(model_path='models/best_sales_model.pkl'):
     return model_info
 
 
-def load_cluster_models(models_dir='models'):
+def load_cluster_models(models_dir='models', native_dir=DEFAULT_NATIVE_DIR):
     """
     Load all LightGBM models by cluster
     
+    The native export is used when it matches the pickled models (or when
+    they are absent), the pickles otherwise.
+    
+    Returns:
+        dict: {cluster_id: model} (lgb.Booster or LGBMRegressor, both with
+              predict(X))
+    """
+    native_models = load_native_models(native_dir, models_dir)
+    if native_models is not None:
+        return native_models
+    
+    return load_pickled_cluster_models(models_dir)
+
+
+def load_pickled_cluster_models(models_dir='models'):
+    """
+    Load the pickled LGBMRegressor of every cluster
+    
     Returns:
-        dict: {cluster_id: model}
+        dict: {cluster_id: LGBMRegressor}
     """
+    import joblib
+    
     cluster_models = {}
     
     # Look for lgb_cluster_*.pkl files
@@ -62,6 +94,146 @@ def load_cluster_models(models_dir='models'):
     return cluster_models
 
 
+def _has_pickled_models(models_dir):
+    return os.path.isdir(models_dir) and any(
+        filename.startswith('lgb_cluster_') and filename.endswith('.pkl')
+        for filename in os.listdir(models_dir)
+    )
+
+
+def _read_native_manifest(native_dir):
+    try:
+        with open(os.path.join(native_dir, NATIVE_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def export_native_models(models_dir='models', native_dir=DEFAULT_NATIVE_DIR):
+    """
+    Export every cluster booster in LightGBM's native text format
+    
+    native_dir receives one lgb_cluster_<id>.txt per cluster and a manifest
+    recording the version of the pickled models they come from.
+    
+    Args:
+        models_dir: Directory of the pickled lgb_cluster_*.pkl models
+        native_dir: Directory receiving the text models
+    """
+    import lightgbm as lgb
+    
+    os.makedirs(native_dir, exist_ok=True)
+    cluster_models = load_pickled_cluster_models(models_dir)
+    
+    files = {}
+    for cluster_id, model in sorted(cluster_models.items()):
+        filename = f'lgb_cluster_{cluster_id}.txt'
+        path = os.path.join(native_dir, filename)
+        # Write then rename, so loaders never parse a partial file
+        model.booster_.save_model(f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+        files[str(cluster_id)] = filename
+    
+    manifest = {
+        'source_version': get_model_version(models_dir),
+        'lightgbm_version': lgb.__version__,
+        'clusters': files,
+    }
+    manifest_path = os.path.join(native_dir, NATIVE_MANIFEST_FILE)
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    
+    print(f"{len(files)} cluster models exported to {native_dir} (LightGBM text format)")
+
+
+def ensure_native_models(models_dir='models', native_dir=DEFAULT_NATIVE_DIR):
+    """
+    Export the native models if they are missing or do not match the pickles
+    
+    Returns:
+        bool: True if up-to-date native models are available
+    """
+    if not _has_pickled_models(models_dir):
+        return _read_native_manifest(native_dir) is not None
+    
+    manifest = _read_native_manifest(native_dir)
+    if manifest is not None and manifest.get('source_version') == get_model_version(models_dir):
+        return True
+    
+    try:
+        export_native_models(models_dir, native_dir)
+        return True
+    except Exception as e:
+        print(f"Error exporting native models: {e}")
+        return False
+
+
+def load_native_models(native_dir=DEFAULT_NATIVE_DIR, models_dir='models'):
+    """
+    Load the native text models as lgb.Booster objects
+    
+    Returns:
+        dict: {cluster_id: lgb.Booster}, or None if there is no export or if
+              it does not match the pickled models of models_dir
+    """
+    manifest = _read_native_manifest(native_dir)
+    if manifest is None:
+        return None
+    
+    import lightgbm as lgb
+    
+    if _has_pickled_models(models_dir) and manifest.get('source_version') != get_model_version(models_dir):
+        print(f"Native models in {native_dir} are out of date, loading pickled models")
+        return None
+    
+    # One sequential read per file; model_file= would scan each file a second time
+    cluster_models = {}
+    for cluster_id, filename in manifest['clusters'].items():
+        with open(os.path.join(native_dir, filename), 'r', encoding='utf-8') as f:
+            cluster_models[int(cluster_id)] = lgb.Booster(model_str=f.read())
+    print(f"{len(cluster_models)} cluster models loaded from {native_dir} (LightGBM text format)")
+    return cluster_models
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """sha256 hex digest of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_model_version(models_dir='models', metadata_path='models/model_metadata.json'):
+    """
+    Identify the deployed models
+    
+    Combines the metadata version with the name and content hash of every
+    cluster model file, so replacing a model file changes the version even
+    if the metadata is not updated (and whatever its modification time).
+    
+    Returns:
+        str: e.g. '1.0.0+3f2a9c1d'
+    """
+    version = 'unversioned'
+    if os.path.exists(metadata_path):
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                version = json.load(f).get('version', version)
+        except (OSError, ValueError):
+            pass
+    
+    fingerprint = hashlib.sha256()
+    if os.path.isdir(models_dir):
+        for filename in sorted(os.listdir(models_dir)):
+            if filename.startswith('lgb_cluster_') and filename.endswith('.pkl'):
+                digest = file_sha256(os.path.join(models_dir, filename))
+                fingerprint.update(f'{filename}:{digest};'.encode())
+    
+    return f'{version}+{fingerprint.hexdigest()[:8]}'
+
+
 def get_model_metadata(metadata_path='models/model_metadata.json'):
     """
     Load and return model metadata from JSON file
@@ -0,0 +1,216 @@
+"""
+Module to reload the serving models without restarting the server
+New artifacts are loaded and checked with a warm-up prediction while the
+current ones keep serving, then swapped in with one reference assignment
+(see swap_serving_artifacts): requests already running finish on the
+version they started with.
+
+Each server process holds its own artifacts, so each runs a ModelWatcher
+that polls the model files and reloads them when they change.
+"""
+
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.model_bundle import ensure_bundle
+from utils.model_loader import ensure_native_models
+from utils.predictor import build_serving_artifacts, load_serving_artifacts, predict_sales, swap_serving_artifacts
+from utils.shared_artifacts import NO_CLUSTER, ensure_shared_artifacts
+
+
+# Files and directories whose changes trigger a reload
+WATCHED_PATHS = ('models', 'data/train.pkl', 'data/cluster_features.pkl')
+
+# Exogenous values of the warm-up rows (typical values of the training data)
+WARMUP_VALUES = {
+    'temperature': 70.0,
+    'fuel_Price': 3.5,
+    'cpi': 190.0,
+    'unemployment': 7.0,
+    'holiday_flag': 0,
+}
+
+_reload_lock = threading.Lock()
+_watcher = None
+
+
+def ensure_serving_files():
+    """
+    Build the model bundle from the loose files if they changed, or the loose
+    serving files (shared arrays, native models) when no bundle can be built
+    """
+    if not ensure_bundle():
+        # Stats and cluster map as memory-mapped arrays, one physical copy for all workers
+        ensure_shared_artifacts()
+        
+        # Cluster models in LightGBM's text format, loaded without unpickling
+        ensure_native_models()
+
+
+def model_files_signature(paths=WATCHED_PATHS):
+    """
+    Name, size and modification time of the watched files
+    
+    Returns:
+        tuple: Comparable signature, changed by any write to the files
+    """
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, filename) for filename in sorted(os.listdir(path))]
+        else:
+            files = [path]
+        
+        for file_path in files:
+            # Temporary files of atomic writes come and go
+            if file_path.endswith('.tmp') or not os.path.isfile(file_path):
+                continue
+            stat = os.stat(file_path)
+            signature.append((file_path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def _warmup_input(artifacts):
+    """One row per known store, dated this week"""
+    store_cluster_map = artifacts['store_cluster_map']
+    if isinstance(store_cluster_map, np.ndarray):
+        stores = np.flatnonzero(store_cluster_map != NO_CLUSTER)
+    else:
+        stores = np.array(sorted(store_cluster_map), dtype=np.int64)
+    
+    df = pd.DataFrame({'store': stores, 'date': pd.Timestamp.today().normalize()})
+    for column, value in WARMUP_VALUES.items():
+        df[column] = value
+    return df
+
+
+def warm_up(artifacts):
+    """
+    Predict one week of every store with the given artifacts
+    
+    Runs every model once (first calls are slower) and checks that the
+    artifacts work together before they serve requests.
+    
+    Raises:
+        ValueError: If some stores get no prediction or a non-finite one
+    """
+    df_sample = _warmup_input(artifacts)
+    df_predictions = predict_sales(df_sample, artifacts=artifacts)
+    
+    predictions = df_predictions['predicted_sales'].to_numpy(dtype=np.float64)
+    n_valid = int(np.isfinite(predictions).sum())
+    if len(predictions) != len(df_sample) or n_valid != len(df_sample):
+        raise ValueError(f"Warm-up gave {n_valid} valid predictions for {len(df_sample)} stores")
+
+
+def reload_serving_artifacts(force=False):
+    """
+    Load the model files, warm them up and swap them in
+    
+    The current artifacts serve requests until the swap. Reloads of a process
+    run one at a time.
+    
+    Args:
+        force: Swap even if the model version did not change
+    
+    Returns:
+        dict: {'previous_version', 'version', 'reloaded', 'seconds'}
+    
+    Raises:
+        Exception: Any error of loading or warm-up; the current artifacts are kept
+    """
+    with _reload_lock:
+        start = time.time()
+        previous_version = load_serving_artifacts()['model_version']
+        
+        ensure_serving_files()
+        artifacts = build_serving_artifacts()
+        
+        reloaded = force or artifacts['model_version'] != previous_version
+        if reloaded:
+            warm_up(artifacts)
+            swap_serving_artifacts(artifacts)
+            print(f"Serving models reloaded: {previous_version} -> {artifacts['model_version']} "
+                  f"(pid {os.getpid()})")
+        
+        return {
+            'previous_version': previous_version,
+            'version': artifacts['model_version'],
+            'reloaded': reloaded,
+            'seconds': round(time.time() - start, 3),
+        }
+
+
+class ModelWatcher:
+    """Poll the model files and reload the serving artifacts when they change"""
+    
+    def __init__(self, interval, paths=WATCHED_PATHS):
+        """
+        Args:
+            interval: Seconds between two polls
+            paths: Files and directories to watch
+        """
+        self.interval = interval
+        self.paths = paths
+        self._signature = model_files_signature(paths)
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start polling in a daemon thread"""
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
+    
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            signature = model_files_signature(self.paths)
+            if signature == self._signature:
+                pending = None
+                continue
+            
+            # Reload once the files stopped changing for a poll (copies in progress)
+            if signature != pending:
+                pending = signature
+                continue
+            
+            try:
+                reload_serving_artifacts()
+            except Exception as e:
+                print(f"Model reload failed, still serving the current models: {e}")
+            
+            # Files written by the reload (the rebuilt bundle) are part of the new state;
+            # after a failure, the next change of the files triggers a new attempt
+            self._signature = model_files_signature(self.paths)
+            pending = None
+
+
+def start_model_watcher(interval):
+    """
+    Start the model watcher of this process
+    
+    Call it in each server process after forking (threads do not survive a fork).
+    
+    Args:
+        interval: Seconds between two polls (0 = no watcher)
+    
+    Returns:
+        ModelWatcher, or None if disabled
+    """
+    global _watcher
+    
+    if interval <= 0:
+        return None
+    if _watcher is None:
+        _watcher = ModelWatcher(interval)
+        _watcher.start()
+        print(f"Watching model files every {interval}s (pid {os.getpid()})")
+    return _watcher
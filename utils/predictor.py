@@ -2,11 +2,20 @@
 Module for making predictions
 """
 
+import os
+import threading
 import pandas as pd
 import numpy as np
-import lightgbm as lgb
 from utils.preprocessing import create_features, get_feature_columns, load_historical_stats
-from utils.model_loader import load_cluster_models
+from utils.model_loader import load_cluster_models, get_model_metadata, get_model_version
+from utils.model_bundle import DEFAULT_BUNDLE_PATH, BundleError, bundle_display_metadata, get_bundle_metadata, load_bundle
+from utils.reconciliation import DEFAULT_STRATEGY, STRATEGIES, reconcile_predictions
+from utils.shared_artifacts import NO_CLUSTER, load_shared_artifacts, lookup_by_store, stats_to_array
+
+
+# Serving artifacts, loaded once per process (see load_serving_artifacts)
+_serving_artifacts = None
+_serving_artifacts_lock = threading.Lock()
 
 
 # Load store to cluster mapping
@@ -28,20 +37,211 @@ def load_store_clusters(cluster_features_path='data/cluster_features.pkl'):
         return {i: i % 4 for i in range(1, 46)}  # 45 stores distributed over 4 clusters
 
 
-def predict_sales(df_input):
+def map_store_clusters(stores, store_cluster_map):
+    """
+    Map store ids to cluster ids
+    
+    Args:
+        stores: Series of store ids
+        store_cluster_map: {store_id: cluster_id} or a store-indexed array
+                           (see utils/shared_artifacts.py)
+    
+    Returns:
+        Series of cluster ids (NaN for stores without cluster)
+    """
+    if isinstance(store_cluster_map, np.ndarray):
+        clusters = lookup_by_store(store_cluster_map, stores, NO_CLUSTER)
+        return pd.Series(clusters, index=stores.index).where(clusters != NO_CLUSTER)
+    return stores.map(store_cluster_map)
+
+
+def _train_global_model(feature_cols, train_data_path='data/train.pkl'):
+    """Train a single LightGBM model on all stores (fallback without cluster models)"""
+    import lightgbm as lgb
+    
+    try:
+        train_data = pd.read_pickle(train_data_path)
+        print(f"Training data loaded: {len(train_data)} rows")
+        
+        model = lgb.LGBMRegressor(n_estimators=100, random_state=42, verbose=-1)
+        model.fit(train_data[feature_cols], train_data['weekly_sales'])
+        print("Global model trained")
+        return model
+    except Exception as e:
+        raise ValueError(f"Cannot load training data: {e}")
+
+
+def build_serving_artifacts():
+    """
+    Load everything needed to serve predictions from disk
+    
+    Returns:
+        dict: {
+            'cluster_models': {cluster_id: model} or None,
+            'global_model': model trained on all stores if cluster models are missing,
+            'historical_stats': store-indexed stats array (or dict if not exported),
+            'store_cluster_map': store-indexed cluster array (or dict if not exported),
+            'model_version': version of the bundle (see utils/model_bundle.py),
+                             or of the loose models (see get_model_version),
+            'model_metadata': metadata of these models, for display
+        }
+    
+    Everything comes from the model bundle when it exists. Otherwise the
+    loose files are used: historical stats and the cluster map are
+    memory-mapped from the shared arrays of utils/shared_artifacts.py when
+    they exist, so every worker process reads the same physical pages.
+    """
+    if os.path.exists(DEFAULT_BUNDLE_PATH):
+        try:
+            bundle = load_bundle(DEFAULT_BUNDLE_PATH)
+            return {
+                'cluster_models': bundle['cluster_models'],
+                'global_model': None,
+                'historical_stats': bundle['store_stats'],
+                'store_cluster_map': bundle['store_cluster'],
+                'model_version': bundle['version'],
+                'model_metadata': bundle_display_metadata(bundle['manifest']),
+            }
+        except BundleError as e:
+            print(f"Model bundle rejected, using the loose model files: {e}")
+    
+    try:
+        cluster_models = load_cluster_models()
+        global_model = None
+        model_version = get_model_version()
+    except FileNotFoundError:
+        print("Cluster models not found, training global model...")
+        cluster_models = None
+        global_model = _train_global_model(get_feature_columns())
+        model_version = f'{get_model_version()}-global'
+    
+    shared = load_shared_artifacts()
+    if shared is not None:
+        historical_stats = shared['store_stats']
+        store_cluster_map = shared['store_cluster']
+    else:
+        historical_stats = load_historical_stats()
+        store_cluster_map = load_store_clusters()
+    
+    return {
+        'cluster_models': cluster_models,
+        'global_model': global_model,
+        'historical_stats': historical_stats,
+        'store_cluster_map': store_cluster_map,
+        'model_version': model_version,
+        'model_metadata': get_model_metadata(),
+    }
+
+
+def load_serving_artifacts():
+    """
+    Return the serving artifacts of this process, loaded on first use
+    
+    Called before forking worker processes (see app/wsgi.py) so that all
+    workers share these objects copy-on-write. Callers should fetch them
+    once per request: a reload (see swap_serving_artifacts) replaces the
+    whole dict, so a request that holds it finishes on its version.
+    
+    Returns:
+        dict: See build_serving_artifacts
+    """
+    global _serving_artifacts
+    
+    if _serving_artifacts is not None:
+        return _serving_artifacts
+    
+    with _serving_artifacts_lock:
+        if _serving_artifacts is None:
+            _serving_artifacts = build_serving_artifacts()
+    
+    return _serving_artifacts
+
+
+def swap_serving_artifacts(artifacts):
+    """
+    Replace the serving artifacts of this process
+    
+    The swap is a single reference assignment: requests already running keep
+    the dict they fetched, new requests get the new one.
+    
+    Args:
+        artifacts: Dict as returned by build_serving_artifacts
+    
+    Returns:
+        dict: Previous serving artifacts (None if none were loaded)
+    """
+    global _serving_artifacts
+    
+    with _serving_artifacts_lock:
+        previous = _serving_artifacts
+        _serving_artifacts = artifacts
+    return previous
+
+
+def _no_progress(stage, fraction=0.0):
+    """Default progress callback of predict_sales"""
+
+
+def get_served_model_metadata():
+    """
+    Metadata of the models this process serves now, for display
+    
+    Follows reloads (see swap_serving_artifacts). Until the models are
+    loaded, the metadata of the files on disk, without loading them.
+    
+    Returns:
+        dict: Model metadata, with 'serving_version' once models are loaded
+    """
+    artifacts = _serving_artifacts
+    if artifacts is None:
+        return get_bundle_metadata() or get_model_metadata()
+    return {**artifacts['model_metadata'], 'serving_version': artifacts['model_version']}
+
+
+def historical_store_weights(stores, artifacts):
+    """
+    Historical mean weekly sales of stores, the weights of the reconciliation
+    
+    Returns:
+        pd.Series indexed by store (NaN for stores without history)
+    """
+    stores = np.unique(np.asarray(stores, dtype=np.int64))
+    historical_stats = artifacts['historical_stats']
+    if not isinstance(historical_stats, np.ndarray):
+        historical_stats = stats_to_array(historical_stats)
+    return pd.Series(lookup_by_store(historical_stats[:, 0], stores, np.nan), index=stores)
+
+
+def predict_sales(df_input, progress=None, artifacts=None, strategy=DEFAULT_STRATEGY):
     """
     Make predictions on input DataFrame
     
     Args:
         df_input: DataFrame with columns [store, date, temperature, fuel_Price, 
                   cpi, unemployment, holiday_flag]
+        progress: Optional callable(stage, fraction) called at the 'features',
+                  'predict' (once per cluster) and 'aggregate' stages; it may
+                  raise to stop the prediction (see utils/jobs.py)
+        artifacts: Serving artifacts to predict with (default: those of this
+                   process, see load_serving_artifacts)
+        strategy: Hierarchical reconciliation of the store predictions, one of
+                  STRATEGIES (see utils/reconciliation.py)
     
     Returns:
         DataFrame with columns [store, date, predicted_sales, cluster]
+    
+    Raises:
+        ValueError: If strategy is unknown or no rows are left after feature engineering
     """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reconciliation strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    if progress is None:
+        progress = _no_progress
     
-    # 1. Load historical statistics for imputation
-    historical_stats = load_historical_stats()
+    # 1. Serving artifacts (models, historical statistics for imputation, clusters)
+    if artifacts is None:
+        artifacts = load_serving_artifacts()
+    historical_stats = artifacts['historical_stats']
     
     # 2. Remove weekly_sales if it exists (force imputation for prediction)
     df_for_prediction = df_input.copy()
@@ -52,14 +252,16 @@ def predict_sales(df_input):
     
     # 3. Apply feature engineering
     print("\nFeature engineering...")
+    progress('features', 0.0)
     df_features = create_features(df_for_prediction, historical_stats)
+    progress('features', 1.0)
     
     if df_features.empty:
         raise ValueError("No data available after feature engineering")
     
     # 3. Load store to cluster mapping
-    store_cluster_map = load_store_clusters()
-    df_features['cluster'] = df_features['store'].map(store_cluster_map)
+    store_cluster_map = artifacts['store_cluster_map']
+    df_features['cluster'] = map_store_clusters(df_features['store'], store_cluster_map)
     
     # Check that all stores have a cluster
     missing_clusters = df_features['cluster'].isna().sum()
@@ -67,31 +269,11 @@ def predict_sales(df_input):
         print(f"{missing_clusters} stores without assigned cluster - using cluster 0")
         df_features['cluster'] = df_features['cluster'].fillna(0).astype(int)
     
-    # 4. Try to load cluster models, otherwise use global model
-    print("\nLoading model...")
+    # 4. Use cluster models, otherwise the global model
     feature_cols = get_feature_columns()
-    
-    try:
-        # Try to load individual cluster models
-        cluster_models = load_cluster_models()
-        use_cluster_models = True
-        print(f"{len(cluster_models)} cluster models loaded")
-    except FileNotFoundError:
-        # Use single global model
-        print("Cluster models not found, training global model...")
-        use_cluster_models = False
-        
-        # Load training data
-        try:
-            train_data = pd.read_pickle('data/train.pkl')
-            print(f"Training data loaded: {len(train_data)} rows")
-            
-            # Train global LightGBM model
-            model = lgb.LGBMRegressor(n_estimators=100, random_state=42, verbose=-1)
-            model.fit(train_data[feature_cols], train_data['weekly_sales'])
-            print("Global model trained")
-        except Exception as e:
-            raise ValueError(f"Cannot load training data: {e}")
+    cluster_models = artifacts['cluster_models']
+    use_cluster_models = cluster_models is not None
+    model = artifacts['global_model']
     
     # 5. Predict
     print("\nPredicting...")
@@ -99,8 +281,10 @@ def predict_sales(df_input):
     if use_cluster_models:
         # Predict with cluster models
         predictions = []
+        cluster_ids = sorted(df_features['cluster'].unique())
         
-        for cluster_id in sorted(df_features['cluster'].unique()):
+        for i, cluster_id in enumerate(cluster_ids):
+            progress('predict', i / len(cluster_ids))
             df_cluster = df_features[df_features['cluster'] == cluster_id].copy()
             
             if cluster_id not in cluster_models:
@@ -114,19 +298,67 @@ def predict_sales(df_input):
             predictions.append(df_cluster[['store', 'date', 'predicted_sales', 'cluster']])
             print(f"  Cluster {cluster_id}: {len(df_cluster)} predictions")
         
+        progress('aggregate', 0.0)
         df_predictions = pd.concat(predictions).reset_index(drop=True)
     else:
         # Predict with global model
+        progress('predict', 0.0)
         y_pred = model.predict(df_features[feature_cols])
+        progress('aggregate', 0.0)
         df_features['predicted_sales'] = y_pred
         df_predictions = df_features[['store', 'date', 'predicted_sales', 'cluster']].copy()
         print(f"  {len(df_predictions)} predictions with global model")
     
+    if strategy != 'bottom_up':
+        df_predictions = reconcile_predictions(
+            df_predictions, historical_store_weights(df_predictions['store'], artifacts), strategy
+        )
+    
     print(f"\n{len(df_predictions)} predictions generated successfully")
     
     return df_predictions
 
 
+def predict_delta(df_inputs, df_predictions, changed_stores, strategy=DEFAULT_STRATEGY):
+    """
+    Re-predict only the stores whose input rows changed
+    
+    Features are built per store, so the predictions of the other stores are
+    reused as they are. Reconciliation strategies other than bottom_up tie the
+    stores of a week together: every store is predicted again.
+    
+    Args:
+        df_inputs: Full input DataFrame, edits applied
+        df_predictions: Previous result of predict_sales for these inputs
+        changed_stores: Store ids whose rows changed
+        strategy: Reconciliation strategy of df_predictions (see predict_sales)
+    
+    Returns:
+        DataFrame with columns [store, date, predicted_sales, cluster], in the
+        order predict_sales would return it
+    """
+    if strategy != 'bottom_up':
+        print(f"Delta prediction: {strategy} reconciliation, all stores re-predicted")
+        return predict_sales(df_inputs, strategy=strategy)
+    
+    changed_stores = list(changed_stores)
+    changed = df_inputs['store'].isin(changed_stores)
+    print(f"Delta prediction: {changed.sum()} rows of {len(changed_stores)} stores to re-predict")
+    
+    kept = df_predictions[~df_predictions['store'].isin(changed_stores)]
+    if not changed.any():
+        return kept.reset_index(drop=True)
+    
+    df_changed = predict_sales(df_inputs[changed])
+    
+    # predict_sales returns clusters in order, rows sorted by store and date within each
+    return (
+        pd.concat([kept, df_changed])
+        .sort_values(['cluster', 'store', 'date'], kind='stable')
+        .reset_index(drop=True)
+    )
+
+
 def get_summary_stats(df_predictions):
     """
     Calculate descriptive statistics on predictions
@@ -7,6 +7,7 @@ import pandas as pd
 import numpy as np
 import logging
 import warnings
+from utils.shared_artifacts import STATS_COLUMNS, lookup_by_store, stats_to_array
 warnings.filterwarnings('ignore')
 
 # Logger configuration
@@ -143,6 +144,25 @@ def check_temporal_continuity(df, max_gap_days=14):
     return warnings_list
 
 
+def _lookup_store_stats(stores, historical_stats):
+    """
+    Return the (mean, median, std) arrays of each row's store,
+    with global defaults for stores without history
+    """
+    if not isinstance(historical_stats, np.ndarray):
+        historical_stats = stats_to_array(historical_stats)
+    
+    rows = lookup_by_store(historical_stats, stores, np.nan)
+    stats = {column: rows[:, i] for i, column in enumerate(STATS_COLUMNS)}
+    
+    unknown = np.isnan(stats['mean'])
+    stats['mean'][unknown] = 15981.26
+    stats['median'][unknown] = 15981.26
+    stats['std'][unknown] = 22711.18
+    
+    return stats['mean'], stats['median'], stats['std']
+
+
 def create_features(df, historical_stats=None):
     """
     Apply feature engineering identical to notebooks
@@ -150,8 +170,9 @@ def create_features(df, historical_stats=None):
     Args:
         df: DataFrame with columns [store, date, temperature, fuel_Price, cpi, 
             unemployment, holiday_flag]
-        historical_stats: Optional dict with historical statistics to impute lags
-                         Format: {store_id: {'mean': ..., 'median': ..., 'std': ...}}
+        historical_stats: Optional historical statistics to impute lags, either
+                         {store_id: {'mean': ..., 'median': ..., 'std': ...}}
+                         or a store-indexed array (see utils/shared_artifacts.py)
     
     Returns:
         DataFrame with all features needed for prediction
@@ -221,26 +242,23 @@ def create_features(df, historical_stats=None):
             df['rolling_std_4'] = default_std
         
         else:
-            # Impute with store-specific statistics
-            print(f"Imputation with statistics for {len(historical_stats)} stores")
+            # Impute with store-specific statistics (vectorized lookup by store id)
+            if isinstance(historical_stats, np.ndarray):
+                n_stats_stores = int(np.count_nonzero(~np.isnan(historical_stats[:, 0])))
+            else:
+                n_stats_stores = len(historical_stats)
+            print(f"Imputation with statistics for {n_stats_stores} stores")
+            store_mean, store_median, store_std = _lookup_store_stats(df['store'], historical_stats)
             
             for lag in [1, 2, 4, 52]:
-                df[f'lag_{lag}'] = df['store'].map(
-                    lambda s: historical_stats.get(s, {}).get('median', 15981.26)
-                )
+                df[f'lag_{lag}'] = store_median
             
-            df['sales_lag1'] = df['store'].map(
-                lambda s: historical_stats.get(s, {}).get('median', 15981.26)
-            )
+            df['sales_lag1'] = store_median
             
             for window in [4, 12, 26]:
-                df[f'rolling_mean_{window}'] = df['store'].map(
-                    lambda s: historical_stats.get(s, {}).get('mean', 15981.26)
-                )
+                df[f'rolling_mean_{window}'] = store_mean
             
-            df['rolling_std_4'] = df['store'].map(
-                lambda s: historical_stats.get(s, {}).get('std', 22711.18)
-            )
+            df['rolling_std_4'] = store_std
     
     # Remove remaining NaN (if test mode with weekly_sales)
     initial_len = len(df)
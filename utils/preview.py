@@ -0,0 +1,113 @@
+"""
+Module for preview predictions on a sample of the uploaded data
+Scores a few stores per cluster over evenly spaced weeks, so a first view of
+the results is available in a time that does not depend on the file size.
+Lags are imputed from historical statistics at prediction time, so every
+sampled row gets exactly the prediction it gets in the full run (with the
+top_down and proportional reconciliations, the sample is reconciled on its
+own: same strategy, shares over the sampled stores).
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.predictor import load_serving_artifacts, map_store_clusters, predict_sales
+from utils.reconciliation import DEFAULT_STRATEGY
+from utils.shared_artifacts import lookup_by_store, stats_to_array
+
+
+def sample_for_preview(df, stores_per_cluster=2, max_weeks=26):
+    """
+    Draw a sample stratified by store cluster and spread over the period
+    
+    Args:
+        df: Uploaded DataFrame (store, date, exogenous columns)
+        stores_per_cluster: Stores kept in each cluster, at evenly spaced
+                            quantiles of their historical mean sales
+        max_weeks: Distinct dates kept (evenly spaced, first and last included)
+    
+    Returns:
+        DataFrame: Sampled rows
+    """
+    artifacts = load_serving_artifacts()
+    stores = pd.Series(df['store'].unique())
+    clusters = map_store_clusters(stores, artifacts['store_cluster_map']).fillna(0).astype(int)
+    
+    # Order stores by size so the picks span small to large stores
+    historical_stats = artifacts['historical_stats']
+    if historical_stats is None:
+        store_size = np.zeros(len(stores))
+    else:
+        if not isinstance(historical_stats, np.ndarray):
+            historical_stats = stats_to_array(historical_stats)
+        store_size = np.nan_to_num(lookup_by_store(historical_stats, stores, np.nan)[:, 0])
+    
+    sampled_stores = []
+    for cluster_id in np.unique(clusters):
+        in_cluster = (clusters == cluster_id).to_numpy()
+        cluster_stores = stores[in_cluster].to_numpy()[np.argsort(store_size[in_cluster], kind='stable')]
+        k = min(stores_per_cluster, len(cluster_stores))
+        picks = ((np.arange(k) + 0.5) * len(cluster_stores) / k).astype(int)
+        sampled_stores.extend(cluster_stores[picks])
+    
+    dates = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
+    unique_dates = np.sort(dates.dropna().unique())
+    if len(unique_dates) > 0:
+        picks = np.linspace(0, len(unique_dates) - 1, min(max_weeks, len(unique_dates)))
+        sampled_dates = unique_dates[np.unique(picks.round().astype(int))]
+    else:
+        sampled_dates = unique_dates
+    
+    mask = df['store'].isin(sampled_stores) & dates.isin(sampled_dates)
+    return df[mask]
+
+
+def predict_preview(df, stores_per_cluster=2, max_weeks=26, strategy=DEFAULT_STRATEGY):
+    """
+    Predict a stratified sample and extrapolate the totals of the full file
+    
+    Args:
+        df: Uploaded DataFrame
+        stores_per_cluster: See sample_for_preview
+        max_weeks: See sample_for_preview
+        strategy: Reconciliation strategy of the full run (see predict_sales)
+    
+    Returns:
+        tuple: (df_preview, preview_info)
+            df_preview: Predictions of the sampled rows [store, date, predicted_sales, cluster]
+            preview_info: {
+                'n_rows', 'n_stores', 'n_dates': size of the full file,
+                'sample_stores', 'sample_dates': size of the sample,
+                'estimated_total_sales': sample sales scaled per cluster
+            }
+    """
+    df_sample = sample_for_preview(df, stores_per_cluster, max_weeks)
+    df_preview = predict_sales(df_sample, strategy=strategy)
+    
+    # Scale each cluster's sample sum by its share of the full file
+    store_cluster_map = load_serving_artifacts()['store_cluster_map']
+    full_clusters = map_store_clusters(df['store'], store_cluster_map).fillna(0).astype(int)
+    full_rows = full_clusters.value_counts()
+    sample_rows = df_preview['cluster'].value_counts()
+    sample_sales = df_preview.groupby('cluster')['predicted_sales'].sum()
+    estimated_total = float(
+        (sample_sales * full_rows.reindex(sample_sales.index) / sample_rows.reindex(sample_sales.index)).sum()
+    )
+    
+    # Clusters without sampled rows are counted at the overall sample mean
+    unsampled_rows = full_rows.drop(sample_sales.index, errors='ignore').sum()
+    if unsampled_rows > 0 and len(df_preview) > 0:
+        estimated_total += float(unsampled_rows * df_preview['predicted_sales'].mean())
+    
+    preview_info = {
+        'n_rows': int(len(df)),
+        'n_stores': int(df['store'].nunique()),
+        'n_dates': int(df['date'].nunique()),
+        'sample_stores': int(df_preview['store'].nunique()),
+        'sample_dates': int(df_preview['date'].nunique()),
+        'estimated_total_sales': estimated_total,
+    }
+    
+    print(f"Preview: {len(df_preview)} predictions on {preview_info['sample_stores']} stores "
+          f"x {preview_info['sample_dates']} weeks")
+    return df_preview, preview_info
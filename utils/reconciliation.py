@@ -0,0 +1,226 @@
+"""
+Module for the hierarchical reconciliation of store forecasts
+The stores form a store -> cluster -> total hierarchy, held as sparse
+matrices: the summing matrix S stacks the total row, one row per cluster and
+the identity of the stores, so S @ store_values gives every level at once.
+Forecasts are (stores x weeks) matrices with a mask of the weeks each store
+is forecast for.
+
+    - bottom_up: upper levels are the sums of the store forecasts
+    - top_down: upper-level forecasts split between the stores of each group
+      in proportion to weights (historical sales)
+    - proportional: same split, in proportion to the store forecasts themselves
+
+Serving strategies of predict_sales (see reconcile_predictions), applied to
+the forecasts of the cluster models:
+    - bottom_up: the store forecasts as they are
+    - top_down: each week's total split with the historical shares of the stores
+    - proportional: each week's total split between clusters with their
+      historical shares, then between the stores of a cluster in proportion
+      to their forecasts
+The weekly total of the forecasts is the same with every strategy.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+STRATEGIES = ('bottom_up', 'top_down', 'proportional')
+DEFAULT_STRATEGY = 'bottom_up'
+
+
+class Hierarchy:
+    """Store -> cluster -> total hierarchy of a set of stores"""
+    
+    def __init__(self, stores, clusters):
+        """
+        Args:
+            stores: Store ids, each once
+            clusters: Cluster id of each store
+        """
+        from scipy import sparse
+        
+        stores = np.asarray(stores, dtype=np.int64)
+        order = np.argsort(stores, kind='stable')
+        self.stores = stores[order]
+        self.clusters, cluster_index = np.unique(np.asarray(clusters, dtype=np.int64)[order], return_inverse=True)
+        
+        n_stores = len(self.stores)
+        self.cluster_matrix = sparse.csr_matrix(
+            (np.ones(n_stores), (cluster_index, np.arange(n_stores))),
+            shape=(len(self.clusters), n_stores),
+        )
+        self.total_matrix = sparse.csr_matrix(np.ones((1, n_stores)))
+        self.summing_matrix = sparse.vstack(
+            [self.total_matrix, self.cluster_matrix, sparse.identity(n_stores, format='csr')], format='csr'
+        )
+    
+    @classmethod
+    def from_rows(cls, df):
+        """Hierarchy of the stores of a DataFrame with store and cluster columns"""
+        pairs = df[['store', 'cluster']].drop_duplicates('store')
+        return cls(pairs['store'].to_numpy(), pairs['cluster'].to_numpy())
+    
+    def group_matrix(self, level):
+        """
+        Sparse (groups x stores) membership matrix of a level: 'total' or 'cluster'
+        
+        Raises:
+            ValueError: If level is unknown
+        """
+        if level == 'total':
+            return self.total_matrix
+        if level == 'cluster':
+            return self.cluster_matrix
+        raise ValueError(f"Unknown hierarchy level: {level}")
+    
+    def to_matrix(self, stores, dates, values):
+        """
+        Lay out values of (store, date) rows as a (stores x weeks) matrix
+        
+        Rows sharing a (store, date) are summed into one cell.
+        
+        Returns:
+            tuple: (matrix, mask, weeks, cells)
+                matrix: values, 0 where a store has no row for a week
+                mask: True where a store has a row
+                weeks: dates of the columns
+                cells: (row, column, share) of each input row, for from_matrix;
+                       share is the part of its cell the row holds
+        
+        Raises:
+            ValueError: If some stores are not in the hierarchy
+        """
+        stores = np.asarray(stores, dtype=np.int64)
+        rows = np.searchsorted(self.stores, stores)
+        rows = np.minimum(rows, len(self.stores) - 1)
+        if not np.array_equal(self.stores[rows], stores):
+            raise ValueError("Stores outside of the hierarchy")
+        weeks, columns = np.unique(np.asarray(dates), return_inverse=True)
+        values = np.broadcast_to(np.asarray(values, dtype=np.float64), rows.shape)
+        
+        matrix = np.zeros((len(self.stores), len(weeks)))
+        counts = np.zeros((len(self.stores), len(weeks)))
+        np.add.at(matrix, (rows, columns), values)
+        np.add.at(counts, (rows, columns), 1)
+        mask = counts > 0
+        
+        # Rows of a shared cell split its value like their own values (evenly if they sum to 0)
+        cell_values = matrix[rows, columns]
+        shares = np.divide(values, cell_values, out=1 / counts[rows, columns], where=cell_values != 0)
+        return matrix, mask, weeks, (rows, columns, shares)
+    
+    @staticmethod
+    def from_matrix(matrix, cells):
+        """Values of the input rows of to_matrix, in their order (shared cells split between their rows)"""
+        rows, columns, shares = cells
+        return matrix[rows, columns] * shares
+
+
+def bottom_up(hierarchy, store_forecasts):
+    """
+    Forecasts of every level, summed from the store forecasts
+    
+    Args:
+        store_forecasts: (stores x weeks) matrix
+    
+    Returns:
+        np.ndarray: (1 + clusters + stores) x weeks, rows in the order of the
+                    summing matrix (total, clusters, stores)
+    """
+    return hierarchy.summing_matrix @ store_forecasts
+
+
+def top_down(hierarchy, upper_forecasts, weights, mask=None, level='total'):
+    """
+    Split upper-level forecasts between the stores of each group, in proportion to weights
+    
+    Args:
+        upper_forecasts: (groups x weeks) forecasts of the level ('total': one
+                         row; 'cluster': one row per cluster of the hierarchy)
+        weights: Store weights, (stores,) or (stores x weeks)
+        mask: (stores x weeks) stores forecast each week (default: all);
+              shares are renormalized over the stores present
+        level: 'total' or 'cluster'
+    
+    Returns:
+        np.ndarray: (stores x weeks) store forecasts, 0 outside of the mask
+                    and in groups with no weight
+    """
+    group_matrix = hierarchy.group_matrix(level)
+    upper_forecasts = np.asarray(upper_forecasts, dtype=np.float64)
+    if mask is None:
+        mask = np.ones((len(hierarchy.stores), upper_forecasts.shape[1]), dtype=bool)
+    
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    weights = weights * mask
+    
+    group_weights = group_matrix @ weights
+    ratios = np.divide(upper_forecasts, group_weights,
+                       out=np.zeros_like(upper_forecasts), where=group_weights != 0)
+    return weights * (group_matrix.T @ ratios)
+
+
+def proportional(hierarchy, store_forecasts, upper_forecasts, mask=None, level='cluster'):
+    """
+    Scale the store forecasts of each group so that they sum to its upper-level forecast
+    
+    Returns:
+        np.ndarray: (stores x weeks) store forecasts
+    """
+    return top_down(hierarchy, upper_forecasts, store_forecasts, mask, level)
+
+
+def _fill_weights(weights, store_forecasts, mask):
+    """Stores without historical weight get their mean forecast"""
+    weights = np.asarray(weights, dtype=np.float64).copy()
+    missing = ~np.isfinite(weights) | (weights <= 0)
+    if missing.any():
+        counts = mask.sum(axis=1)
+        mean_forecasts = np.divide(store_forecasts.sum(axis=1), counts,
+                                   out=np.zeros(len(counts)), where=counts > 0)
+        weights[missing] = mean_forecasts[missing]
+        print(f"{int(missing.sum())} stores without historical sales - weighted by their forecasts")
+    return weights
+
+
+def reconcile_predictions(df_predictions, store_weights, strategy=DEFAULT_STRATEGY):
+    """
+    Apply a serving strategy to the predictions of predict_sales
+    
+    Args:
+        df_predictions: DataFrame with columns [store, date, predicted_sales, cluster]
+        store_weights: Historical weight of each store (pd.Series indexed by store,
+                       e.g. mean weekly sales)
+        strategy: One of STRATEGIES
+    
+    Returns:
+        DataFrame: df_predictions with reconciled predicted_sales, same rows and order
+    
+    Raises:
+        ValueError: If strategy is unknown
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reconciliation strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    if strategy == 'bottom_up' or df_predictions.empty:
+        return df_predictions
+    
+    hierarchy = Hierarchy.from_rows(df_predictions)
+    forecasts, mask, _, cells = hierarchy.to_matrix(
+        df_predictions['store'], df_predictions['date'], df_predictions['predicted_sales'].to_numpy(dtype=np.float64)
+    )
+    weights = _fill_weights(store_weights.reindex(hierarchy.stores).to_numpy(), forecasts, mask)
+    
+    total = hierarchy.total_matrix @ forecasts
+    reconciled = top_down(hierarchy, total, weights, mask, 'total')
+    if strategy == 'proportional':
+        cluster_targets = hierarchy.cluster_matrix @ reconciled
+        reconciled = proportional(hierarchy, forecasts, cluster_targets, mask, 'cluster')
+    
+    df_reconciled = df_predictions.copy()
+    df_reconciled['predicted_sales'] = Hierarchy.from_matrix(reconciled, cells)
+    print(f"Predictions reconciled ({strategy}) over {len(hierarchy.stores)} stores "
+          f"and {forecasts.shape[1]} weeks")
+    return df_reconciled
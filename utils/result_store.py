@@ -0,0 +1,105 @@
+"""
+Module to keep prediction results on the server
+Results are written to disk so any worker process can serve them
+"""
+
+import os
+import re
+import uuid
+import tempfile
+import pandas as pd
+
+
+DEFAULT_RESULTS_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_results')
+MAX_STORED_RESULTS = 50
+INPUTS_SUFFIX = '.inputs.pkl'
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _result_path(key, results_dir, suffix='.pkl'):
+    """Return the file path of a result, or None if the key is malformed"""
+    if not key or not _KEY_PATTERN.match(key):
+        return None
+    return os.path.join(results_dir, f'{key}{suffix}')
+
+
+def _prune_results(results_dir, max_results=MAX_STORED_RESULTS):
+    """Remove the oldest results (and their inputs) beyond max_results"""
+    paths = [
+        os.path.join(results_dir, name)
+        for name in os.listdir(results_dir)
+        if _KEY_PATTERN.match(name[:-len('.pkl')]) and name.endswith('.pkl')
+    ]
+    if len(paths) <= max_results:
+        return
+    
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - max_results]:
+        for stale_path in (path, path[:-len('.pkl')] + INPUTS_SUFFIX):
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+
+
+def _write_pickle(df, path):
+    """Write then rename so readers never see a partial file"""
+    tmp_path = f'{path}.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_result(df, results_dir=DEFAULT_RESULTS_DIR, inputs=None):
+    """
+    Save a result DataFrame on the server
+    
+    Args:
+        df: DataFrame to store
+        results_dir: Directory holding the results
+        inputs: Optional input DataFrame the result was computed from, kept
+                with it (see load_inputs)
+    
+    Returns:
+        str: Key to retrieve the result with load_result
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    key = uuid.uuid4().hex
+    
+    # Inputs first: a visible result always has its inputs
+    if inputs is not None:
+        _write_pickle(inputs, _result_path(key, results_dir, INPUTS_SUFFIX))
+    _write_pickle(df, _result_path(key, results_dir))
+    
+    _prune_results(results_dir)
+    return key
+
+
+def load_result(key, results_dir=DEFAULT_RESULTS_DIR):
+    """
+    Load a result saved with save_result
+    
+    Args:
+        key: Result key
+        results_dir: Directory holding the results
+    
+    Returns:
+        DataFrame, or None if the result does not exist
+    """
+    path = _result_path(key, results_dir)
+    if path is None or not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+
+def load_inputs(key, results_dir=DEFAULT_RESULTS_DIR):
+    """
+    Load the inputs saved with a result
+    
+    Returns:
+        DataFrame, or None if the result was saved without inputs
+    """
+    path = _result_path(key, results_dir, INPUTS_SUFFIX)
+    if path is None or not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
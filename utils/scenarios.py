@@ -0,0 +1,276 @@
+"""
+Module for what-if scenarios over exogenous variables
+Features are built once for the base data; each scenario only shifts the
+exogenous columns of the feature matrix, so all scenarios are scored as
+stacked matrices in one batched pass per cluster model. Rows whose shocked
+values fall between the same split thresholds of a model get the same
+prediction, so each such group is scored only once.
+"""
+
+import itertools
+import math
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import create_features, get_feature_columns
+from utils.predictor import historical_store_weights, load_serving_artifacts, map_store_clusters
+from utils.reconciliation import DEFAULT_STRATEGY, STRATEGIES, reconcile_predictions
+
+
+# Exogenous columns that scenarios can shock (used as is by the models)
+SCENARIO_COLUMNS = ['temperature', 'fuel_Price', 'cpi', 'unemployment']
+
+AGGREGATE_LEVELS = ('total', 'store', 'row')
+
+
+def make_scenario_grid(shocks, max_scenarios=None):
+    """
+    Build every combination of per-column shocks
+    
+    Args:
+        shocks: {column: [shock, ...]} for columns of SCENARIO_COLUMNS
+        max_scenarios: Maximum number of combinations (None for no limit),
+                       checked before the grid is built
+    
+    Returns:
+        DataFrame with one row per scenario and one column per shocked column
+    
+    Raises:
+        ValueError: If shocks is not a dict of non-empty lists, a column cannot
+                    be shocked or there are more than max_scenarios combinations
+    """
+    if not isinstance(shocks, dict) or not shocks:
+        raise ValueError("shocks must be a non-empty object of {column: [shock, ...]}")
+    unknown = [column for column in shocks if column not in SCENARIO_COLUMNS]
+    if unknown:
+        raise ValueError(f"Cannot shock column(s) {unknown}. Allowed: {SCENARIO_COLUMNS}")
+    if any(not isinstance(values, list) or len(values) == 0 for values in shocks.values()):
+        raise ValueError("Each shocked column needs a non-empty list of values")
+    
+    n_scenarios = math.prod(len(values) for values in shocks.values())
+    if max_scenarios is not None and n_scenarios > max_scenarios:
+        raise ValueError(f"{n_scenarios} scenarios requested, at most {max_scenarios} allowed")
+    
+    columns = list(shocks)
+    grid = pd.DataFrame(
+        list(itertools.product(*(shocks[column] for column in columns))),
+        columns=columns,
+        dtype=np.float64,
+    )
+    grid.index.name = 'scenario'
+    return grid
+
+
+def _base_features(df_input, artifacts):
+    """Build the features of the base data once, with their cluster (from the given artifacts)"""
+    df_base = df_input.drop(columns=['weekly_sales'], errors='ignore')
+    df_features = create_features(df_base, artifacts['historical_stats'])
+    if df_features.empty:
+        raise ValueError("No data available after feature engineering")
+    
+    df_features['cluster'] = map_store_clusters(
+        df_features['store'], artifacts['store_cluster_map']
+    ).fillna(0).astype(int)
+    return df_features
+
+
+def _split_thresholds(model, feature_idx):
+    """
+    Sorted split thresholds of a LightGBM model for the given features
+    
+    Returns:
+        list: One array per feature, or None if the model is not a LightGBM
+              model or splits one of the features other than with '<='
+    """
+    # lgb.Booster, or a LGBMRegressor wrapping one
+    booster = getattr(model, 'booster_', model)
+    if not hasattr(booster, 'dump_model'):
+        return None
+    
+    thresholds = {i: [] for i in feature_idx}
+    nodes = [tree['tree_structure'] for tree in booster.dump_model()['tree_info']]
+    while nodes:
+        node = nodes.pop()
+        if 'split_feature' not in node:
+            continue
+        if node['split_feature'] in thresholds:
+            if node['decision_type'] != '<=':
+                return None
+            thresholds[node['split_feature']].append(node['threshold'])
+        nodes.extend((node['left_child'], node['right_child']))
+    
+    return [np.unique(thresholds[i]) for i in feature_idx]
+
+
+def _equivalence_keys(shocked, thresholds):
+    """
+    Key rows so that rows with equal keys get the same prediction
+    
+    Two values on the same side of every split threshold of a feature follow
+    the same path in every tree, so a row is identified by its base row and,
+    for each shocked feature, the interval between thresholds its value falls
+    in. NaN and zero get their own codes (missing value handling).
+    
+    Args:
+        shocked: (scenarios, rows, features) shocked values
+        thresholds: Sorted thresholds of each shocked feature
+    
+    Returns:
+        np.ndarray: (scenarios, rows) int64 keys
+    """
+    n_scenarios, n_rows, _ = shocked.shape
+    keys = np.broadcast_to(np.arange(n_rows, dtype=np.int64), (n_scenarios, n_rows))
+    
+    for j, feature_thresholds in enumerate(thresholds):
+        values = shocked[:, :, j]
+        codes = np.searchsorted(feature_thresholds, values, side='left') + 2
+        codes[np.abs(values) <= 1e-35] = 1
+        codes[np.isnan(values)] = 0
+        
+        radix = len(feature_thresholds) + 3
+        if keys.max() >= np.iinfo(np.int64).max // radix:
+            keys = np.unique(keys, return_inverse=True)[1].reshape(n_scenarios, n_rows)
+        keys = keys * radix + codes
+    
+    return keys
+
+
+def _reconcile_scenarios(predictions, df_features, artifacts, strategy, batch_rows):
+    """
+    Reconcile the predictions of each scenario on its own (see reconcile_predictions)
+    
+    Scenarios are stacked as extra weeks, so a batch of them is reconciled in
+    one pass: each (scenario, week) is split independently.
+    
+    Returns:
+        np.ndarray: (scenarios, rows) reconciled predictions
+    """
+    n_scenarios, n_rows = predictions.shape
+    week_codes, weeks = pd.factorize(df_features['date'], sort=True)
+    weights = historical_store_weights(df_features['store'], artifacts)
+    scenarios_per_batch = max(1, batch_rows // max(n_rows, 1))
+    
+    reconciled = np.empty_like(predictions)
+    for start in range(0, n_scenarios, scenarios_per_batch):
+        batch = predictions[start:start + scenarios_per_batch]
+        stacked = pd.DataFrame({
+            'store': np.tile(df_features['store'].to_numpy(), len(batch)),
+            'date': (np.arange(len(batch))[:, None] * len(weeks) + week_codes).ravel(),
+            'predicted_sales': batch.ravel(),
+            'cluster': np.tile(df_features['cluster'].to_numpy(), len(batch)),
+        })
+        stacked = reconcile_predictions(stacked, weights, strategy)
+        reconciled[start:start + len(batch)] = stacked['predicted_sales'].to_numpy().reshape(len(batch), n_rows)
+    return reconciled
+
+
+def run_scenarios(df_input, scenarios, relative=False, aggregate='total', batch_rows=1_000_000,
+                  strategy=DEFAULT_STRATEGY):
+    """
+    Predict sales for every scenario
+    
+    Args:
+        df_input: Base DataFrame (same columns as for predict_sales)
+        scenarios: DataFrame of shocks, one row per scenario (see make_scenario_grid)
+        relative: If True, shocks are fractions (0.1 = +10%), otherwise they are added
+        aggregate: 'total' (one row per scenario), 'store' (per scenario and store)
+                   or 'row' (per scenario, store and date)
+        batch_rows: Maximum rows of a stacked matrix passed to a model at once
+        strategy: Reconciliation of each scenario's predictions, one of
+                  STRATEGIES; the weekly totals, and so the 'total' aggregate,
+                  are the same with every strategy
+    
+    Returns:
+        Tidy DataFrame: scenario, shock columns, [store, [date,]] predicted_sales
+    """
+    if aggregate not in AGGREGATE_LEVELS:
+        raise ValueError(f"aggregate must be one of {AGGREGATE_LEVELS}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reconciliation strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    
+    # Fetched once, so a reload cannot mix the stats of one version with the models of another
+    artifacts = load_serving_artifacts()
+    df_features = _base_features(df_input, artifacts)
+    
+    feature_cols = get_feature_columns()
+    shock_columns = list(scenarios.columns)
+    shock_idx = [feature_cols.index(column) for column in shock_columns]
+    shocks = scenarios.to_numpy(dtype=np.float64)
+    n_scenarios = len(shocks)
+    
+    # Each model scores the rows of its cluster (a single group for the global model)
+    cluster_models = artifacts['cluster_models']
+    if cluster_models is None:
+        groups = [(artifacts['global_model'], np.ones(len(df_features), dtype=bool))]
+    else:
+        groups = [
+            (cluster_models[cluster_id], (df_features['cluster'] == cluster_id).to_numpy())
+            for cluster_id in sorted(df_features['cluster'].unique())
+            if cluster_id in cluster_models
+        ]
+    
+    X_all = df_features[feature_cols].to_numpy(dtype=np.float64)
+    predictions = np.zeros((n_scenarios, len(df_features)))
+    
+    print(f"Scoring {n_scenarios} scenarios x {len(df_features)} rows")
+    scored_rows = 0
+    for model, mask in groups:
+        X_base = X_all[mask]
+        rows = np.flatnonzero(mask)
+        thresholds = _split_thresholds(model, shock_idx)
+        scenarios_per_batch = max(1, batch_rows // max(len(X_base), 1))
+        
+        for start in range(0, n_scenarios, scenarios_per_batch):
+            batch_shocks = shocks[start:start + scenarios_per_batch]
+            
+            # Shocked exogenous values of the stacked matrix (scenarios, rows, features)
+            if relative:
+                shocked = X_base[None, :, shock_idx] * (1 + batch_shocks[:, None, :])
+            else:
+                shocked = X_base[None, :, shock_idx] + batch_shocks[:, None, :]
+            
+            if thresholds is None:
+                # Score every row of the stacked matrix
+                X = np.empty((len(batch_shocks),) + X_base.shape)
+                X[:] = X_base
+                X[:, :, shock_idx] = shocked
+                y = model.predict(X.reshape(-1, X_base.shape[1]))
+                scored_rows += len(y)
+            else:
+                # Score each group of equivalent rows once
+                keys = _equivalence_keys(shocked, thresholds).ravel()
+                _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+                X = X_base[first % len(X_base)]
+                X[:, shock_idx] = shocked.reshape(-1, len(shock_idx))[first]
+                y = model.predict(X)[inverse]
+                scored_rows += len(first)
+            
+            predictions[start:start + len(batch_shocks), rows] = y.reshape(len(batch_shocks), -1)
+    
+    print(f"Scored {scored_rows} distinct rows for {n_scenarios * len(df_features)} scenario rows")
+    
+    if strategy != 'bottom_up' and aggregate != 'total':
+        predictions = _reconcile_scenarios(predictions, df_features, artifacts, strategy, batch_rows)
+    
+    shock_frame = scenarios.reset_index(drop=True)
+    shock_frame.insert(0, 'scenario', np.arange(n_scenarios))
+    
+    if aggregate == 'total':
+        result = shock_frame.assign(predicted_sales=predictions.sum(axis=1))
+    
+    elif aggregate == 'store':
+        store_codes, stores = pd.factorize(df_features['store'], sort=True)
+        by_store = np.zeros((n_scenarios, len(stores)))
+        np.add.at(by_store.T, store_codes, predictions.T)
+        result = shock_frame.loc[np.repeat(np.arange(n_scenarios), len(stores))].reset_index(drop=True)
+        result['store'] = np.tile(stores.to_numpy(), n_scenarios)
+        result['predicted_sales'] = by_store.ravel()
+    
+    else:
+        n_rows = len(df_features)
+        result = shock_frame.loc[np.repeat(np.arange(n_scenarios), n_rows)].reset_index(drop=True)
+        result['store'] = np.tile(df_features['store'].to_numpy(), n_scenarios)
+        result['date'] = np.tile(df_features['date'].to_numpy(), n_scenarios)
+        result['predicted_sales'] = predictions.ravel()
+    
+    return result
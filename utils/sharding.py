@@ -0,0 +1,183 @@
+"""
+Module for sharded scoring of large inputs in a pool of processes
+Feature engineering is pandas-heavy and holds the GIL, so threads do not
+speed it up. Large inputs are instead partitioned by store (features only
+depend on the rows of their store) and each shard is predicted by a worker
+process that holds its own copy of the models. Shards are exchanged as
+columnar .npy files (in shared memory when /dev/shm exists), so no DataFrame
+is pickled between processes.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils.predictor import _no_progress, historical_store_weights, load_serving_artifacts, predict_sales
+from utils.reconciliation import DEFAULT_STRATEGY, STRATEGIES, reconcile_predictions
+
+
+DEFAULT_SHARD_DIR = os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'store_sales_shards',
+)
+SHARDS_PER_WORKER = 2  # More shards than workers evens out uneven store sizes
+
+_pool = None
+_pool_workers = 0
+_pool_version = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Load the models once per worker process"""
+    load_serving_artifacts()
+
+
+def get_shard_pool(n_workers):
+    """
+    Return the process pool of this process, started on first use
+    
+    Workers are spawned rather than forked: forking a multi-threaded server
+    (request threads, OpenMP) can leave locks held in the child. When the
+    models of this process were reloaded, a new pool loads them; shards
+    already submitted finish in the old one.
+    """
+    global _pool, _pool_workers, _pool_version
+    model_version = load_serving_artifacts()['model_version']
+    with _pool_lock:
+        if _pool is not None and _pool_version != model_version:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None or _pool_workers != n_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            print(f"Starting {n_workers} sharded scoring workers...")
+            _pool = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            _pool_workers = n_workers
+            _pool_version = model_version
+        return _pool
+
+
+def _write_columns(df, directory):
+    """Save each column as a .npy file (text columns as fixed-width strings)"""
+    os.makedirs(directory, exist_ok=True)
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        np.save(os.path.join(directory, f'{column}.npy'), values, allow_pickle=False)
+
+
+def _read_columns(directory, columns):
+    """Load the columns saved by _write_columns"""
+    return pd.DataFrame({
+        column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r', allow_pickle=False)
+        for column in columns
+    })
+
+
+def _predict_shard(shard_dir, columns):
+    """Worker task: predict one shard and save the predictions next to it"""
+    df_predictions = predict_sales(_read_columns(os.path.join(shard_dir, 'input'), columns))
+    _write_columns(df_predictions, os.path.join(shard_dir, 'output'))
+    return len(df_predictions)
+
+
+def _partition_stores(stores, n_shards):
+    """
+    Assign stores to shards with balanced row counts (largest stores first)
+    
+    Returns:
+        dict: {store: shard index}
+    """
+    loads = np.zeros(n_shards)
+    assignment = {}
+    for store, count in stores.value_counts().items():
+        shard = int(np.argmin(loads))
+        assignment[store] = shard
+        loads[shard] += count
+    return assignment
+
+
+def predict_sales_sharded(df_input, n_workers, progress=None, shard_dir=DEFAULT_SHARD_DIR,
+                          strategy=DEFAULT_STRATEGY):
+    """
+    Make predictions like predict_sales, with shards scored in parallel
+    
+    Args:
+        df_input: DataFrame with columns [store, date, temperature, fuel_Price,
+                  cpi, unemployment, holiday_flag]
+        n_workers: Worker processes of the pool
+        progress: Optional callable(stage, fraction), called at the 'features'
+                  stage, at the 'predict' stage as shards complete, and at the
+                  'aggregate' stage; it may raise to stop the prediction
+        shard_dir: Directory of the temporary shard files
+        strategy: Reconciliation strategy (see predict_sales), applied to the
+                  merged predictions since it ties the stores of a week together
+    
+    Returns:
+        DataFrame with columns [store, date, predicted_sales, cluster], in the
+        order of predict_sales
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown reconciliation strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+    if progress is None:
+        progress = _no_progress
+    
+    df = df_input.drop(columns=['weekly_sales'], errors='ignore')
+    columns = list(df.columns)
+    
+    n_shards = max(1, min(df['store'].nunique(), n_workers * SHARDS_PER_WORKER))
+    assignment = _partition_stores(df['store'], n_shards)
+    shard_ids = df['store'].map(assignment).to_numpy()
+    order = np.argsort(shard_ids, kind='stable')
+    bounds = np.searchsorted(shard_ids[order], np.arange(n_shards + 1))
+    
+    os.makedirs(shard_dir, exist_ok=True)
+    job_dir = tempfile.mkdtemp(prefix='shards_', dir=shard_dir)
+    pool = get_shard_pool(n_workers)
+    futures = []
+    
+    try:
+        progress('features', 0.0)
+        shard_dirs = [os.path.join(job_dir, str(i)) for i in range(n_shards)]
+        for i in range(n_shards):
+            _write_columns(df.iloc[order[bounds[i]:bounds[i + 1]]], os.path.join(shard_dirs[i], 'input'))
+        
+        print(f"Predicting {len(df)} rows in {n_shards} shards with {n_workers} processes...")
+        futures = [pool.submit(_predict_shard, shard_dirs[i], columns) for i in range(n_shards)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            future.result()
+            progress('predict', done / n_shards)
+        
+        progress('aggregate', 0.0)
+        parts = [
+            _read_columns(os.path.join(shard_dirs[i], 'output'), ['store', 'date', 'predicted_sales', 'cluster'])
+            for i in range(n_shards)
+        ]
+        df_predictions = pd.concat(parts, ignore_index=True)
+    
+    finally:
+        # Shards not started yet are dropped (e.g. when the job is cancelled)
+        for future in futures:
+            future.cancel()
+        shutil.rmtree(job_dir, ignore_errors=True)
+    
+    # predict_sales returns clusters in order, rows sorted by store and date within each
+    df_predictions = df_predictions.sort_values(['cluster', 'store', 'date'], kind='stable').reset_index(drop=True)
+    if strategy != 'bottom_up':
+        df_predictions = reconcile_predictions(
+            df_predictions, historical_store_weights(df_predictions['store'], load_serving_artifacts()), strategy
+        )
+    print(f"\n{len(df_predictions)} predictions generated successfully")
+    return df_predictions
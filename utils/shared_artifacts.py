@@ -0,0 +1,160 @@
+"""
+Module to export serving artifacts as memory-mapped NumPy arrays
+The per-store historical statistics and the store->cluster map are stored
+as fixed-layout arrays indexed by store id. Worker processes open them
+read-only with mmap, so N workers share one physical copy.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_SHARED_DIR = 'data/serving'
+
+# Columns of the store_stats array, as used by create_features
+STATS_COLUMNS = ('mean', 'median', 'std')
+
+STORE_STATS_FILE = 'store_stats.npy'
+STORE_CLUSTER_FILE = 'store_cluster.npy'
+
+# Value of store_cluster for stores without a cluster
+NO_CLUSTER = -1
+
+
+def _save_array(path, array):
+    """Write an array then rename, so readers never map a partial file"""
+    tmp_path = f'{path}.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def export_shared_artifacts(out_dir=DEFAULT_SHARED_DIR,
+                            train_data_path='data/train.pkl',
+                            cluster_features_path='data/cluster_features.pkl'):
+    """
+    Export historical statistics and the cluster map as fixed-layout arrays
+    
+    store_stats.npy: float64, shape (max_store + 1, 3), columns STATS_COLUMNS,
+                     NaN rows for unknown stores
+    store_cluster.npy: int32, shape (max_store + 1,), NO_CLUSTER for unknown stores
+    
+    Args:
+        out_dir: Directory receiving the .npy files
+        train_data_path: Training dataset (source of the statistics)
+        cluster_features_path: Clustering file (source of the cluster map)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    
+    store_stats, store_cluster = build_store_arrays(train_data_path, cluster_features_path)
+    
+    _save_array(os.path.join(out_dir, STORE_STATS_FILE), store_stats)
+    _save_array(os.path.join(out_dir, STORE_CLUSTER_FILE), store_cluster)
+    
+    n_stores = int(np.count_nonzero(~np.isnan(store_stats[:, 0])))
+    print(f"Shared artifacts exported to {out_dir} ({n_stores} stores)")
+
+
+def build_store_arrays(train_data_path='data/train.pkl',
+                       cluster_features_path='data/cluster_features.pkl'):
+    """
+    Build the store_stats and store_cluster arrays from their sources
+    
+    Returns:
+        tuple: (store_stats, store_cluster), see export_shared_artifacts
+    """
+    train = pd.read_pickle(train_data_path)
+    cluster_features = pd.read_pickle(cluster_features_path)
+    
+    max_store = int(max(train['store'].max(), cluster_features['store'].max()))
+    
+    grouped = train.groupby('store')['weekly_sales'].agg(list(STATS_COLUMNS))
+    store_stats = np.full((max_store + 1, len(STATS_COLUMNS)), np.nan, dtype=np.float64)
+    store_stats[grouped.index.to_numpy(dtype=np.int64)] = grouped.to_numpy(dtype=np.float64)
+    
+    store_cluster = np.full(max_store + 1, NO_CLUSTER, dtype=np.int32)
+    store_cluster[cluster_features['store'].to_numpy(dtype=np.int64)] = cluster_features['cluster'].to_numpy()
+    
+    return store_stats, store_cluster
+
+
+def ensure_shared_artifacts(out_dir=DEFAULT_SHARED_DIR,
+                            train_data_path='data/train.pkl',
+                            cluster_features_path='data/cluster_features.pkl'):
+    """
+    Export the shared artifacts if they are missing or older than their sources
+    
+    Returns:
+        bool: True if the artifacts are available
+    """
+    sources = [train_data_path, cluster_features_path]
+    targets = [os.path.join(out_dir, STORE_STATS_FILE), os.path.join(out_dir, STORE_CLUSTER_FILE)]
+    
+    if not all(os.path.exists(path) for path in sources):
+        return all(os.path.exists(path) for path in targets)
+    
+    newest_source = max(os.path.getmtime(path) for path in sources)
+    if all(os.path.exists(path) and os.path.getmtime(path) >= newest_source for path in targets):
+        return True
+    
+    try:
+        export_shared_artifacts(out_dir, train_data_path, cluster_features_path)
+        return True
+    except Exception as e:
+        print(f"Error exporting shared artifacts: {e}")
+        return False
+
+
+def load_shared_artifacts(shared_dir=DEFAULT_SHARED_DIR):
+    """
+    Memory-map the shared artifacts read-only
+    
+    Returns:
+        dict: {'store_stats': array, 'store_cluster': array}, or None if not exported
+    """
+    stats_path = os.path.join(shared_dir, STORE_STATS_FILE)
+    cluster_path = os.path.join(shared_dir, STORE_CLUSTER_FILE)
+    
+    if not (os.path.exists(stats_path) and os.path.exists(cluster_path)):
+        return None
+    
+    shared = {
+        'store_stats': np.load(stats_path, mmap_mode='r'),
+        'store_cluster': np.load(cluster_path, mmap_mode='r'),
+    }
+    print(f"Shared artifacts memory-mapped from {shared_dir}")
+    return shared
+
+
+def stats_to_array(historical_stats):
+    """
+    Convert {store_id: {'mean': ..., 'median': ..., 'std': ...}} to the
+    store_stats array layout
+    """
+    max_store = int(max(historical_stats)) if historical_stats else 0
+    store_stats = np.full((max_store + 1, len(STATS_COLUMNS)), np.nan, dtype=np.float64)
+    for store, stats in historical_stats.items():
+        store_stats[int(store)] = [stats.get(column, np.nan) for column in STATS_COLUMNS]
+    return store_stats
+
+
+def lookup_by_store(table, stores, fill_value):
+    """
+    Look up rows of a store-indexed array for a column of store ids
+    
+    Args:
+        table: Array indexed by store id (store_stats or store_cluster)
+        stores: Series or array of store ids
+        fill_value: Value for ids that are not integers or out of range
+    
+    Returns:
+        np.ndarray with one entry (or row) per store id
+    """
+    ids = pd.to_numeric(pd.Series(stores), errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(ids)
+    valid[valid] = (ids[valid] == np.floor(ids[valid])) & (ids[valid] >= 0) & (ids[valid] < len(table))
+    
+    dtype = np.result_type(table.dtype, np.min_scalar_type(fill_value))
+    result = np.full((len(ids),) + table.shape[1:], fill_value, dtype=dtype)
+    result[valid] = table[ids[valid].astype(np.int64)]
+    return result
@@ -0,0 +1,99 @@
+"""
+Module to coalesce identical concurrent computations
+The first caller of a key runs the computation; callers arriving with the
+same key while it runs wait for it and receive the same result (or error)
+"""
+
+import threading
+
+
+WAIT_CHECK_INTERVAL = 0.5  # Seconds between two wait_check calls of a waiting caller
+
+
+class _Call:
+    """One in-progress computation and the callers waiting on it"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time
+    
+    Keys only live while their computation runs: once it finishes, the next
+    caller starts a new one. Results are shared between callers, so they
+    must be treated as read-only.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, fn, wait_check=None):
+        """
+        Run fn, or wait for the identical computation already running
+        
+        Args:
+            key: Hashable identity of the computation
+            fn: Callable without arguments
+            wait_check: Optional callable run periodically while waiting; an
+                        exception it raises stops the wait (e.g. cancellation)
+        
+        Returns:
+            tuple: (result, shared) where shared is True if the result came
+                   from another caller's computation
+        
+        Raises:
+            Whatever fn raised, in the leader and in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+        
+        if not leader:
+            try:
+                if wait_check is None:
+                    call.done.wait()
+                while not call.done.wait(WAIT_CHECK_INTERVAL):
+                    wait_check()
+            finally:
+                with self._lock:
+                    call.waiters -= 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        
+        return call.result, False
+    
+    def stats(self):
+        """
+        Return the current state for monitoring
+        
+        Returns:
+            dict: Computations running and callers waiting on them
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values()),
+            }
@@ -0,0 +1,546 @@
+"""
+Module for the training pipeline of the cluster models
+Same steps as notebooks/data_modeling.ipynb: feature engineering (the
+create_features of serving, with the real lags), 80/20 split by date,
+KMeans clustering of the stores on their train statistics, then one
+LGBMRegressor per cluster. Clusters are trained concurrently in a pool of
+processes, each with its own thread budget.
+
+The LightGBM parameters are the notebook's, or the ones chosen by a
+hyperparameter search (see utils/tuning.py), recorded in the metadata and
+so in the model bundle.
+
+refresh_cluster_models continues the boosting of the current models on the
+weeks they have not seen, instead of a full retrain.
+"""
+
+import os
+import json
+import time
+import multiprocessing
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import create_features, get_feature_columns
+
+
+# Parameters of the notebook
+LGBM_PARAMS = {'n_estimators': 100, 'random_state': 42, 'verbose': -1}
+KMEANS_CANDIDATES = (3, 4, 5)
+KMEANS_RANDOM_STATE = 42
+SPLIT_QUANTILE = 0.8
+
+# Incremental refresh: trees added per refresh, most recent weeks held out to validate it
+REFRESH_EXTRA_TREES = 20
+REFRESH_HOLDOUT_WEEKS = 4
+
+# Columns of cluster_features.pkl (store statistics on the train period)
+CLUSTER_FEATURE_COLUMNS = [
+    'store', 'sales_mean', 'sales_std', 'sales_min',
+    'sales_max', 'temp_mean', 'unemployment', 'holiday_count',
+]
+
+
+def build_dataset(csv_path='data/stores-sales.csv', split_quantile=SPLIT_QUANTILE):
+    """
+    Build the features of the sales history and split them by date
+    
+    Args:
+        csv_path: CSV with columns [store, date, weekly_sales, holiday_flag,
+                  temperature, fuel_Price, cpi, unemployment]
+        split_quantile: Quantile of the dates ending the train period
+    
+    Returns:
+        tuple: (train, test) DataFrames of features and weekly_sales
+    """
+    df = pd.read_csv(csv_path, parse_dates=['date'], dayfirst=True)
+    df_features = create_features(df).dropna().reset_index(drop=True)
+    
+    split_date = df_features['date'].quantile(split_quantile)
+    train = df_features[df_features['date'] <= split_date].copy()
+    test = df_features[df_features['date'] > split_date].copy()
+    
+    print(f"Train: {len(train)} rows ({train['date'].min():%Y-%m-%d} - {train['date'].max():%Y-%m-%d})")
+    print(f"Test: {len(test)} rows ({test['date'].min():%Y-%m-%d} - {test['date'].max():%Y-%m-%d})")
+    return train, test
+
+
+def cluster_stores(train, candidates=KMEANS_CANDIDATES, random_state=KMEANS_RANDOM_STATE):
+    """
+    Cluster the stores on their train statistics, keeping the k with the best silhouette
+    
+    Returns:
+        tuple: (cluster_features, silhouette_scores)
+            cluster_features: CLUSTER_FEATURE_COLUMNS + cluster, one row per store
+            silhouette_scores: {k: score}
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    from sklearn.preprocessing import StandardScaler
+    
+    cluster_features = train.groupby('store').agg({
+        'weekly_sales': ['mean', 'std', 'min', 'max'],
+        'temperature': 'mean',
+        'unemployment': 'mean',
+        'holiday_flag': 'sum',
+    }).reset_index()
+    cluster_features.columns = CLUSTER_FEATURE_COLUMNS
+    
+    features_scaled = StandardScaler().fit_transform(cluster_features.drop(columns='store'))
+    
+    silhouette_scores = {}
+    for k in candidates:
+        labels = KMeans(n_clusters=k, random_state=random_state, n_init=10).fit_predict(features_scaled)
+        silhouette_scores[k] = float(silhouette_score(features_scaled, labels))
+        print(f"  k={k}: silhouette={silhouette_scores[k]:.4f}")
+    
+    best_k = max(silhouette_scores, key=silhouette_scores.get)
+    cluster_features['cluster'] = KMeans(n_clusters=best_k, random_state=random_state, n_init=10).fit_predict(features_scaled)
+    print(f"{best_k} clusters: {cluster_features['cluster'].value_counts().sort_index().to_dict()} stores")
+    return cluster_features, silhouette_scores
+
+
+def compute_metrics(y_true, y_pred):
+    """
+    Returns:
+        dict: {'rmse', 'mae', 'mape' (in %)}
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    return {
+        'rmse': float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+        'mae': float(np.mean(np.abs(y_true - y_pred))),
+        'mape': float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100),
+    }
+
+
+def _init_worker(threads):
+    """Thread budget of a training process, set before lightgbm is imported"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+
+
+def _fit_cluster(cluster_id, X, y, threads, params):
+    """Train the model of one cluster (runs in a pool process)"""
+    import lightgbm as lgb
+    
+    start = time.perf_counter()
+    model = lgb.LGBMRegressor(**params, n_jobs=threads)
+    model.fit(X, y)
+    return cluster_id, model, time.perf_counter() - start
+
+
+def train_cluster_models(train, n_workers=None, threads_per_worker=None, params=None):
+    """
+    Train one LGBMRegressor per cluster, clusters in parallel
+    
+    Args:
+        train: Train features with weekly_sales and cluster columns
+        n_workers: Training processes (default: one per cluster, at most one
+                   per core; 1 = train in this process)
+        threads_per_worker: LightGBM threads of each process (default: the
+                            cores shared between the processes)
+        params: LGBMRegressor parameters (default: LGBM_PARAMS)
+    
+    Returns:
+        dict: {cluster_id: LGBMRegressor}
+    """
+    params = params or LGBM_PARAMS
+    feature_cols = get_feature_columns()
+    cluster_ids = sorted(int(cluster_id) for cluster_id in train['cluster'].unique())
+    cores = os.cpu_count() or 1
+    
+    if n_workers is None:
+        n_workers = min(len(cluster_ids), cores)
+    n_workers = max(1, min(n_workers, len(cluster_ids)))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cores // n_workers)
+    
+    # Feature matrices as named DataFrames, so the models record the feature names
+    tasks = [
+        (cluster_id, train.loc[train['cluster'] == cluster_id, feature_cols],
+         train.loc[train['cluster'] == cluster_id, 'weekly_sales'], threads_per_worker, params)
+        for cluster_id in cluster_ids
+    ]
+    
+    print(f"Training {len(cluster_ids)} cluster models with {n_workers} processes "
+          f"x {threads_per_worker} threads...")
+    if n_workers == 1:
+        results = [_fit_cluster(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+        ) as pool:
+            results = list(pool.map(_fit_cluster, *zip(*tasks)))
+    
+    cluster_models = {}
+    for cluster_id, model, seconds in results:
+        cluster_models[cluster_id] = model
+        print(f"  Cluster {cluster_id}: {int((train['cluster'] == cluster_id).sum())} rows in {seconds:.2f}s")
+    return cluster_models
+
+
+def evaluate_cluster_models(cluster_models, test):
+    """
+    Metrics of the cluster models on the test period
+    
+    Returns:
+        dict: {'overall': metrics, 'clusters': {cluster_id: metrics}}
+    """
+    feature_cols = get_feature_columns()
+    y_true, y_pred = [], []
+    clusters = {}
+    
+    for cluster_id, model in sorted(cluster_models.items()):
+        test_c = test[test['cluster'] == cluster_id]
+        if test_c.empty:
+            continue
+        predictions = model.predict(test_c[feature_cols])
+        clusters[cluster_id] = compute_metrics(test_c['weekly_sales'], predictions)
+        y_true.append(test_c['weekly_sales'].to_numpy())
+        y_pred.append(predictions)
+    
+    return {'overall': compute_metrics(np.concatenate(y_true), np.concatenate(y_pred)), 'clusters': clusters}
+
+
+def _dump_atomic(obj, path):
+    """Pickle then rename, so a running server never loads a partial file"""
+    import joblib
+    
+    tmp_path = f'{path}.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _to_pickle_atomic(df, path):
+    """DataFrame.to_pickle then rename, for the data files the server watches"""
+    tmp_path = f'{path}.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_metadata(metadata_path):
+    if not os.path.exists(metadata_path):
+        return {}
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_metadata(metadata, metadata_path):
+    tmp_path = f'{metadata_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
+
+
+def _run_stage(timings, name, func, *args, **kwargs):
+    """Run one stage of a pipeline and record its wall time"""
+    print(f"\n[{name}]")
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def export_training_outputs(cluster_models, train, test, cluster_features, metrics, silhouette_scores,
+                            models_dir='models', data_dir='data', metadata_path='models/model_metadata.json',
+                            params=LGBM_PARAMS, tuning=None):
+    """
+    Write the models, datasets and metadata where the app loads them
+    
+    data_dir: train.pkl, test.pkl, cluster_features.pkl
+    models_dir: lgb_cluster_<id>.pkl (models of clusters that no longer exist are removed)
+    metadata_path: model_metadata.json, performance and training info updated,
+                   hyperparameters = params, tuning = summary of the search if one ran
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
+    
+    # Datasets as the notebook saved them, without the cluster column. Every file
+    # is written then renamed, data before models, so a reload of the running
+    # server never reads a partial file
+    _to_pickle_atomic(train.drop(columns='cluster'), os.path.join(data_dir, 'train.pkl'))
+    _to_pickle_atomic(test.drop(columns='cluster'), os.path.join(data_dir, 'test.pkl'))
+    _to_pickle_atomic(cluster_features, os.path.join(data_dir, 'cluster_features.pkl'))
+    
+    for filename in os.listdir(models_dir):
+        if filename.startswith('lgb_cluster_') and filename.endswith('.pkl'):
+            cluster_id = int(filename.replace('lgb_cluster_', '').replace('.pkl', ''))
+            if cluster_id not in cluster_models:
+                os.remove(os.path.join(models_dir, filename))
+    for cluster_id, model in cluster_models.items():
+        _dump_atomic(model, os.path.join(models_dir, f'lgb_cluster_{cluster_id}.pkl'))
+    
+    metadata = _read_metadata(metadata_path)
+    overall = {name: round(value, 2) for name, value in metrics['overall'].items()}
+    metadata.update(overall)
+    metadata['description'] = f"One LightGBM model per store cluster (k={len(cluster_models)})"
+    metadata['performance'] = {**metadata.get('performance', {}), **overall}
+    metadata['training_info'] = {
+        **metadata.get('training_info', {}),
+        'n_clusters': len(cluster_models),
+        'n_features': len(get_feature_columns()),
+        'silhouette_score': round(silhouette_scores[len(cluster_models)], 4),
+        'train_rows': int(len(train)),
+        'test_rows': int(len(test)),
+    }
+    metadata['hyperparameters'] = params
+    if tuning is not None:
+        metadata['tuning'] = {
+            'date': date.today().isoformat(),
+            'cv_rmse': round(tuning['cv_rmse'], 2),
+            'baseline_cv_rmse': round(tuning['baseline_cv_rmse'], 2),
+            'trials': len(tuning['trials']) - 1,
+            'pruned': tuning['n_pruned'],
+            'folds': tuning['folds'],
+        }
+    metadata['last_updated'] = date.today().isoformat()
+    _write_metadata(metadata, metadata_path)
+
+
+def run_training_pipeline(csv_path='data/stores-sales.csv', models_dir='models', data_dir='data',
+                          metadata_path='models/model_metadata.json', bundle_path='models/model.bundle',
+                          n_workers=None, threads_per_worker=None, n_trials=0, tuning_options=None):
+    """
+    Run every stage, from the sales history to the model bundle the app loads
+    
+    Args:
+        n_trials: Trials of a hyperparameter search on the train period before
+                  training (0 = no search: the hyperparameters of the metadata,
+                  from the last search, or LGBM_PARAMS)
+        tuning_options: Other arguments of tune_hyperparameters (folds, cache_dir...)
+    
+    Returns:
+        dict: {'timings': {stage: seconds}, 'metrics': see evaluate_cluster_models,
+               'bundle_version': version of the bundle}
+    """
+    from utils.model_bundle import build_bundle
+    
+    timings = {}
+    
+    def stage(name, func, *args, **kwargs):
+        return _run_stage(timings, name, func, *args, **kwargs)
+    
+    train, test = stage('features', build_dataset, csv_path)
+    
+    cluster_features, silhouette_scores = stage('clustering', cluster_stores, train)
+    store_cluster_map = cluster_features.set_index('store')['cluster']
+    train['cluster'] = train['store'].map(store_cluster_map)
+    test['cluster'] = test['store'].map(store_cluster_map)
+    
+    tuning = None
+    if n_trials:
+        from utils.tuning import tune_hyperparameters
+        
+        tuning = stage('tuning', tune_hyperparameters, train, n_trials, n_workers=n_workers,
+                       threads_per_worker=threads_per_worker, **(tuning_options or {}))
+        params = tuning['params']
+    else:
+        params = _read_metadata(metadata_path).get('hyperparameters') or LGBM_PARAMS
+    print(f"\nLightGBM parameters: {params}")
+    
+    cluster_models = stage('training', train_cluster_models, train, n_workers, threads_per_worker, params)
+    
+    metrics = stage('evaluation', evaluate_cluster_models, cluster_models, test)
+    print(f"RMSE={metrics['overall']['rmse']:,.2f}, MAE={metrics['overall']['mae']:,.2f}, "
+          f"MAPE={metrics['overall']['mape']:.2f}%")
+    
+    stage('export', export_training_outputs, cluster_models, train, test, cluster_features, metrics,
+          silhouette_scores, models_dir, data_dir, metadata_path, params, tuning)
+    
+    bundle_version = stage(
+        'bundle', build_bundle, bundle_path, models_dir,
+        os.path.join(data_dir, 'train.pkl'), os.path.join(data_dir, 'cluster_features.pkl'), metadata_path,
+    )
+    
+    return {'timings': timings, 'metrics': metrics, 'bundle_version': bundle_version}
+
+
+def continue_training(model, X, y, extra_trees=REFRESH_EXTRA_TREES):
+    """
+    Add trees to a fitted LGBMRegressor, boosting from its current predictions
+    
+    Returns:
+        LGBMRegressor with the trees of model followed by at most extra_trees new ones
+    """
+    import lightgbm as lgb
+    
+    refreshed = lgb.LGBMRegressor(**{**model.get_params(), 'n_estimators': extra_trees})
+    refreshed.fit(X, y, init_model=model.booster_)
+    return refreshed
+
+
+def _append_history(history, df_new, history_path):
+    """Add the new weeks to the sales history CSV (rows of the new file win)"""
+    combined = (
+        pd.concat([history, df_new])
+        .drop_duplicates(['store', 'date'], keep='last')
+        .sort_values(['store', 'date'])
+        .reset_index(drop=True)
+    )
+    output = combined.copy()
+    output['date'] = output['date'].dt.strftime('%d-%m-%Y')
+    
+    tmp_path = f'{history_path}.tmp'
+    output.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, history_path)
+    return combined
+
+
+def _refresh_split(history, train_end, cluster_features, holdout_weeks):
+    """
+    Feature rows the models were not trained on, split into fit rows and a holdout
+    
+    Returns:
+        tuple: (fit_rows, holdout), or None if there are not more than
+               holdout_weeks untrained weeks
+    """
+    df_features = create_features(history).dropna().reset_index(drop=True)
+    untrained = df_features[df_features['date'] > train_end].copy()
+    untrained['cluster'] = untrained['store'].map(cluster_features.set_index('store')['cluster'])
+    
+    unknown = untrained['cluster'].isna()
+    if unknown.any():
+        print(f"{unknown.sum()} rows of stores without cluster ignored")
+        untrained = untrained[~unknown]
+    untrained['cluster'] = untrained['cluster'].astype(int)
+    
+    weeks = np.sort(untrained['date'].unique())
+    if len(weeks) <= holdout_weeks:
+        return None
+    
+    holdout_start = weeks[-holdout_weeks]
+    fit_rows = untrained[untrained['date'] < holdout_start]
+    holdout = untrained[untrained['date'] >= holdout_start]
+    print(f"{len(fit_rows)} new rows to train on ({len(weeks) - holdout_weeks} weeks), "
+          f"holdout: {len(holdout)} rows ({holdout_weeks} weeks from {pd.Timestamp(holdout_start):%Y-%m-%d})")
+    return fit_rows, holdout
+
+
+def _regressions(current, candidate, tolerance):
+    """Metrics of the candidate worse than the current ones by more than tolerance"""
+    return [
+        name for name in ('rmse', 'mae', 'mape')
+        if candidate['overall'][name] > current['overall'][name] * (1 + tolerance)
+    ]
+
+
+def refresh_cluster_models(new_data_path, history_path='data/stores-sales.csv', models_dir='models',
+                           data_dir='data', metadata_path='models/model_metadata.json',
+                           bundle_path='models/model.bundle', extra_trees=REFRESH_EXTRA_TREES,
+                           holdout_weeks=REFRESH_HOLDOUT_WEEKS, tolerance=0.0):
+    """
+    Continue the training of every cluster model on the weeks it has not seen yet
+    
+    The new weeks are added to the sales history. The weeks after the end of
+    train.pkl (what the models were trained on) are split: the last
+    holdout_weeks are held out, each cluster model gets at most extra_trees
+    new trees fitted on the others. The refreshed models are published
+    (models, train.pkl, test.pkl = holdout, metadata, bundle) only if none of
+    RMSE, MAE and MAPE on the holdout is worse than with the current models.
+    Rejected weeks stay untrained and are used again by the next refresh.
+    
+    Args:
+        new_data_path: CSV of new weeks, columns of the sales history
+        extra_trees: Trees added to each cluster model
+        holdout_weeks: Most recent weeks used to validate the refresh
+        tolerance: Accepted relative degradation of each metric (0.01 = 1%)
+    
+    Returns:
+        dict: {'published': bool, 'reason', 'current', 'candidate' (metrics,
+               see evaluate_cluster_models), 'timings', 'bundle_version'}
+    """
+    from utils.model_bundle import build_bundle
+    from utils.model_loader import load_pickled_cluster_models
+    
+    timings = {}
+    report = {'published': False, 'reason': None, 'current': None, 'candidate': None,
+              'timings': timings, 'bundle_version': None}
+    
+    def stage(name, func, *args, **kwargs):
+        return _run_stage(timings, name, func, *args, **kwargs)
+    
+    train_path = os.path.join(data_dir, 'train.pkl')
+    cluster_features = pd.read_pickle(os.path.join(data_dir, 'cluster_features.pkl'))
+    train = pd.read_pickle(train_path)
+    
+    history = pd.read_csv(history_path, parse_dates=['date'], dayfirst=True)
+    df_new = pd.read_csv(new_data_path, parse_dates=['date'], dayfirst=True)
+    history = stage('append', _append_history, history, df_new[history.columns], history_path)
+    
+    split = stage('features', _refresh_split, history, train['date'].max(), cluster_features, holdout_weeks)
+    if split is None:
+        report['reason'] = f"Not more than {holdout_weeks} untrained weeks, nothing to train on"
+        print(report['reason'])
+        return report
+    fit_rows, holdout = split
+    
+    feature_cols = get_feature_columns()
+    current_models = load_pickled_cluster_models(models_dir)
+    
+    def refresh_models():
+        refreshed = dict(current_models)
+        for cluster_id, rows in fit_rows.groupby('cluster'):
+            if cluster_id in current_models:
+                refreshed[cluster_id] = continue_training(
+                    current_models[cluster_id], rows[feature_cols], rows['weekly_sales'], extra_trees
+                )
+                print(f"  Cluster {cluster_id}: {refreshed[cluster_id].booster_.num_trees()} trees "
+                      f"({len(rows)} new rows)")
+        return refreshed
+    
+    candidate_models = stage('training', refresh_models)
+    
+    def evaluate():
+        return (evaluate_cluster_models(current_models, holdout),
+                evaluate_cluster_models(candidate_models, holdout))
+    
+    report['current'], report['candidate'] = stage('evaluation', evaluate)
+    for name, metrics in (('current', report['current']), ('refreshed', report['candidate'])):
+        print(f"  {name:<10} RMSE={metrics['overall']['rmse']:,.2f}, MAE={metrics['overall']['mae']:,.2f}, "
+              f"MAPE={metrics['overall']['mape']:.2f}%")
+    
+    regressions = _regressions(report['current'], report['candidate'], tolerance)
+    if regressions:
+        report['reason'] = f"Holdout {', '.join(regressions)} worse than with the current models"
+        print(report['reason'])
+        return report
+    
+    def publish():
+        # Data before models, each file written then renamed (see export_training_outputs)
+        updated_train = pd.concat([train, fit_rows.drop(columns='cluster')], ignore_index=True)
+        _to_pickle_atomic(updated_train, train_path)
+        _to_pickle_atomic(holdout.drop(columns='cluster'), os.path.join(data_dir, 'test.pkl'))
+        
+        for cluster_id, model in candidate_models.items():
+            _dump_atomic(model, os.path.join(models_dir, f'lgb_cluster_{cluster_id}.pkl'))
+        
+        # The headline metrics stay those of the test period; the holdout ones go with the refresh
+        metadata = _read_metadata(metadata_path)
+        metadata['training_info'] = {
+            **metadata.get('training_info', {}),
+            'train_rows': int(len(updated_train)),
+            'test_rows': int(len(holdout)),
+        }
+        metadata['last_refresh'] = {
+            'date': date.today().isoformat(),
+            'new_rows': int(len(fit_rows)),
+            'extra_trees': extra_trees,
+            'holdout_weeks': holdout_weeks,
+            'holdout_metrics': {name: round(value, 2) for name, value in report['candidate']['overall'].items()},
+        }
+        metadata['last_updated'] = date.today().isoformat()
+        _write_metadata(metadata, metadata_path)
+        
+        return build_bundle(bundle_path, models_dir, train_path,
+                            os.path.join(data_dir, 'cluster_features.pkl'), metadata_path)
+    
+    report['bundle_version'] = stage('publish', publish)
+    report['published'] = True
+    report['reason'] = "Holdout metrics did not regress"
+    return report
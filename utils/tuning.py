@@ -0,0 +1,343 @@
+"""
+Module for the hyperparameter search of the cluster models
+Each trial is scored by rolling-origin cross-validation on the train period:
+the last n_folds blocks of fold_weeks weeks are validated in turn, each with
+a model trained on the weeks before it (per cluster, as in serving).
+
+Trials run in a pool of processes. The LightGBM Datasets of each fold and
+cluster are binned once and saved as binaries, which every trial loads
+instead of rebuilding them. Each fit stops early on the fold_weeks weeks just
+before its validation window (its number of trees is tuned that way) and is
+scored on the validation window at that iteration, so the validation rows
+never choose the number of trees. The baseline is trained on the same rows.
+A trial is pruned when its first folds already score clearly worse than the
+baseline on the same folds.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.preprocessing import get_feature_columns
+from utils.training import LGBM_PARAMS, _init_worker
+
+
+TUNING_TRIALS = 20
+TUNING_FOLDS = 4
+TUNING_FOLD_WEEKS = 8
+TUNING_SEED = 42
+TUNING_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_tuning')
+
+# Boosting rounds of a fit, stopped after STOPPING_ROUNDS rounds without improvement
+MAX_ROUNDS = 1000
+STOPPING_ROUNDS = 50
+
+# A trial is pruned when its mean RMSE on the first folds is worse than the best
+# trial's on the same folds by more than this margin
+PRUNE_MARGIN = 0.10
+
+# Search space: name -> (scale, low, high)
+SEARCH_SPACE = {
+    'learning_rate': ('log', 0.01, 0.2),
+    'num_leaves': ('int', 8, 64),
+    'min_child_samples': ('int', 5, 50),
+    'subsample': ('float', 0.6, 1.0),
+    'colsample_bytree': ('float', 0.5, 1.0),
+    'reg_lambda': ('log', 1e-3, 10.0),
+}
+
+# Binning of the cached Datasets, shared by every trial (so not tuned).
+# No pre-filtering, which would depend on min_child_samples
+DATASET_PARAMS = {'max_bin': 255, 'feature_pre_filter': False, 'verbose': -1}
+
+
+def rolling_origin_folds(dates, n_folds=TUNING_FOLDS, fold_weeks=TUNING_FOLD_WEEKS):
+    """
+    Validation windows of the rolling-origin cross-validation
+    
+    Args:
+        dates: Dates of the train rows
+        n_folds: Number of folds, validated on the last n_folds * fold_weeks weeks
+        fold_weeks: Weeks of each validation window
+    
+    Returns:
+        list: (stop_start, start, end) Timestamps of each fold, oldest first;
+              a fold trains on the weeks before stop_start, stops early on
+              the fold_weeks weeks from stop_start and validates from start
+              to end
+    
+    Raises:
+        ValueError: If the train period is too short for the folds
+    """
+    weeks = np.sort(pd.Series(dates).unique())
+    if len(weeks) < (n_folds + 2) * fold_weeks:
+        raise ValueError(f"{len(weeks)} train weeks, at least {(n_folds + 2) * fold_weeks} needed "
+                         f"for {n_folds} folds of {fold_weeks} weeks")
+    
+    folds = []
+    for i in range(n_folds, 0, -1):
+        start = len(weeks) - i * fold_weeks
+        folds.append((pd.Timestamp(weeks[start - fold_weeks]), pd.Timestamp(weeks[start]),
+                      pd.Timestamp(weeks[start + fold_weeks - 1])))
+    return folds
+
+
+def _dataset_key(train, folds):
+    """Hash of the data, folds and binning the cached Datasets depend on"""
+    import lightgbm as lgb
+    
+    columns = ['date', 'cluster', 'weekly_sales'] + get_feature_columns()
+    digest = hashlib.sha256(pd.util.hash_pandas_object(train[columns], index=False).to_numpy().tobytes())
+    digest.update(json.dumps({
+        'folds': [[day.isoformat() for day in fold] for fold in folds],
+        'layout': 2,  # train / stopping binaries and validation arrays
+        'dataset_params': DATASET_PARAMS,
+        'lightgbm_version': lgb.__version__,
+    }, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_fold_datasets(train, folds, cache_dir=TUNING_CACHE_DIR):
+    """
+    Bin the train and early-stopping rows of each fold and cluster, once
+    
+    The binaries, and the validation rows as arrays (scored by prediction),
+    are kept in cache_dir under a hash of the data and folds, so later
+    searches on the same train period reuse them.
+    
+    Args:
+        train: Train features with weekly_sales and cluster columns
+        folds: Folds of the cross-validation (see rolling_origin_folds)
+    
+    Returns:
+        list: One dict per fold, {cluster_id: (train_binary, stop_binary, valid_npz)}
+    """
+    import lightgbm as lgb
+    
+    feature_cols = get_feature_columns()
+    dataset_dir = os.path.join(cache_dir, _dataset_key(train, folds))
+    os.makedirs(dataset_dir, exist_ok=True)
+    
+    fold_files = []
+    n_built = 0
+    for fold, (stop_start, start, end) in enumerate(folds):
+        files = {}
+        for cluster_id, rows in train.groupby('cluster'):
+            cluster_id = int(cluster_id)
+            fit_rows = rows[rows['date'] < stop_start]
+            stop_rows = rows[(rows['date'] >= stop_start) & (rows['date'] < start)]
+            valid_rows = rows[(rows['date'] >= start) & (rows['date'] <= end)]
+            if fit_rows.empty or stop_rows.empty or valid_rows.empty:
+                continue
+            
+            prefix = os.path.join(dataset_dir, f'fold{fold}_cluster{cluster_id}')
+            paths = (f'{prefix}_train.bin', f'{prefix}_stop.bin', f'{prefix}_valid.npz')
+            if not all(os.path.exists(path) for path in paths):
+                train_set = lgb.Dataset(fit_rows[feature_cols], fit_rows['weekly_sales'], params=DATASET_PARAMS)
+                stop_set = lgb.Dataset(stop_rows[feature_cols], stop_rows['weekly_sales'],
+                                       reference=train_set, params=DATASET_PARAMS)
+                
+                # Written then renamed, so a concurrent search never loads a partial file
+                for dataset, path in ((train_set, paths[0]), (stop_set, paths[1])):
+                    dataset.save_binary(f'{path}.{os.getpid()}.tmp')
+                    os.replace(f'{path}.{os.getpid()}.tmp', path)
+                with open(f'{paths[2]}.{os.getpid()}.tmp', 'wb') as f:
+                    np.savez(f, X=valid_rows[feature_cols].to_numpy(dtype=np.float64),
+                             y=valid_rows['weekly_sales'].to_numpy(dtype=np.float64))
+                os.replace(f'{paths[2]}.{os.getpid()}.tmp', paths[2])
+                n_built += 1
+            files[cluster_id] = paths
+        fold_files.append(files)
+    
+    n_total = sum(len(files) for files in fold_files)
+    print(f"Fold datasets: {n_total - n_built} cached, {n_built} built ({dataset_dir})")
+    return fold_files
+
+
+def sample_params(rng, space=SEARCH_SPACE):
+    """
+    Draw one set of parameters from the search space
+    
+    Returns:
+        dict: LGBMRegressor parameters (without n_estimators)
+    """
+    params = {}
+    for name, (scale, low, high) in space.items():
+        if scale == 'log':
+            params[name] = round(float(np.exp(rng.uniform(np.log(low), np.log(high)))), 5)
+        elif scale == 'int':
+            params[name] = int(rng.integers(low, high + 1))
+        else:
+            params[name] = round(float(rng.uniform(low, high)), 4)
+    
+    # Row subsampling only applies with a bagging frequency
+    params['subsample_freq'] = 1
+    params['random_state'] = LGBM_PARAMS['random_state']
+    params['verbose'] = -1
+    return params
+
+
+def _run_trial(trial_id, params, fold_files, threads, max_rounds, stopping_rounds, prune_curve):
+    """
+    Cross-validate one set of parameters (runs in a pool process)
+    
+    Each fit stops early on the stopping rows of its fold, then the
+    validation rows are predicted with the trees kept.
+    
+    Args:
+        max_rounds: Boosting rounds of each fit
+        stopping_rounds: Rounds without improvement before a fit stops (None =
+                         all max_rounds rounds)
+        prune_curve: Baseline mean RMSE over the first k folds for each k, or None
+    
+    Returns:
+        dict: {'trial', 'params', 'fold_rmse', 'best_iterations', 'rmse' (mean
+               over the folds, None if pruned), 'pruned', 'seconds'}
+    """
+    import lightgbm as lgb
+    
+    start = time.perf_counter()
+    train_params = {name: value for name, value in params.items() if name != 'n_estimators'}
+    train_params.update({'objective': 'regression', 'metric': 'l2', 'num_threads': threads})
+    callbacks = [lgb.early_stopping(stopping_rounds, verbose=False)] if stopping_rounds else []
+    
+    result = {'trial': trial_id, 'params': params, 'fold_rmse': [], 'best_iterations': [],
+              'rmse': None, 'pruned': False, 'seconds': None}
+    for fold, files in enumerate(fold_files):
+        squared_error, n_rows = 0.0, 0
+        for cluster_id, (train_path, stop_path, valid_path) in sorted(files.items()):
+            train_set = lgb.Dataset(train_path, params={'verbose': -1})
+            stop_set = lgb.Dataset(stop_path, reference=train_set, params={'verbose': -1})
+            booster = lgb.train(train_params, train_set, num_boost_round=max_rounds,
+                                valid_sets=[stop_set], callbacks=callbacks)
+            
+            # Validation error at the best iteration on the stopping rows (the last one
+            # without early stopping)
+            best_iteration = booster.best_iteration or max_rounds
+            with np.load(valid_path) as valid:
+                errors = booster.predict(valid['X'], num_iteration=best_iteration) - valid['y']
+            squared_error += float(np.dot(errors, errors))
+            n_rows += len(errors)
+            result['best_iterations'].append(best_iteration)
+        result['fold_rmse'].append(float(np.sqrt(squared_error / n_rows)))
+        
+        if (prune_curve and fold < len(fold_files) - 1
+                and np.mean(result['fold_rmse']) > prune_curve[fold] * (1 + PRUNE_MARGIN)):
+            result['pruned'] = True
+            break
+    
+    if not result['pruned']:
+        result['rmse'] = float(np.mean(result['fold_rmse']))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _prune_curve(trial):
+    """Mean RMSE of a trial over its first k folds, for each k"""
+    return list(np.cumsum(trial['fold_rmse']) / np.arange(1, len(trial['fold_rmse']) + 1))
+
+
+def _chosen_params(trial):
+    """LGBMRegressor parameters of a trial, its tuned number of trees included"""
+    return {**trial['params'], 'n_estimators': int(np.median(trial['best_iterations']))}
+
+
+def tune_hyperparameters(train, n_trials=TUNING_TRIALS, n_folds=TUNING_FOLDS, fold_weeks=TUNING_FOLD_WEEKS,
+                         n_workers=None, threads_per_worker=None, cache_dir=TUNING_CACHE_DIR,
+                         max_rounds=MAX_ROUNDS, stopping_rounds=STOPPING_ROUNDS, seed=TUNING_SEED):
+    """
+    Random search of the LightGBM parameters, trials in parallel
+    
+    The notebook parameters (LGBM_PARAMS, fixed number of trees) are scored
+    on the same folds and rows as the baseline; they are kept unless a trial
+    beats them. The number of trees of a trial is the median of its
+    early-stopped fits. Trials are pruned against the baseline only, so
+    the pruned trials do not depend on the order trials finish in.
+    
+    Args:
+        train: Train features with weekly_sales and cluster columns
+        n_trials: Parameter sets drawn from SEARCH_SPACE
+        n_folds, fold_weeks: Folds of the cross-validation (see rolling_origin_folds)
+        n_workers: Trial processes (default: one per core; 1 = run in this process)
+        threads_per_worker: LightGBM threads of each process (default: the
+                            cores shared between the processes)
+        cache_dir: Directory of the Dataset binaries
+        seed: Seed of the parameter draws
+    
+    Returns:
+        dict: {'params' (LGBMRegressor parameters), 'cv_rmse', 'baseline_cv_rmse',
+               'trials' (results of _run_trial, baseline first), 'n_pruned', 'folds'}
+    """
+    folds = rolling_origin_folds(train['date'], n_folds, fold_weeks)
+    print(f"{n_folds} folds of {fold_weeks} weeks, validated from {folds[0][1]:%Y-%m-%d} to {folds[-1][2]:%Y-%m-%d}")
+    fold_files = build_fold_datasets(train, folds, cache_dir)
+    
+    cores = os.cpu_count() or 1
+    if n_workers is None:
+        n_workers = cores
+    n_workers = max(1, min(n_workers, n_trials))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cores // n_workers)
+    
+    # The baseline runs first and is never pruned; it sets the pruning curve
+    baseline = _run_trial(0, dict(LGBM_PARAMS), fold_files, threads_per_worker,
+                          LGBM_PARAMS['n_estimators'], None, None)
+    print(f"  baseline: CV RMSE={baseline['rmse']:,.2f} ({baseline['seconds']:.2f}s)")
+    prune_curve = _prune_curve(baseline)
+    
+    rng = np.random.default_rng(seed)
+    pending = [(trial_id, sample_params(rng)) for trial_id in range(1, n_trials + 1)]
+    trials = []
+    best = baseline
+    
+    def record(trial):
+        nonlocal best
+        trials.append(trial)
+        if trial['pruned']:
+            print(f"  trial {trial['trial']:>3}: pruned after {len(trial['fold_rmse'])} of {len(fold_files)} folds ({trial['seconds']:.2f}s)")
+            return
+        print(f"  trial {trial['trial']:>3}: CV RMSE={trial['rmse']:,.2f}, "
+              f"{int(np.median(trial['best_iterations']))} trees ({trial['seconds']:.2f}s)")
+        if trial['rmse'] < best['rmse']:
+            best = trial
+    
+    print(f"Running {n_trials} trials with {n_workers} processes x {threads_per_worker} threads...")
+    if n_workers == 1:
+        for trial_id, params in pending:
+            record(_run_trial(trial_id, params, fold_files, threads_per_worker,
+                              max_rounds, stopping_rounds, prune_curve))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,),
+        ) as pool:
+            # Results in trial order, so ties go to the same trial as in one process
+            futures = [
+                pool.submit(_run_trial, trial_id, params, fold_files, threads_per_worker,
+                            max_rounds, stopping_rounds, prune_curve)
+                for trial_id, params in pending
+            ]
+            for future in futures:
+                record(future.result())
+    
+    params = dict(LGBM_PARAMS) if best is baseline else _chosen_params(best)
+    best_name = 'baseline (notebook parameters)' if best is baseline else f"trial {best['trial']}"
+    print(f"Best: {best_name}, CV RMSE={best['rmse']:,.2f} (baseline {baseline['rmse']:,.2f})")
+    
+    return {
+        'params': params,
+        'cv_rmse': best['rmse'],
+        'baseline_cv_rmse': baseline['rmse'],
+        'trials': [baseline] + trials,
+        'n_pruned': sum(trial['pruned'] for trial in trials),
+        'folds': [(start.date().isoformat(), end.date().isoformat()) for _, start, end in folds],
+    }
@@ -0,0 +1,173 @@
+"""
+Module to spool chunked uploads to disk
+Files are received in chunks and parsed with a streaming CSV reader,
+so large uploads never have to be held in memory as text
+"""
+
+import os
+import re
+import time
+import fcntl
+import hashlib
+import tempfile
+import pandas as pd
+
+
+DEFAULT_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'store_sales_uploads')
+STALE_UPLOAD_SECONDS = 6 * 3600  # Abandoned uploads are removed after 6 hours
+COPY_BLOCK_SIZE = 1024 * 1024
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Raised when a chunk cannot be appended to an upload"""
+    
+    def __init__(self, message, received=None):
+        super().__init__(message)
+        self.received = received
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when an upload exceeds the maximum size"""
+
+
+def get_upload_path(upload_id, upload_dir=DEFAULT_UPLOAD_DIR):
+    """Return the spool file path of an upload, or None if the id is malformed"""
+    if not upload_id or not _UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    return os.path.join(upload_dir, f'{upload_id}.part')
+
+
+def get_received_size(upload_id, upload_dir=DEFAULT_UPLOAD_DIR):
+    """Return the number of bytes already received for an upload (0 if unknown)"""
+    path = get_upload_path(upload_id, upload_dir)
+    if path is None or not os.path.exists(path):
+        return 0
+    return os.path.getsize(path)
+
+
+def _prune_stale_uploads(upload_dir):
+    """Remove uploads that have not received data for STALE_UPLOAD_SECONDS"""
+    now = time.time()
+    for name in os.listdir(upload_dir):
+        path = os.path.join(upload_dir, name)
+        try:
+            if now - os.path.getmtime(path) > STALE_UPLOAD_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def append_chunk(upload_id, offset, stream, max_size, upload_dir=DEFAULT_UPLOAD_DIR):
+    """
+    Append a chunk to an upload spool file
+    
+    Args:
+        upload_id: 32 hex characters chosen by the client
+        offset: Byte offset of the chunk in the file (must match the received size)
+        stream: File-like object with the chunk bytes
+        max_size: Maximum total size of the upload in bytes
+        upload_dir: Directory holding the spool files
+    
+    Returns:
+        int: Total number of bytes received
+    
+    Raises:
+        UploadError: If the id is invalid or the offset does not match
+        UploadTooLargeError: If the upload exceeds max_size
+    """
+    path = get_upload_path(upload_id, upload_dir)
+    if path is None:
+        raise UploadError("Invalid upload id")
+    
+    os.makedirs(upload_dir, exist_ok=True)
+    if offset == 0:
+        _prune_stale_uploads(upload_dir)
+    
+    with open(path, 'ab') as f:
+        # Requests for the same upload (e.g. a retry while the first one is still
+        # streaming) append one at a time, each checking the size under the lock
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise UploadError(f"Expected offset {received}, got {offset}", received=received)
+        
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            received += len(block)
+            if received > max_size:
+                f.truncate(offset)
+                raise UploadTooLargeError(
+                    f"File exceeds the maximum size of {max_size / (1024*1024):.0f}MB",
+                    received=offset,
+                )
+            f.write(block)
+    
+    return received
+
+
+def read_upload_csv(upload_id, chunk_rows=100000, upload_dir=DEFAULT_UPLOAD_DIR, progress=None):
+    """
+    Parse a spooled upload with a streaming CSV reader
+    
+    Args:
+        upload_id: Upload id
+        chunk_rows: Rows parsed per chunk
+        upload_dir: Directory holding the spool files
+        progress: Optional callable(stage, fraction), called after each chunk
+                  with stage 'decode' (see utils/jobs.py)
+    
+    Returns:
+        DataFrame with the file content
+    """
+    path = get_upload_path(upload_id, upload_dir)
+    if path is None or not os.path.exists(path):
+        raise FileNotFoundError("Uploaded file not found. Please upload it again.")
+    
+    size = os.path.getsize(path) or 1
+    chunks = []
+    with open(path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            chunks.append(chunk)
+            if progress is not None:
+                progress('decode', f.tell() / size)
+    
+    if not chunks:
+        return pd.read_csv(path)
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def get_upload_digest(upload_id, upload_dir=DEFAULT_UPLOAD_DIR):
+    """
+    Return the SHA-256 hex digest of a spooled upload
+    
+    Raises:
+        FileNotFoundError: If the upload does not exist
+    """
+    path = get_upload_path(upload_id, upload_dir)
+    if path is None or not os.path.exists(path):
+        raise FileNotFoundError("Uploaded file not found. Please upload it again.")
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remove_upload(upload_id, upload_dir=DEFAULT_UPLOAD_DIR):
+    """Delete the spool file of an upload"""
+    path = get_upload_path(upload_id, upload_dir)
+    if path is not None and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
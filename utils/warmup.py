@@ -0,0 +1,78 @@
+"""
+Module for the startup warm-up and the readiness state of a server process
+The first prediction of a process pays for loading the artifacts and for
+LightGBM's first-call initialization. The warm-up loads the artifacts and
+runs a synthetic prediction through create_features and every cluster
+model; the process reports ready (see /ready) only once it is done.
+"""
+
+import os
+import time
+import threading
+
+from utils.model_reload import warm_up
+from utils.predictor import load_serving_artifacts
+
+
+_state = {'status': 'starting', 'model_version': None, 'seconds': None, 'error': None}
+_state_lock = threading.Lock()
+
+
+def _set_state(**values):
+    with _state_lock:
+        _state.update(values)
+
+
+def run_warmup(predict=True):
+    """
+    Load the serving artifacts and warm them up, then mark the process ready
+    
+    Args:
+        predict: Run the synthetic prediction (False: only load the artifacts)
+    
+    Returns:
+        bool: True if the process is ready
+    """
+    _set_state(status='warming', error=None)
+    start = time.time()
+    
+    try:
+        artifacts = load_serving_artifacts()
+        if predict:
+            warm_up(artifacts)
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        _set_state(status='failed', error=str(e), seconds=round(time.time() - start, 3))
+        return False
+    
+    _set_state(status='ready', model_version=artifacts['model_version'], seconds=round(time.time() - start, 3))
+    print(f"Warm-up done in {time.time() - start:.2f}s (pid {os.getpid()})")
+    return True
+
+
+def start_warmup(predict=True):
+    """
+    Run the warm-up in a background thread; the process is not ready until it ends
+    
+    Used in forked workers, whose first-call state (threads, caches) is not
+    inherited from the parent.
+    """
+    _set_state(status='warming')
+    threading.Thread(target=run_warmup, args=(predict,), name='warmup', daemon=True).start()
+
+
+def get_readiness():
+    """
+    Readiness of this process
+    
+    Returns:
+        dict: {'status': 'starting'|'warming'|'ready'|'failed', 'model_version',
+               'seconds' (duration of the warm-up), 'error', 'pid'}
+    """
+    with _state_lock:
+        readiness = dict(_state)
+    if readiness['status'] == 'ready':
+        # Models may have been reloaded since the warm-up
+        readiness['model_version'] = load_serving_artifacts()['model_version']
+    readiness['pid'] = os.getpid()
+    return readiness